@@ -1,6 +1,6 @@
 import streamlit as st
 from pages import parent_selector, student_app, teacher_app
-from modules import data_loader, team_manager, config_manager # Added imports
+from modules import storage, team_manager, config_manager # Added imports
 
 # --- Step 6: Initial Page Configuration ---
 # This should be the very first Streamlit command in the app.py script, except for imports.
@@ -20,8 +20,8 @@ st.set_page_config(
 def main():
     # --- Step 2: Global Google API Authentication on Load ---
     # Initialize session state flags if they don't exist
-    if 'drive_service_initialized' not in st.session_state:
-        st.session_state.drive_service_initialized = False
+    if 'storage_backend_initialized' not in st.session_state:
+        st.session_state.storage_backend_initialized = False
     if 'gspread_client_initialized' not in st.session_state:
         st.session_state.gspread_client_initialized = False
     if 'global_auth_attempted' not in st.session_state: # To run this block once per session effectively
@@ -31,17 +31,17 @@ def main():
     # Attempt global authentication only once per session or if not yet successful
     # The individual get_..._service/client functions handle their own credential state.
     # Calling them here ensures they are triggered early if needed.
-    if not st.session_state.drive_service_initialized or not st.session_state.gspread_client_initialized:
+    if not st.session_state.storage_backend_initialized or not st.session_state.gspread_client_initialized:
         # Using a general spinner for the initial auth attempt.
         # Individual functions will show their specific auth links if needed.
         with st.spinner("Connecting to Google services... Please follow authentication prompts if they appear."):
-            drive_service = data_loader.get_drive_service()
-            if drive_service:
-                st.session_state.drive_service_initialized = True
-                st.session_state.drive_service = drive_service # Store the service object itself
+            storage_backend = storage.get_storage_backend() # Google Drive, or local storage if configured
+            if storage_backend:
+                st.session_state.storage_backend_initialized = True
+                st.session_state.storage_backend = storage_backend # Store the backend object itself
                 # Optional: st.sidebar.success("Drive Connected", icon="✅") # Can be noisy
             else:
-                # get_drive_service() itself should render messages/auth links.
+                # get_storage_backend() (via data_loader.get_drive_service()) should render messages/auth links.
                 # If it returns None, it means auth is pending or failed.
                 # No specific error needed here unless we want to halt the whole app.
                 pass
@@ -63,18 +63,18 @@ def main():
 
     # --- Step 4: Global UI Settings Application - Part 1: Load Config & Apply Font ---
     if 'ui_settings' not in st.session_state: # Load once per session or if not already loaded
-        # Retrieve drive_service from session state (set in Step 2)
-        drive_service_global = st.session_state.get('drive_service')
-        if drive_service_global:
+        # Retrieve storage_backend from session state (set in Step 2)
+        storage_backend_global = st.session_state.get('storage_backend')
+        if storage_backend_global:
             with st.spinner("Loading UI preferences..."):
-                st.session_state.ui_settings = config_manager.load_uiconfig_from_drive(drive_service_global)
+                st.session_state.ui_settings = config_manager.load_uiconfig(storage_backend_global)
         else:
-            # If drive_service isn't up yet (e.g., user hasn't authed Drive)
+            # If storage_backend isn't up yet (e.g., user hasn't authed Drive)
             # still initialize ui_settings with defaults so app doesn't break.
             # Teacher App might later load them again if Drive auth completes there.
             st.session_state.ui_settings = config_manager.DEFAULT_UI_SETTINGS.copy()
             # Optionally, add a warning if Drive isn't connected yet for UI settings
-            # if not st.session_state.get('drive_service_initialized'):
+            # if not st.session_state.get('storage_backend_initialized'):
             #     st.sidebar.warning("UI settings from Drive require Google Drive connection.")
 
 
@@ -127,11 +127,11 @@ def main():
     # The pages themselves also call the getters, which now first check session_state.
     # This makes the app more resilient if global auth is interrupted.
     if st.session_state.page == "Parent/Teacher Setup":
-        if not st.session_state.drive_service_initialized: # Example check
+        if not st.session_state.storage_backend_initialized: # Example check
              st.warning("Google Drive connection is pending. Some features might be unavailable until authenticated.")
         # Parent Selector also needs Sheets for team aspects eventually, but primarily Drive for datasets
     elif st.session_state.page == "Student App" or st.session_state.page == "Teacher App":
-        if not st.session_state.drive_service_initialized or not st.session_state.gspread_client_initialized:
+        if not st.session_state.storage_backend_initialized or not st.session_state.gspread_client_initialized:
             st.warning("Google Drive or Sheets connection is pending. Some features might be unavailable until authenticated.")
             
     page_function()
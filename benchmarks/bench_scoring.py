@@ -0,0 +1,194 @@
+import argparse
+import io
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from modules import metrics, ground_truth, data_loader
+
+# --- Scoring benchmarks ---
+# Times and memory-profiles modules/metrics.py and the scoring path of pages/student_app.py on
+# synthetic data for every datathon type, and writes the results as JSON so runs of two versions
+# can be compared (see --compare).
+#
+# Run from the repository root:
+#   python -m benchmarks.bench_scoring --output results.json
+#   python -m benchmarks.bench_scoring --sizes 1e3 1e4 1e5 1e6 1e7 1e8 --max-parse-rows 1e7
+#   python -m benchmarks.bench_scoring --output new.json --compare old.json
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_REPEATS = 5
+DEFAULT_MAX_PARSE_ROWS = 10_000_000 # The CSV of 1e8 rows alone takes several GB of memory
+N_CLASSES = 3
+
+# DataFrame wrapper benchmarked for each datathon type
+CALCULATE_FUNCTIONS = {
+    "regression": metrics.calculate_regression_metrics,
+    "classification": metrics.calculate_classification_metrics,
+    "forecasting": metrics.calculate_forecasting_metrics,
+    "sarima": metrics.calculate_sarima_metrics,
+}
+
+def make_synthetic_data(datathon_type: str, n_rows: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Returns (y_true, y_pred) with realistic values for the task type: labels for classification, noisy series otherwise."""
+    rng = np.random.default_rng(seed)
+    if datathon_type == "classification":
+        y_true = rng.integers(0, N_CLASSES, n_rows)
+        wrong = rng.random(n_rows) < 0.2 # 80% accuracy
+        y_pred = np.where(wrong, rng.integers(0, N_CLASSES, n_rows), y_true)
+        return y_true, y_pred
+    if datathon_type == "regression":
+        y_true = rng.normal(50.0, 10.0, n_rows)
+    else:
+        # Positive seasonal series, as MAPE expects
+        t = np.arange(n_rows, dtype=np.float64)
+        y_true = 100.0 + 10.0 * np.sin(2 * np.pi * t / 12) + rng.normal(0.0, 1.0, n_rows)
+    y_pred = y_true + rng.normal(0.0, 2.0, n_rows)
+    return y_true, y_pred
+
+def _time_calls(func, repeats: int) -> list[float]:
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+def _peak_memory(func) -> int:
+    """Peak bytes allocated by one call (NumPy buffers are tracked by tracemalloc too)."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def measure(func, repeats: int) -> dict:
+    func() # Warm-up (imports, lazy caches) is not part of the measurement
+    durations = _time_calls(func, repeats)
+    return {
+        "repeats": repeats,
+        "best_s": min(durations),
+        "median_s": statistics.median(durations),
+        "peak_mib": _peak_memory(func) / 2**20,
+    }
+
+def _prediction_csv(y_pred: np.ndarray, ids: np.ndarray | None = None) -> bytes:
+    columns = {"Predicted": y_pred}
+    if ids is not None:
+        columns = {"ID": ids, **columns}
+    return pd.DataFrame(columns).to_csv(index=False).encode()
+
+def _parse_and_score(csv_bytes: bytes, truth: ground_truth.GroundTruth, plan: metrics.ScoringPlan):
+    """Mirrors the scoring block of student_app.py once the ground truth is cached: parse, align, score."""
+    df_predictions = data_loader.read_csv_columns(io.BytesIO(csv_bytes), columns=["Predicted", "ID"],
+                                                  dtype={"Predicted": plan.value_dtype} if plan.value_dtype else None)
+    y_pred = df_predictions["Predicted"].to_numpy()
+    if truth.id_index is not None and "ID" in df_predictions.columns:
+        y_pred, _ = truth.id_index.align(df_predictions["ID"].to_numpy(), y_pred)
+    return plan.score(truth.actual, y_pred, truth_stats=truth.stats(plan.datathon_type))
+
+def benchmark_case(datathon_type: str, n_rows: int, repeats: int, max_parse_rows: int) -> list[dict]:
+    """All benchmarks of one task type at one size."""
+    y_true, y_pred = make_synthetic_data(datathon_type, n_rows)
+    plan = metrics.get_scoring_plan(datathon_type)
+    df_true = pd.DataFrame({"Actual": y_true})
+    df_pred = pd.DataFrame({"Predicted": y_pred})
+    calculate = CALCULATE_FUNCTIONS[datathon_type]
+
+    truth = ground_truth.GroundTruth("benchmark", "0", "Actual", ground_truth._column_to_array(df_true["Actual"]))
+    truth_stats = truth.stats(datathon_type)
+
+    cases = {
+        "calculate_metrics": lambda: calculate(df_true, df_pred, "Actual", "Predicted"),
+        "kernel_cached_truth": lambda: plan.score(truth.actual, y_pred, truth_stats=truth_stats),
+        "precompute_truth_stats": lambda: metrics.precompute_truth_stats(truth.actual, datathon_type),
+    }
+    if n_rows <= max_parse_rows:
+        csv_bytes = _prediction_csv(y_pred)
+        cases["parse_and_score"] = lambda: _parse_and_score(csv_bytes, truth, plan)
+
+        # Same path with a shuffled file matched to the truth by ID
+        ids = np.arange(n_rows)
+        truth_by_id = ground_truth.GroundTruth("benchmark", "0", "Actual", truth.actual, id_col="ID",
+                                               id_index=ground_truth.IdIndex.from_column(pd.Series(ids)))
+        truth_by_id.stats(datathon_type)
+        shuffle = np.random.default_rng(1).permutation(n_rows)
+        shuffled_csv = _prediction_csv(y_pred[shuffle], ids[shuffle])
+        cases["parse_and_score_by_id"] = lambda: _parse_and_score(shuffled_csv, truth_by_id, plan)
+
+    results = []
+    for name, func in cases.items():
+        result = {"task": datathon_type, "benchmark": name, "rows": n_rows, **measure(func, repeats)}
+        result["rows_per_s"] = n_rows / result["best_s"] if result["best_s"] > 0 else None
+        results.append(result)
+        print(f"{datathon_type:>14} {name:>22} {n_rows:>11,} rows  best {result['best_s'] * 1e3:10.2f} ms  "
+              f"peak {result['peak_mib']:9.1f} MiB")
+    return results
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(sizes: list[int], task_types: list[str], repeats: int, max_parse_rows: int) -> dict:
+    results = []
+    for n_rows in sizes:
+        for datathon_type in task_types:
+            results.extend(benchmark_case(datathon_type, n_rows, repeats, max_parse_rows))
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+        },
+        "results": results,
+    }
+
+def compare(previous: dict, current: dict):
+    """Prints the time and memory ratio (current / previous) of every benchmark present in both runs."""
+    def _key(result):
+        return result["task"], result["benchmark"], result["rows"]
+
+    previous_results = {_key(result): result for result in previous["results"]}
+    print(f"\nComparison with {previous['meta'].get('git_revision')} (ratios < 1 are improvements):")
+    for result in current["results"]:
+        old = previous_results.get(_key(result))
+        if old is None or not old["best_s"] or not old["peak_mib"]:
+            continue
+        print(f"{result['task']:>14} {result['benchmark']:>22} {result['rows']:>11,} rows  "
+              f"time x{result['best_s'] / old['best_s']:6.2f}  memory x{result['peak_mib'] / old['peak_mib']:6.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark metric calculation and submission scoring.")
+    parser.add_argument("--sizes", nargs="+", type=float, default=DEFAULT_SIZES, help="Row counts, e.g. 1e3 1e6")
+    parser.add_argument("--tasks", nargs="+", choices=sorted(metrics.METRIC_REGISTRY), default=sorted(metrics.METRIC_REGISTRY))
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--max-parse-rows", type=float, default=DEFAULT_MAX_PARSE_ROWS,
+                        help="Largest size for which the CSV parse-and-score benchmarks run")
+    parser.add_argument("--output", help="Write the JSON results to this file (default: stdout)")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare against")
+    args = parser.parse_args()
+
+    report = run_benchmarks([int(size) for size in args.sizes], args.tasks, args.repeats, int(args.max_parse_rows))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
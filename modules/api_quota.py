@@ -0,0 +1,218 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+import gspread
+from modules import config
+
+# --- Quota-aware request layer for the Sheets and Drive APIs ---
+# Every request of the pooled clients (see client_pool) goes through here: gspread clients use
+# QuotaHTTPClient and Drive services send their requests over a QuotaHttp. Each request first takes
+# a token from the bucket of its API and kind (read or write), sized to the project's quota
+# (config.API_QUOTA_PER_MINUTE), so bursts (e.g. the login rush at the start of an event) are spread
+# out instead of being rejected with 429. Failed requests are retried with exponential backoff and
+# jitter, so the user's action is only lost once API_MAX_RETRIES retries failed:
+# - Rate-limit rejections (429, Drive's 403 rateLimitExceeded) are retried for every request, since
+#   the server refused them before applying anything.
+# - Server errors (408, 5xx) and dropped connections are retried only for reads (GET/HEAD). A write
+#   may have been applied before the connection dropped, and sending it again would append a row
+#   twice, create a second file or delete the next row.
+# Requests that retry on their own (resumable upload chunks, execute(num_retries=...)) are sent inside
+# `with api_quota.caller_retries():`, so the retries are not stacked.
+#
+# When requests queue for tokens, those of a higher priority go first: scoring writes before
+# interactive team operations, and those before admin refreshes. Callers set the priority of the
+# requests made by the current thread with `with api_quota.priority(...)`.
+# Counters of throttled and retried calls are kept per bucket (see api_counters).
+
+PRIORITY_SCORING = 0
+PRIORITY_INTERACTIVE = 1 # Default
+PRIORITY_ADMIN = 2
+
+_READ_METHODS = ("GET", "HEAD")
+_RETRYABLE_READ_STATUS = {408, 500, 502, 503, 504}
+_RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "usageLimits")
+
+_local = threading.local()
+_COUNTERS = Counter() # (bucket name, event) -> count
+_COUNTERS_LOCK = threading.Lock()
+
+@contextmanager
+def priority(level: int):
+    """Requests made by this thread inside the block wait for tokens with this priority (lower goes first)."""
+    previous = getattr(_local, 'priority', PRIORITY_INTERACTIVE)
+    _local.priority = level
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+def current_priority() -> int:
+    return getattr(_local, 'priority', PRIORITY_INTERACTIVE)
+
+@contextmanager
+def caller_retries():
+    """Requests made by this thread inside the block are sent once: the caller retries them itself."""
+    previous = getattr(_local, 'caller_retries', False)
+    _local.caller_retries = True
+    try:
+        yield
+    finally:
+        _local.caller_retries = previous
+
+def _count(bucket_name: str, event: str):
+    with _COUNTERS_LOCK:
+        _COUNTERS[(bucket_name, event)] += 1
+
+def api_counters() -> dict:
+    """{"sheets.read": {"calls": n, "throttled": n, "retried": n, "gave_up": n}, ...} since the process started."""
+    counters = {}
+    with _COUNTERS_LOCK:
+        for (bucket_name, event), count in _COUNTERS.items():
+            counters.setdefault(bucket_name, {"calls": 0, "throttled": 0, "retried": 0, "gave_up": 0})[event] = count
+    return counters
+
+class TokenBucket:
+    """
+    Token bucket refilled at `per_minute` tokens per minute, holding at most API_QUOTA_BURST_SECONDS of
+    them. Waiting callers are served by priority, then in arrival order.
+    """
+
+    def __init__(self, name: str, per_minute: float):
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * config.API_QUOTA_BURST_SECONDS)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiters = [] # heap of (priority, arrival) tickets
+        self._arrivals = itertools.count()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, level: int = PRIORITY_INTERACTIVE) -> bool:
+        """Takes one token, waiting for it if needed. Returns True if the caller had to wait."""
+        with self._cond:
+            ticket = (level, next(self._arrivals))
+            heapq.heappush(self._waiters, ticket)
+            waited = False
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] == ticket:
+                        if self.tokens >= 1:
+                            self.tokens -= 1
+                            return waited
+                        self._cond.wait((1 - self.tokens) / self.rate) # Until the next token
+                    else:
+                        self._cond.wait() # Until a caller ahead of this one got its token
+                    waited = True
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+_BUCKETS = {}
+_BUCKETS_LOCK = threading.Lock()
+
+def get_bucket(api: str, kind: str) -> TokenBucket:
+    """The process-wide bucket of an API ("sheets" or "drive") and request kind ("read" or "write")."""
+    with _BUCKETS_LOCK:
+        bucket = _BUCKETS.get((api, kind))
+        if bucket is None:
+            bucket = _BUCKETS[(api, kind)] = TokenBucket(f"{api}.{kind}", config.API_QUOTA_PER_MINUTE[(api, kind)])
+        return bucket
+
+def _classify(method: str, url: str) -> tuple[str, str]:
+    api = "sheets" if "sheets.googleapis.com" in url else "drive"
+    return api, ("read" if method.upper() in _READ_METHODS else "write")
+
+def is_rate_limited(status: int, body) -> bool:
+    """429, or Drive's 403 with a rateLimitExceeded reason: the request was rejected without being applied."""
+    if status == 429:
+        return True
+    if status == 403 and body:
+        text = body.decode('utf-8', 'replace') if isinstance(body, bytes) else str(body)
+        return any(reason in text for reason in _RATE_LIMIT_REASONS)
+    return False
+
+def is_retryable(method: str, status: int, body) -> bool:
+    """Rate limits for any request; timeouts and server errors only for reads, which are safe to repeat."""
+    if is_rate_limited(status, body):
+        return True
+    return method.upper() in _READ_METHODS and status in _RETRYABLE_READ_STATUS
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff (attempt 0, 1, 2, ...) with jitter: a random delay in [d/2, d]."""
+    delay = min(config.API_RETRY_MAX_DELAY_SECONDS, config.API_RETRY_BASE_DELAY_SECONDS * 2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+def call_with_quota(method: str, url: str, send, response_status):
+    """
+    Sends one API request through the bucket of its API and kind, retrying retryable failures.
+
+    Args:
+        method, url: Of the request (used to pick the bucket).
+        send: Callable sending the request once; returns the response (or raises).
+        response_status: Callable(response) -> (status, body) used to spot retryable responses.
+
+    Returns:
+        The last response (failures that could not be retried are returned or raised as usual).
+    """
+    bucket = get_bucket(*_classify(method, url))
+    level = current_priority()
+    max_retries = 0 if getattr(_local, 'caller_retries', False) else config.API_MAX_RETRIES
+    for attempt in range(max_retries + 1):
+        _count(bucket.name, "calls")
+        if bucket.acquire(level):
+            _count(bucket.name, "throttled")
+        try:
+            response = send()
+        except OSError as e: # Dropped connection or socket timeout (requests errors are OSErrors too)
+            if method.upper() not in _READ_METHODS: # A write may have been applied: never resent
+                raise
+            if attempt == max_retries:
+                _count(bucket.name, "gave_up")
+                raise
+            print(f"Warning (api_quota): {method} {bucket.name} failed ({e}); retrying.")
+        else:
+            status, body = response_status(response)
+            if not is_retryable(method, status, body):
+                return response
+            if attempt == max_retries:
+                _count(bucket.name, "gave_up")
+                return response
+        _count(bucket.name, "retried")
+        time.sleep(backoff_delay(attempt))
+
+class QuotaHTTPClient(gspread.http_client.HTTPClient):
+    """gspread HTTP client whose requests go through the quota buckets (see call_with_quota)."""
+
+    def request(self, method, endpoint, params=None, data=None, json=None, files=None, headers=None):
+        def _send():
+            return self.session.request(method=method, url=endpoint, json=json, params=params, data=data,
+                                        files=files, headers=headers, timeout=self.timeout)
+        response = call_with_quota(method, endpoint, _send, lambda r: (r.status_code, r.content))
+        if response.ok:
+            return response
+        raise gspread.exceptions.APIError(response)
+
+class QuotaHttp:
+    """Wraps the (authorized) httplib2 Http of a googleapiclient service so its requests go through the quota buckets."""
+
+    def __init__(self, http):
+        self.http = http
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        def _send():
+            return self.http.request(uri, method, body=body, headers=headers, **kwargs)
+        return call_with_quota(method, uri, _send, lambda response: (response[0].status, response[1]))
+
+    def __getattr__(self, name):
+        return getattr(self.http, name) # credentials, timeout, close(), ...
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+import gspread
+import httplib2
+import google_auth_httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import HttpRequest
+from modules import api_quota, config
+
+# --- Process-wide API client pool ---
+# Building a Drive service parses the discovery document and sets up a new HTTP client; authorizing
+# gspread sets up a new session. Both are done once per credential identity (OAuth client + refresh
+# token) and the clients are reused by every session and rerun of this process.
+#
+# The Drive discovery document is the static copy bundled with google-api-python-client, parsed once.
+# googleapiclient service objects share one httplib2.Http, which is not thread-safe, and Streamlit
+# runs every session in its own thread: pooled services therefore build each request on a
+# keep-alive Http owned by the calling thread (see _ThreadLocalRequestBuilder).
+#
+# Every request of a pooled client goes through the quota buckets and retry policy of api_quota.
+
+_POOL_LOCK = threading.Lock()
+_DRIVE_SERVICES = OrderedDict() # identity -> Drive service, least recently used first
+_GSPREAD_CLIENTS = OrderedDict() # identity -> gspread.Client
+
+def credentials_identity(credentials) -> str:
+    """A stable key for credentials that survives token refreshes (the access token itself changes hourly)."""
+    stable_part = credentials.refresh_token or credentials.token
+    return hashlib.sha256(f"{credentials.client_id}|{stable_part}".encode('utf-8')).hexdigest()
+
+@lru_cache(maxsize=None)
+def _discovery_document(service_name: str, version: str) -> dict:
+    """The bundled discovery document, read from the local package and parsed once per process."""
+    return json.loads(get_static_doc(service_name, version))
+
+class _ThreadLocalRequestBuilder:
+    """requestBuilder that sends each request over a keep-alive Http belonging to the calling thread."""
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self._local = threading.local()
+
+    def http(self):
+        authorized_http = getattr(self._local, 'http', None)
+        if authorized_http is None:
+            authorized_http = api_quota.QuotaHttp(google_auth_httplib2.AuthorizedHttp(
+                self.credentials, http=httplib2.Http(timeout=config.API_HTTP_TIMEOUT_SECONDS)))
+            self._local.http = authorized_http
+        return authorized_http
+
+    def __call__(self, http, *args, **kwargs):
+        return HttpRequest(self.http(), *args, **kwargs)
+
+def _pooled(pool: OrderedDict, identity: str, create):
+    """Returns the pooled client of an identity, creating it if needed and evicting the least recently used."""
+    with _POOL_LOCK:
+        client = pool.get(identity)
+        if client is not None:
+            pool.move_to_end(identity)
+            return client
+    client = create() # Outside the lock: building a client must not block other sessions
+    with _POOL_LOCK:
+        client = pool.setdefault(identity, client)
+        pool.move_to_end(identity)
+        while len(pool) > config.CLIENT_POOL_MAX_ENTRIES:
+            pool.popitem(last=False)
+    return client
+
+def get_drive_service(credentials):
+    """A warm Drive v3 service for these credentials (safe to use from any thread)."""
+    def _create():
+        return build_from_document(_discovery_document('drive', 'v3'), credentials=credentials,
+                                   requestBuilder=_ThreadLocalRequestBuilder(credentials))
+    return _pooled(_DRIVE_SERVICES, credentials_identity(credentials), _create)
+
+def get_gspread_client(credentials) -> gspread.Client:
+    """A warm gspread client for these credentials (its requests session keeps connections alive)."""
+    return _pooled(_GSPREAD_CLIENTS, credentials_identity(credentials),
+                   lambda: gspread.authorize(credentials, http_client=api_quota.QuotaHTTPClient))
+
+def clear_client_pool():
+    """Drops every pooled client (e.g. after credentials were revoked)."""
+    with _POOL_LOCK:
+        _DRIVE_SERVICES.clear()
+        _GSPREAD_CLIENTS.clear()
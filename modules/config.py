@@ -11,29 +11,114 @@ MAX_TEAM_SIZE = 4
 # Leaderboard Display Configuration
 DECIMAL_FORMAT = "{:.4f}" # For formatting scores in the leaderboard
 
-PRIMARY_METRICS = {
-    "regression": "R²",  # Or "MSE", "MAE" - R² is common for higher-is-better
-    "classification": "F1-Score", # Or "Accuracy", "Precision", "Recall"
-    "forecasting": "MAPE (%)",    # Or "RMSE" - MAPE is often preferred for interpretability
-    "sarima": "MAPE (%) (SARIMA)" # Or "RMSE (SARIMA)"
-}
+# The metrics reported for each datathon type, their sort direction and the default primary
+# (ranking) metric are declared in metrics.METRIC_REGISTRY. To rank a datathon type by a different
+# metric, map its lowercase type to one of its metric names here, e.g. {"regression": "MAE"}.
+PRIMARY_METRIC_OVERRIDES = {}
+
+# --- Team Roster Cache ---
+# The rows of each "Teams" worksheet are cached in memory (see team_roster). The spreadsheet's Drive
+# modifiedTime is checked for edits made outside the app at most this often...
+ROSTER_REVISION_CHECK_SECONDS = 10
+# ...and the rows are reloaded once they are this old (the only refresh if modifiedTime is not readable)
+ROSTER_CACHE_TTL_SECONDS = 60
+
+# --- Sheets Write Queue ---
+# Writes to a worksheet are collected for this long and sent as one request (see sheet_write_queue)
+SHEET_WRITE_COALESCE_SECONDS = 0.5
+# How long a team operation waits for its queued write to be sent before reporting a failure
+SHEET_WRITE_TIMEOUT_SECONDS = 60
+
+# --- Submissions Sheet Layout ---
+# Columns at the start of every "Submissions_<datathon_id>" worksheet; the metric columns
+# (named exactly like the keys returned by metrics.py) follow them.
+SUBMISSION_BASE_COLUMNS = ["TeamName", "Timestamp", "DatathonID", "PredictionFileID"]
+SUBMISSION_PREDICTION_FILE_ID_COLUMN = "PredictionFileID"
+# Format of the Timestamp column (second resolution; written as raw text so it reads back unchanged)
+SUBMISSION_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Optional row identifier. If both the test outputs and a prediction file have this column, predictions
+# are matched to the true values by ID (any row order is accepted); otherwise they are matched by position.
+ID_COLUMN_NAME = "ID"
+
+# Rows of an uploaded prediction file whose values are type-checked before the ground truth is loaded
+PREDICTION_VALIDATION_SAMPLE_ROWS = 1000
+# Uploaded prediction files from this size on are scored chunk by chunk (metrics.calculate_streaming_metrics),
+# unless their rows are matched to the test outputs by ID, which needs the whole file
+STREAMING_SCORING_MIN_BYTES = 256 * 1024 * 1024
+
+# Number of worker processes used to rescore all submissions of a datathon (None = one per CPU core)
+RESCORING_MAX_WORKERS = None
+
+# --- Submission Log ---
+# Scored submissions are appended to "Submissions_<datathon_id>" by a background writer (see submission_log):
+# rows arriving within this window are sent together (at most SUBMISSION_LOG_MAX_BATCH_ROWS per request)
+SUBMISSION_LOG_BATCH_SECONDS = 2
+SUBMISSION_LOG_MAX_BATCH_ROWS = 500
+# Delay before rows whose append failed are retried, and how long shutdown waits for queued rows to be written
+SUBMISSION_LOG_RETRY_SECONDS = 30
+SUBMISSION_LOG_SHUTDOWN_TIMEOUT_SECONDS = 120
+# Where uploaded prediction files are stored (their IDs go in the PredictionFileID column, for rescoring):
+# a Drive folder ID (None = My Drive), or a folder under the local storage root
+DRIVE_PREDICTIONS_FOLDER_ID = None
+LOCAL_PREDICTIONS_FOLDER = "predictions"
+
+# --- Dataset Profiles ---
+# Summaries stored next to uploaded datasets (see dataset_profile): values listed for discrete
+# columns, and histogram bins for continuous targets
+DATASET_PROFILE_TOP_VALUES = 10
+DATASET_PROFILE_HISTOGRAM_BINS = 10
+
+# --- Storage Backend ---
+# Where datasets, prediction files and the UI config are stored: "drive" (Google Drive) or "local"
+# (a directory on this machine, for offline rehearsals and benchmarks). st.secrets["storage"]
+# ("backend", "local_root", "local_folder") overrides these.
+STORAGE_BACKEND = "drive"
+LOCAL_STORAGE_ROOT = "local_storage"
+# Folder (under the root) that uploads go to and datasets are listed from
+LOCAL_STORAGE_DEFAULT_FOLDER = "datasets"
+
+# --- Local Drive Download Cache ---
+# Directory for cached Drive downloads (None = "datathon_hub_drive_cache" in the system temp directory)
+DRIVE_CACHE_DIR = None
+# Disk budget of the cache in bytes; least recently used files are evicted beyond it
+DRIVE_CACHE_MAX_BYTES = 2 * 1024**3
+# Size of each download request, and the number of downloaded chunks a streaming parse may buffer
+DRIVE_DOWNLOAD_CHUNK_BYTES = 8 * 1024**2
+DRIVE_STREAM_QUEUE_CHUNKS = 4
+
+# Maximum age of the cached listing of a Drive folder before it is listed again from scratch
+# (in between, it is kept current from the Drive changes feed)
+DRIVE_FOLDER_INDEX_TTL_SECONDS = 15 * 60
 
-# Defines sort order for the primary metric (True = Ascending, False = Descending)
-PRIMARY_METRIC_SORT_ASCENDING = {
-    "R²": False,          # Higher R² is better
-    "F1-Score": False,    # Higher F1-Score is better
-    "MAPE (%)": True,     # Lower MAPE is better
-    "MAPE (%) (SARIMA)": True, # Lower MAPE is better
-    "MSE": True,          # Lower MSE is better
-    "MAE": True,          # Lower MAE is better
-    "RMSE": True,         # Lower RMSE is better
-    "RMSE (SARIMA)": True # Lower RMSE is better
-    # Add other metrics if they can be chosen as primary
+# --- API Clients ---
+# Drive services and gspread clients kept warm per credential identity (least recently used dropped first)
+CLIENT_POOL_MAX_ENTRIES = 32
+# Socket timeout of pooled Drive connections
+API_HTTP_TIMEOUT_SECONDS = 60
+# Requests per minute allowed by the Google Cloud project's quotas, per (API, request kind); every request
+# of the pooled clients waits for a token of its bucket (see api_quota). Lower them if the project's
+# quotas are lower, e.g. the Sheets defaults are 300 per minute per project for reads and for writes.
+API_QUOTA_PER_MINUTE = {
+    ("sheets", "read"): 300,
+    ("sheets", "write"): 300,
+    ("drive", "read"): 12000,
+    ("drive", "write"): 180, # Drive sustains about 3 writes per second
 }
+# Seconds of quota a bucket may spend at once after being idle
+API_QUOTA_BURST_SECONDS = 10
+# Retries of rate-limited requests (429, Drive 403 rateLimitExceeded), and of reads that failed (5xx) or
+# were dropped, with exponential backoff (base delay doubled per retry, capped) and jitter
+API_MAX_RETRIES = 5
+API_RETRY_BASE_DELAY_SECONDS = 1
+API_RETRY_MAX_DELAY_SECONDS = 32
 
-# Ensure the metric names used as keys in PRIMARY_METRIC_SORT_ASCENDING
-# exactly match the values provided in PRIMARY_METRICS and the keys in the
-# dictionaries returned by the metrics calculation functions in metrics.py.
+# --- Drive Uploads ---
+# Files uploaded at the same time (train, test inputs, test outputs), each over its own connection
+DRIVE_UPLOAD_MAX_WORKERS = 3
+# Bytes sent per resumable upload request (must be a multiple of 256 KiB) and retries of each chunk
+DRIVE_UPLOAD_CHUNK_BYTES = 8 * 1024**2
+DRIVE_UPLOAD_NUM_RETRIES = 5
 
 # --- Teacher Admin Authentication ---
 # IMPORTANT: Change this to a strong, unique, random token in your actual deployment!
@@ -1,12 +1,17 @@
 import streamlit as st
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseUpload, MediaIoBaseDownload # Added MediaIoBaseDownload
 import io # For BytesIO or StringIO if needed for wrapping file content
 import os # For future use if handling client_secret.json directly, though st.secrets is preferred
+import hashlib
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 import pandas as pd # Added pandas
+from modules import api_quota, client_pool, config, dataset_profile, drive_cache, drive_index
 
 # Define the scopes needed for the application
 SCOPES = ['https://www.googleapis.com/auth/drive.file', 'https://www.googleapis.com/auth/drive.metadata.readonly']
@@ -161,7 +166,7 @@ def get_drive_service():
 
         # If credentials are valid or refreshable by library
         try:
-            service = build('drive', 'v3', credentials=credentials)
+            service = client_pool.get_drive_service(credentials) # Pooled per credential identity, built once
             # Test call to check if token is valid and refresh works
             # service.about().get(fields="user").execute() 
             # st.success("Successfully connected to Google Drive.") # Optional success message
@@ -217,6 +222,121 @@ def display_file_uploaders(competition_type: str) -> dict:
 # Consider making this configurable via st.secrets
 DEFAULT_TARGET_DRIVE_FOLDER_ID = "REPLACE_WITH_YOUR_ACTUAL_GOOGLE_DRIVE_FOLDER_ID"
 
+# Kinds of datathon files that can be uploaded; each is stored as "<kind>_<unique_id>.csv"
+UPLOAD_FILE_KINDS = ('train', 'test_inputs', 'test_outputs')
+
+def upload_file_name(key: str, unique_id: str) -> str | None:
+    """Stored file name of an uploaded datathon file, or None if key is not one of UPLOAD_FILE_KINDS."""
+    return f"{key}_{unique_id}.csv" if key in UPLOAD_FILE_KINDS else None
+
+# Resumable upload sessions of interrupted uploads in this process:
+# (folder ID, file name, size, md5) -> session URI. Uploading the same content again resumes the session.
+_INTERRUPTED_UPLOADS = {}
+_INTERRUPTED_UPLOADS_LOCK = threading.Lock()
+
+def _file_size_and_md5(file_obj) -> tuple[int, str]:
+    file_obj.seek(0)
+    md5 = hashlib.md5()
+    size = 0
+    for block in iter(lambda: file_obj.read(1024 * 1024), b''):
+        md5.update(block)
+        size += len(block)
+    file_obj.seek(0)
+    return size, md5.hexdigest()
+
+def _resume_upload_session(request, session_uri: str, size: int) -> dict | None:
+    """
+    Points a resumable request at an earlier session and moves it to the first byte Drive has not stored.
+    Returns the file resource if that session had already completed, else None.
+    """
+    resp, content = request.http.request(session_uri, method='PUT', headers={'Content-Length': '0', 'Content-Range': f'bytes */{size}'})
+    if resp.status in (200, 201):
+        return json.loads(content.decode('utf-8'))
+    if resp.status == 308:
+        request.resumable_uri = session_uri
+        # Range is "bytes=0-<last byte received>"; absent if nothing was stored yet
+        request.resumable_progress = int(resp['range'].rsplit('-', 1)[1]) + 1 if 'range' in resp else 0
+    # Any other status (e.g. 404 once the session expired) starts a new session
+    return None
+
+def _upload_file_resumable(credentials_info: dict | None, drive_service, file_obj, drive_filename: str, target_folder_id: str,
+                           key: str, progress_queue: queue.Queue, size_and_md5: tuple[int, str] | None = None) -> dict:
+    """
+    Uploads one file in chunks over a resumable session and returns its file resource (id, md5Checksum, modifiedTime).
+    Runs in a worker thread: uses the pooled Drive service of credentials_info, which sends requests over a
+    connection owned by the calling thread (uses drive_service if credentials_info is None),
+    retries each chunk and reports (key, fraction) to progress_queue. Errors are raised to the caller.
+    size_and_md5 is the file's (size, md5) if the caller already hashed it.
+    """
+    service = client_pool.get_drive_service(Credentials(**credentials_info)) if credentials_info else drive_service
+    size, md5 = size_and_md5 or _file_size_and_md5(file_obj)
+    session_key = (target_folder_id, drive_filename, size, md5)
+
+    media = MediaIoBaseUpload(file_obj, mimetype='text/csv', chunksize=config.DRIVE_UPLOAD_CHUNK_BYTES, resumable=True)
+    request = service.files().create(
+        body={'name': drive_filename, 'parents': [target_folder_id]},
+        media_body=media,
+        fields='id, md5Checksum, modifiedTime'
+    )
+
+    response = None
+    with _INTERRUPTED_UPLOADS_LOCK:
+        session_uri = _INTERRUPTED_UPLOADS.get(session_key)
+    if session_uri:
+        response = _resume_upload_session(request, session_uri, size)
+    try:
+        while response is None:
+            with api_quota.caller_retries(): # next_chunk retries the chunk itself
+                status, response = request.next_chunk(num_retries=config.DRIVE_UPLOAD_NUM_RETRIES)
+            if status:
+                progress_queue.put((key, status.progress()))
+    except Exception:
+        if request.resumable_uri:
+            with _INTERRUPTED_UPLOADS_LOCK:
+                _INTERRUPTED_UPLOADS[session_key] = request.resumable_uri
+        raise
+    with _INTERRUPTED_UPLOADS_LOCK:
+        _INTERRUPTED_UPLOADS.pop(session_key, None)
+    progress_queue.put((key, 1.0))
+
+    # Keep a local (and columnar) copy, so the first load of this dataset skips download and parse
+    cached_path = drive_cache.store_uploaded_file(response, file_obj)
+    _write_profile_sidecar(service, response['id'], target_folder_id, file_obj, cached_path)
+    return response
+
+def _write_profile_sidecar(service, file_id: str, folder_id: str, file_obj, cached_path: str | None = None):
+    """
+    Profiles an uploaded CSV (see dataset_profile) and stores the profile as a JSON file in the same
+    Drive folder. Reuses the columnar copy at cached_path if there is one. Failures only print a warning.
+    """
+    try:
+        df = drive_cache.read_columnar_copy(cached_path) if cached_path else None
+        if df is None:
+            file_obj.seek(0)
+            df = pd.read_csv(file_obj)
+            file_obj.seek(0)
+        profile = dataset_profile.profile_dataframe(df)
+        dataset_profile.remember_profile(file_id, profile)
+        media = MediaIoBaseUpload(io.BytesIO(dataset_profile.profile_to_json(profile)), mimetype='application/json')
+        with api_quota.caller_retries():
+            service.files().create(
+                body={'name': dataset_profile.profile_file_name(file_id), 'parents': [folder_id]},
+                media_body=media,
+                fields='id'
+            ).execute(num_retries=config.DRIVE_UPLOAD_NUM_RETRIES)
+    except Exception as e:
+        print(f"Warning (data_loader._write_profile_sidecar): No profile stored for file {file_id}: {e}")
+
+def find_duplicate_file(existing_files: list, md5: str, file_name: str) -> dict | None:
+    """
+    The file among existing_files (metadata dicts with md5Checksum) whose content has this MD5, preferring
+    one with the same name; None if the content is new.
+    """
+    duplicates = [file_item for file_item in existing_files if file_item.get('md5Checksum') == md5]
+    if not duplicates:
+        return None
+    return next((file_item for file_item in duplicates if file_item.get('name') == file_name), duplicates[0])
+
 def upload_csvs_to_drive(uploaded_files: dict, unique_id: str, drive_service) -> dict:
     # Your implementation here
     file_ids_map = {}
@@ -237,74 +357,96 @@ def upload_csvs_to_drive(uploaded_files: dict, unique_id: str, drive_service) ->
                 file_ids_map[key_to_check] = None
         return file_ids_map
 
+    upload_jobs = {} # key -> (file object, Drive file name)
     for key, uploaded_file_obj in uploaded_files.items():
         if uploaded_file_obj is not None:
-            if key == 'train':
-                drive_filename = f"train_{unique_id}.csv"
-            elif key == 'test_inputs':
-                drive_filename = f"test_inputs_{unique_id}.csv"
-            elif key == 'test_outputs':
-                drive_filename = f"test_outputs_{unique_id}.csv"
-            else:
+            drive_filename = upload_file_name(key, unique_id)
+            if drive_filename is None:
                 st.warning(f"Unknown file type key '{key}'. Skipping upload.")
                 file_ids_map[key] = None # Mark as not uploaded
                 continue
+            upload_jobs[key] = (uploaded_file_obj, drive_filename)
+        else:
+            # Ensure key exists in map even if file object was None (e.g. for ARIMA models)
+            file_ids_map[key] = None 
 
-            file_metadata = {
-                'name': drive_filename,
-                'parents': [target_folder_id]
-            }
-            
+    # Byte-identical files already in the target folder are reused instead of uploaded again: each file is
+    # hashed locally and looked up by the MD5 checksum Drive keeps for every file (see drive_index).
+    try:
+        existing_files = drive_index.get_folder_files(drive_service, target_folder_id) if upload_jobs else []
+    except Exception as e:
+        print(f"Warning (data_loader.upload_csvs_to_drive): Could not list folder {target_folder_id} for duplicates ({e}). Uploading all files.")
+        existing_files = []
+    file_hashes = {}
+    for key, (uploaded_file_obj, drive_filename) in list(upload_jobs.items()):
+        file_hashes[key] = _file_size_and_md5(uploaded_file_obj)
+        duplicate = find_duplicate_file(existing_files, file_hashes[key][1], drive_filename)
+        if duplicate is not None:
+            file_ids_map[key] = duplicate['id']
+            del upload_jobs[key]
+            st.info(f"'{drive_filename}' is identical to '{duplicate.get('name')}' already on Google Drive. "
+                    f"Reusing it instead of uploading again. File ID: {duplicate['id']}")
+
+    # The files are uploaded concurrently, each by its own thread over its own connection of the
+    # pooled Drive service (see client_pool). Threads cannot call Streamlit, so they report
+    # progress through a queue and this thread draws it.
+    credentials_info = st.session_state.get('google_credentials')
+    if not isinstance(credentials_info, dict):
+        credentials_info = None # Without a serializable credentials dict, upload one by one with drive_service
+    progress_queue = queue.Queue()
+    progress_bars = {key: st.progress(0.0, text=f"Uploading '{drive_filename}'...") for key, (_, drive_filename) in upload_jobs.items()}
+
+    def _drain_progress():
+        while True:
             try:
-                # Reset read pointer of the BytesIO object from Streamlit
-                uploaded_file_obj.seek(0)
-                
-                media = MediaIoBaseUpload(
-                    uploaded_file_obj,
-                    mimetype='text/csv',
-                    resumable=True
-                )
-                
-                request = drive_service.files().create(
-                    body=file_metadata,
-                    media_body=media,
-                    fields='id'
-                )
-                
-                # For simplicity, direct execution is shown here.
-                # For large files, consider implementing resumable upload with progress:
-                # response = None
-                # with st.spinner(f"Uploading {drive_filename}..."):
-                #     while response is None:
-                #         status, response = request.next_chunk()
-                #         if status:
-                #             st.progress(status.progress()) # Show progress bar
-                # file = response
-                
-                file = request.execute()
-                
-                file_id = file.get('id')
-                file_ids_map[key] = file_id
-                st.success(f"Successfully uploaded '{drive_filename}' to Google Drive. File ID: {file_id}")
-
-            except HttpError as error:
-                error_details = "No additional details."
+                key, fraction = progress_queue.get_nowait()
+            except queue.Empty:
+                return
+            progress_bars[key].progress(min(fraction, 1.0), text=f"Uploading '{upload_jobs[key][1]}'... {fraction:.0%}")
+
+    upload_results = {}
+    if upload_jobs:
+        max_workers = config.DRIVE_UPLOAD_MAX_WORKERS if credentials_info else 1
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="drive-upload") as pool:
+            futures = {
+                pool.submit(_upload_file_resumable, credentials_info, drive_service, uploaded_file_obj, drive_filename,
+                            target_folder_id, key, progress_queue, file_hashes[key]): key
+                for key, (uploaded_file_obj, drive_filename) in upload_jobs.items()
+            }
+            pending = set(futures)
+            while pending:
+                _, pending = wait(pending, timeout=0.2)
+                _drain_progress()
+            for future, key in futures.items():
                 try:
-                    # Attempt to parse error content if it's JSON (common for Google API errors)
-                    if error.content:
-                        error_content_decoded = error.content.decode('utf-8')
-                        error_details = f"Details: {error_content_decoded}"
-                except Exception: # Fallback if decoding/parsing fails
-                     error_details = f"Raw error content: {error.content}"
-
-                st.error(f"An API error occurred while uploading '{drive_filename}': {error}. {error_details}")
-                file_ids_map[key] = None
-            except Exception as e:
-                st.error(f"An unexpected error occurred while uploading '{drive_filename}': {e}")
-                file_ids_map[key] = None
+                    upload_results[key] = (future.result(), None)
+                except Exception as e:
+                    upload_results[key] = (None, e)
+        _drain_progress()
+
+    for key, (file, error) in upload_results.items():
+        drive_filename = upload_jobs[key][1]
+        if error is None:
+            file_id = file.get('id')
+            file_ids_map[key] = file_id
+            st.success(f"Successfully uploaded '{drive_filename}' to Google Drive. File ID: {file_id}")
+        elif isinstance(error, HttpError):
+            error_details = "No additional details."
+            try:
+                # Attempt to parse error content if it's JSON (common for Google API errors)
+                if error.content:
+                    error_content_decoded = error.content.decode('utf-8')
+                    error_details = f"Details: {error_content_decoded}"
+            except Exception: # Fallback if decoding/parsing fails
+                 error_details = f"Raw error content: {error.content}"
+
+            st.error(f"An API error occurred while uploading '{drive_filename}': {error}. {error_details} "
+                     f"Uploading the same file again will resume where it stopped.")
+            file_ids_map[key] = None
         else:
-            # Ensure key exists in map even if file object was None (e.g. for ARIMA models)
-            file_ids_map[key] = None 
+            st.error(f"An unexpected error occurred while uploading '{drive_filename}': {error}. "
+                     f"Uploading the same file again will resume where it stopped.")
+            file_ids_map[key] = None
 
     # Ensure all expected keys ('train', 'test_inputs', 'test_outputs') are in file_ids_map
     # This handles cases where a key might have been skipped (e.g., unknown key) or if it wasn't in uploaded_files initially
@@ -314,63 +456,110 @@ def upload_csvs_to_drive(uploaded_files: dict, unique_id: str, drive_service) ->
             
     return file_ids_map
 
-def get_drive_shareable_link(file_id: str, drive_service) -> str | None:
+# --- Shareable links ---
+# Links of files already shared with "anyone with the link" are kept in a persistent cache (in the
+# local Drive cache directory), so reruns and restarts never call the permissions API for them again.
+# Files that are not cached yet are resolved together through the Drive batch endpoint.
+
+_LINK_CACHE_NAME = "shareable_links"
+_LINK_CACHE = None # file_id -> webViewLink, loaded lazily from disk
+_LINK_CACHE_LOCK = threading.Lock()
+_BATCH_MAX_REQUESTS = 100 # Drive batch limit; each file needs two requests
+
+def _shareable_link_cache() -> dict:
+    global _LINK_CACHE
+    if _LINK_CACHE is None:
+        _LINK_CACHE = drive_cache.load_cache_metadata(_LINK_CACHE_NAME) if drive_cache.cache_available() else {}
+    return _LINK_CACHE
+
+def get_drive_shareable_links(file_ids: list, drive_service, refresh: bool = False) -> dict:
+    """
+    Makes files readable by anyone with the link and returns their links, with one batched round trip
+    (per 50 files) for the files whose links are not cached yet.
+
+    Args:
+        file_ids: IDs of the Google Drive files.
+        drive_service: Authenticated Google Drive API service instance.
+        refresh: Ignore the cached links (e.g. after sharing was revoked on Drive).
+
+    Returns:
+        A dict file_id -> shareable link, or None for files whose link could not be obtained.
+    """
+    file_ids = [file_id for file_id in dict.fromkeys(file_ids) if file_id]
+    with _LINK_CACHE_LOCK:
+        link_cache = _shareable_link_cache()
+        links = {} if refresh else {file_id: link_cache[file_id] for file_id in file_ids if file_id in link_cache}
+    missing_ids = [file_id for file_id in file_ids if file_id not in links]
+    if not missing_ids:
+        return links
     if not drive_service:
         st.error("Google Drive service not available. Cannot get shareable link.")
-        return None
-    if not file_id:
-        st.warning("No file ID provided to get shareable link.")
-        return None
+        return {**links, **{file_id: None for file_id in missing_ids}}
 
-    try:
-        # First, try to set/ensure 'anyone with link can read' permission
-        permission_body = {'type': 'anyone', 'role': 'reader'}
-        drive_service.permissions().create(
-            fileId=file_id,
-            body=permission_body,
-            # Not sending email notification
-            # sendNotificationEmail=False 
-        ).execute()
-        
-        # After ensuring permission, get the file metadata including the webViewLink
-        file_metadata = drive_service.files().get(
-            fileId=file_id,
-            fields='id, name, webViewLink' # webViewLink should now be accessible
-        ).execute()
-        
-        shareable_link = file_metadata.get('webViewLink')
-        
-        if shareable_link:
-            # st.success(f"Successfully obtained shareable link for file: {file_metadata.get('name')}")
-            return shareable_link
-        else:
-            st.error(f"Could not retrieve shareable link for file ID {file_id} even after setting permissions.")
-            return None
+    shared_ids = set()        # Permission created
+    permission_errors = {}    # file_id -> HttpError of permissions().create
+    fetched = {}              # file_id -> webViewLink (or None)
 
-    except HttpError as error:
-        # A common error is 403 if 'anyone' permission already exists or conflicts.
-        # In such cases, the webViewLink might still be obtainable if the existing permission is sufficient.
-        if error.resp.status == 403:
-             st.warning(f"Could not create/update permission for file ID {file_id} (it might already exist or be restricted by domain policy): {error.content.decode()}. Attempting to retrieve existing link.")
-             # Try to get the link anyway
-             try:
-                file_metadata = drive_service.files().get(fileId=file_id, fields='webViewLink, name').execute()
-                link = file_metadata.get('webViewLink')
-                if link:
-                    # st.info(f"Retrieved existing shareable link for {file_metadata.get('name')}.")
-                    return link
-                else:
-                    st.error(f"No shareable link found for {file_id} after permission issue.")
-                    return None
-             except HttpError as e:
-                st.error(f"API error retrieving link for {file_id} after initial permission error: {e.content.decode()}")
-                return None
+    def _callback(request_id, response, exception):
+        kind, file_id = request_id.split(":", 1)
+        if kind == "perm":
+            if exception is None:
+                shared_ids.add(file_id)
+            else:
+                permission_errors[file_id] = exception
+        elif exception is None:
+            fetched[file_id] = response.get('webViewLink')
         else:
-            st.error(f"API error processing file ID {file_id}: {error.content.decode()}")
-            return None
-    except Exception as e:
-        st.error(f"An unexpected error occurred with file ID {file_id}: {e}")
+            fetched[file_id] = None
+            st.error(f"API error retrieving link for {file_id}: {exception}")
+
+    files_per_batch = _BATCH_MAX_REQUESTS // 2
+    for start in range(0, len(missing_ids), files_per_batch):
+        batch = drive_service.new_batch_http_request(callback=_callback)
+        for file_id in missing_ids[start:start + files_per_batch]:
+            # The webViewLink exists independently of the new permission, so both requests can share the batch
+            batch.add(drive_service.permissions().create(fileId=file_id, body={'type': 'anyone', 'role': 'reader'}),
+                      request_id=f"perm:{file_id}")
+            batch.add(drive_service.files().get(fileId=file_id, fields='id, name, webViewLink'),
+                      request_id=f"get:{file_id}")
+        try:
+            batch.execute()
+        except HttpError as error:
+            st.error(f"API error resolving shareable links: {error.content.decode()}")
+        except Exception as e:
+            st.error(f"An unexpected error occurred while resolving shareable links: {e}")
+
+    newly_shared = {}
+    for file_id in missing_ids:
+        link = fetched.get(file_id)
+        error = permission_errors.get(file_id)
+        if error is not None:
+            if getattr(error, 'resp', None) is not None and error.resp.status == 403:
+                # e.g. restricted by domain policy; the existing link may still be usable, but is not cached
+                st.warning(f"Could not create/update permission for file ID {file_id} (it might already exist or be restricted by domain policy): {error}.")
+            else:
+                st.error(f"API error processing file ID {file_id}: {error}")
+                link = None
+        elif link and file_id in shared_ids:
+            newly_shared[file_id] = link
+        if file_id in fetched and not link and error is None:
+            st.error(f"Could not retrieve shareable link for file ID {file_id}.")
+        links[file_id] = link
+
+    if newly_shared:
+        with _LINK_CACHE_LOCK:
+            link_cache = _shareable_link_cache()
+            link_cache.update(newly_shared)
+            if drive_cache.cache_available():
+                drive_cache.save_cache_metadata(_LINK_CACHE_NAME, link_cache)
+    return links
+
+def get_drive_shareable_link(file_id: str, drive_service) -> str | None:
+    """Shareable link of one file (see get_drive_shareable_links); served from the link cache once shared."""
+    if not file_id:
+        st.warning("No file ID provided to get shareable link.")
         return None
+    return get_drive_shareable_links([file_id], drive_service).get(file_id)
 
 def list_csv_files_from_drive(drive_service, folder_id: str = None) -> list:
     if not drive_service:
@@ -393,24 +582,9 @@ def list_csv_files_from_drive(drive_service, folder_id: str = None) -> list:
 
     csv_files = []
     try:
-        query = f"'{actual_folder_id}' in parents and mimeType='text/csv' and trashed=false"
-        
-        page_token = None
-        while True:
-            response = drive_service.files().list(
-                q=query,
-                spaces='drive',
-                fields='nextPageToken, files(id, name)',
-                pageSize=100, # Max 1000, but 100 is common for page size
-                pageToken=page_token
-            ).execute()
-            
-            for file_item in response.get('files', []):
-                csv_files.append({'id': file_item.get('id'), 'name': file_item.get('name')})
-            
-            page_token = response.get('nextPageToken', None)
-            if page_token is None:
-                break
+        # Listed once, then kept current with one changes-feed call per rerun (see drive_index)
+        for file_item in drive_index.get_folder_files(drive_service, actual_folder_id):
+            csv_files.append({'id': file_item.get('id'), 'name': file_item.get('name')})
         
         if csv_files:
             # Sort by name for consistent display
@@ -431,13 +605,74 @@ def list_csv_files_from_drive(drive_service, folder_id: str = None) -> list:
 # Ensure HttpError is imported: from googleapiclient.errors import HttpError
 # Ensure pandas as pd and io are imported.
 
-def download_csv_from_drive_to_dataframe(drive_service, file_id: str) -> pd.DataFrame | None:
+def _usecols(columns: list | None):
+    """usecols for pd.read_csv that parses only `columns`, ignoring those missing from the file (None = all)."""
+    return None if columns is None else (lambda column: column in columns)
+
+def read_csv_columns(csv_source, columns: list | None = None, dtype: dict | None = None, **read_csv_kwargs) -> pd.DataFrame:
+    """
+    pd.read_csv that parses only `columns` (those missing from the file are ignored) and parses the
+    columns in `dtype` (column -> dtype hint) straight into that type. If the values of a hinted column
+    do not fit its type, the file is parsed again without hints, so callers can report the bad values.
+    Sources that cannot be rewound (e.g. paths) are parsed once and the hints applied afterwards
+    (apply_dtype_hints), so they get the same dtypes. Other parsing errors are raised to the caller.
+    """
+    if dtype and hasattr(csv_source, 'seek'):
+        start = csv_source.tell()
+        try:
+            return pd.read_csv(csv_source, usecols=_usecols(columns), dtype=dtype, **read_csv_kwargs)
+        except ValueError as e:
+            if isinstance(e, (UnicodeDecodeError, pd.errors.ParserError)):
+                raise
+            csv_source.seek(start) # e.g. "could not convert string to float"
+    return apply_dtype_hints(pd.read_csv(csv_source, usecols=_usecols(columns), **read_csv_kwargs), dtype)
+
+def apply_dtype_hints(df: pd.DataFrame, dtype: dict | None) -> pd.DataFrame:
+    """Casts the hinted columns of an already parsed DataFrame, leaving those whose values do not fit."""
+    for column, column_dtype in (dtype or {}).items():
+        if column in df.columns and df[column].dtype != column_dtype:
+            try:
+                df[column] = df[column].astype(column_dtype)
+            except (ValueError, TypeError):
+                pass
+    return df
+
+def _read_csv_with_fallback_encoding(fh, file_id: str, columns: list | None = None, dtype: dict | None = None) -> pd.DataFrame | None:
+    """Parses a CSV file object (only `columns`, with dtype hints; see read_csv_columns), retrying with latin1 if the default parse fails."""
+    # Try to infer encoding, but utf-8 is common. Add error handling for parsing.
+    try:
+        df = read_csv_columns(fh, columns, dtype)
+        return df
+    except (pd.errors.ParserError, UnicodeDecodeError) as pe:
+        print(f"Pandas parsing error for file ID {file_id}: {pe}. Attempting with different encoding or delimiter if applicable.")
+        # Try common encodings
+        try:
+            fh.seek(0) # Reset buffer
+            df = read_csv_columns(fh, columns, dtype, encoding='latin1')
+            return df
+        except Exception as e_enc:
+            print(f"Failed to parse CSV with alternative encoding for file ID {file_id}: {e_enc}")
+            return None # Or raise the error to be handled by caller
+    except Exception as e_pd:
+        print(f"Error reading CSV into DataFrame for file ID {file_id}: {e_pd}")
+        return None
+
+def download_csv_from_drive_to_dataframe(drive_service, file_id: str, columns: list | None = None,
+                                         dtype: dict | None = None) -> pd.DataFrame | None:
     """
     Downloads a CSV file from Google Drive directly into a pandas DataFrame.
+    Loads prefer the typed columnar copy kept in the local cache (see drive_cache) and only
+    parse the CSV when there is none yet. A file that is not cached at all is parsed while it
+    downloads (see iter_drive_csv_chunks) and cached at the same time. With a column projection
+    only those columns are parsed; full loads also write the columnar copy (uploads made through
+    the app already have one, see drive_cache.store_uploaded_file).
 
     Args:
         drive_service: Authenticated Google Drive API service instance.
         file_id: The ID of the Google Drive file to download.
+        columns: Only load these columns (those missing from the file are ignored). All columns if None.
+        dtype: Optional dtype hints (column -> dtype, e.g. {'Predicted': 'float64'}); hinted columns are
+               parsed straight into that type when their values fit it.
 
     Returns:
         A pandas DataFrame containing the CSV data, or None if an error occurs.
@@ -452,36 +687,29 @@ def download_csv_from_drive_to_dataframe(drive_service, file_id: str) -> pd.Data
         return None
 
     try:
-        request = drive_service.files().get_media(fileId=file_id)
-        # Use io.BytesIO to handle the downloaded bytes stream
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request) # This is googleapiclient.http.MediaIoBaseDownload
-        
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-            # print(f"Download {int(status.progress() * 100)}%.") # Optional: console progress
+        if drive_cache.cache_available():
+            # Served from the local disk cache when the cached copy matches the file's current checksum
+            file_metadata = drive_cache.get_file_metadata(drive_service, file_id)
+            if file_metadata is None:
+                return None
+            path = drive_cache.entry_path(file_metadata)
+            df = drive_cache.read_columnar_copy(path, columns) if path else None
+            if df is not None:
+                return apply_dtype_hints(df, dtype)
+            if path and drive_cache.is_cached(path):
+                with open(path, 'rb') as fh:
+                    df = _read_csv_with_fallback_encoding(fh, file_id, columns, dtype)
+            else:
+                # The raw file is cached whole; only the projected columns are parsed
+                df = _stream_csv_from_drive(drive_service, file_id, columns=columns, dtype=dtype, file_metadata=file_metadata)
+            if df is not None and path and columns is None:
+                drive_cache.write_columnar_copy(path, df) # Only a full parse makes a complete columnar copy
+        else:
+            df = _stream_csv_from_drive(drive_service, file_id, columns=columns, dtype=dtype)
 
-        fh.seek(0) # Move cursor to the beginning of the BytesIO buffer
-        
-        # Read the CSV data from BytesIO into a pandas DataFrame
-        # Try to infer encoding, but utf-8 is common. Add error handling for parsing.
-        try:
-            df = pd.read_csv(fh)
-            return df
-        except pd.errors.ParserError as pe:
-            print(f"Pandas parsing error for file ID {file_id}: {pe}. Attempting with different encoding or delimiter if applicable.")
-            # Try common encodings
-            try:
-                fh.seek(0) # Reset buffer
-                df = pd.read_csv(fh, encoding='latin1')
-                return df
-            except Exception as e_enc:
-                print(f"Failed to parse CSV with alternative encoding for file ID {file_id}: {e_enc}")
-                return None # Or raise the error to be handled by caller
-        except Exception as e_pd:
-            print(f"Error reading CSV into DataFrame for file ID {file_id}: {e_pd}")
-            return None
+        if df is not None and columns is not None:
+            df = df[[column for column in columns if column in df.columns]]
+        return df
 
 
     except HttpError as error:
@@ -492,3 +720,112 @@ def download_csv_from_drive_to_dataframe(drive_service, file_id: str) -> pd.Data
         # st.error(f"An unexpected error occurred while downloading file {file_id}: {e}")
         print(f"An unexpected error occurred while downloading file {file_id} from Drive: {e}")
         return None
+
+def get_drive_file_revision(drive_service, file_id: str) -> str | None:
+    """
+    Returns a string identifying the current content revision of a Drive file, using one cheap
+    metadata call (no download). Changes whenever the file content is replaced.
+
+    Returns:
+        The revision string, or None if the metadata could not be retrieved.
+    """
+    if not drive_service or not file_id:
+        print("Error: Google Drive service or file ID not available in data_loader.get_drive_file_revision.")
+        return None
+    try:
+        file_metadata = drive_service.files().get(
+            fileId=file_id,
+            fields='id, headRevisionId, md5Checksum, modifiedTime'
+        ).execute()
+        # headRevisionId is only populated for binary (non-Google-Docs) files such as CSVs; fall back to checksum/time.
+        return file_metadata.get('headRevisionId') or f"{file_metadata.get('md5Checksum')}@{file_metadata.get('modifiedTime')}"
+    except HttpError as error:
+        print(f"API error occurred while reading metadata of file {file_id} from Drive: {error.content.decode()}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred while reading metadata of file {file_id} from Drive: {e}")
+        return None
+
+# Rows per chunk when streaming a CSV; bounds peak memory independently of file size.
+DEFAULT_CSV_CHUNK_ROWS = 100_000
+
+def iter_csv_chunks(csv_source, columns: list | None = None, chunksize: int = DEFAULT_CSV_CHUNK_ROWS, dtype: dict | None = None):
+    """
+    Yields a CSV file as a sequence of DataFrames of at most `chunksize` rows.
+
+    Args:
+        csv_source: A path or file-like object (e.g. a Streamlit UploadedFile with the predictions).
+        columns: Optional list of columns to parse (those missing from the file are ignored, as in
+                 read_csv_columns; callers check the chunks for the columns they need).
+        chunksize: Maximum number of rows per yielded DataFrame.
+        dtype: Optional dtype hints (column -> dtype) applied while parsing; values that do not fit raise ValueError.
+
+    Yields:
+        pandas DataFrames, in file order. Parsing errors are raised to the caller.
+    """
+    if hasattr(csv_source, 'seek'):
+        csv_source.seek(0) # Uploaded files may have been read already
+    with pd.read_csv(csv_source, usecols=_usecols(columns), chunksize=chunksize, dtype=dtype) as reader:
+        for chunk in reader:
+            yield chunk
+
+def detect_csv_encoding(first_chunk: bytes) -> str:
+    """'utf-8' if the first downloaded chunk decodes as UTF-8, else 'latin1' (which accepts any byte)."""
+    try:
+        first_chunk.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut at the end of the chunk is not an encoding error
+        if e.start >= len(first_chunk) - 3 and e.reason == 'unexpected end of data':
+            return 'utf-8'
+        return 'latin1'
+
+def iter_drive_csv_chunks(drive_service, file_id: str, columns: list | None = None, chunksize: int = DEFAULT_CSV_CHUNK_ROWS,
+                          file_metadata: dict | None = None, dtype: dict | None = None):
+    """
+    Yields a Drive CSV as DataFrames of at most `chunksize` rows while it is still downloading:
+    the download runs in a background thread and only a few raw chunks are buffered at any time.
+    The encoding is detected from the first downloaded chunk.
+
+    Args:
+        drive_service: Authenticated Google Drive API service instance.
+        file_id: The ID of the Google Drive file.
+        columns: Optional list of columns to parse (those missing from the file are ignored).
+        chunksize: Maximum number of rows per yielded DataFrame.
+        file_metadata: If given (drive_cache.get_file_metadata), the download is also written to the local cache.
+        dtype: Optional dtype hints (column -> dtype) applied while parsing; values that do not fit raise ValueError.
+
+    Yields:
+        pandas DataFrames, in file order. Download and parsing errors are raised to the caller.
+    """
+    with drive_cache.open_drive_stream(drive_service, file_id, file_metadata=file_metadata) as stream:
+        encoding = detect_csv_encoding(stream.peek_first_chunk())
+        with pd.read_csv(stream, usecols=_usecols(columns), chunksize=chunksize, encoding=encoding, dtype=dtype) as reader:
+            for chunk in reader:
+                yield chunk
+
+def _stream_csv_from_drive(drive_service, file_id: str, columns: list | None = None, file_metadata: dict | None = None,
+                           dtype: dict | None = None) -> pd.DataFrame | None:
+    """
+    Parses a Drive CSV while it downloads. The whole stream goes to one read_csv (no list of chunk
+    frames to concatenate, so the data is not held twice). If the streamed parse fails, the file is
+    parsed again from the copy kept by the stream (see drive_cache.DriveStream.reopen).
+    """
+    with drive_cache.open_drive_stream(drive_service, file_id, file_metadata=file_metadata, keep_copy=True) as stream:
+        try:
+            encoding = detect_csv_encoding(stream.peek_first_chunk())
+            return pd.read_csv(stream, usecols=_usecols(columns), encoding=encoding, dtype=dtype)
+        except pd.errors.EmptyDataError:
+            print(f"Error: File ID {file_id} is empty.")
+            return None
+        except ValueError as e:
+            # e.g. a non-UTF-8 byte after the first chunk, or values that do not fit a dtype hint; parse the
+            # whole file again with the encoding fallback (and without the hints that do not fit)
+            print(f"Streamed parse of file ID {file_id} failed ({e}). Parsing the downloaded copy again.")
+            fh = stream.reopen()
+    if fh is None: # The cached copy was evicted meanwhile
+        fh = drive_cache.open_drive_file(drive_service, file_id)
+        if fh is None:
+            return None
+    with fh:
+        return _read_csv_with_fallback_encoding(fh, file_id, columns, dtype)
@@ -0,0 +1,131 @@
+import json
+import threading
+import numpy as np
+import pandas as pd
+from modules import config, drive_cache, ground_truth
+
+# --- Dataset profiles ---
+# When a dataset is uploaded, a compact summary of it (shape, dtypes, null counts, numeric ranges and
+# the target distribution) is computed once and stored next to it as a small JSON sidecar named
+# "<file ID>.profile.json". Pages show dataset stats from the sidecar instead of downloading the CSV.
+# Profiles are also kept in the local cache directory, so each is fetched at most once per machine.
+
+PROFILE_FILE_SUFFIX = ".profile.json"
+PROFILE_VERSION = 1
+
+_PROFILE_CACHE_NAME = "dataset_profiles"
+_PROFILE_CACHE = None # file_id -> profile, loaded lazily from disk
+_MISSING_PROFILES = set() # File IDs without a sidecar (e.g. uploaded before profiles existed), per process
+_PROFILE_CACHE_LOCK = threading.Lock()
+
+def profile_file_name(file_id: str) -> str:
+    """Name of the sidecar of a file (local file IDs are paths, so their slashes are replaced)."""
+    return file_id.replace('/', '_') + PROFILE_FILE_SUFFIX
+
+def _json_number(value):
+    """float for JSON; NaN/inf (e.g. the mean of an all-null column) become None."""
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+def _distribution(column: pd.Series) -> dict:
+    """Value counts of a discrete column, or a histogram of a continuous numeric one."""
+    values = column.dropna()
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values) \
+            and values.nunique() > config.DATASET_PROFILE_TOP_VALUES:
+        counts, bin_edges = np.histogram(values.to_numpy(dtype=np.float64), bins=config.DATASET_PROFILE_HISTOGRAM_BINS)
+        return {"kind": "histogram", "bin_edges": [float(edge) for edge in bin_edges], "counts": counts.tolist()}
+    top_values = values.value_counts().head(config.DATASET_PROFILE_TOP_VALUES)
+    return {"kind": "value_counts", "values": [str(value) for value in top_values.index], "counts": top_values.tolist()}
+
+def profile_dataframe(df: pd.DataFrame, target_col: str = ground_truth.DEFAULT_TARGET_COLUMN) -> dict:
+    """
+    Summarizes a dataset: row count and, per column, dtype, null count and either numeric stats
+    (min, max, mean, std) or the number of distinct values. All numeric columns are reduced together
+    in one vectorized pass. If target_col is present, its distribution is included.
+    """
+    null_counts = df.isna().sum()
+    numeric_columns = [name for name in df.columns
+                       if pd.api.types.is_numeric_dtype(df[name]) and not pd.api.types.is_bool_dtype(df[name])]
+    numeric_stats = {}
+    if numeric_columns and len(df):
+        block = df[numeric_columns].to_numpy(dtype=np.float64, copy=True)
+        all_null = null_counts[numeric_columns].to_numpy() == len(df)
+        block[:, all_null] = 0.0 # All-null columns would make the nan-reductions warn; their stats are None anyway
+        reductions = {"min": np.nanmin(block, axis=0), "max": np.nanmax(block, axis=0), "mean": np.nanmean(block, axis=0)}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            reductions["std"] = np.nanstd(block, axis=0, ddof=1) if len(df) > 1 else np.full(len(numeric_columns), np.nan)
+        for i, name in enumerate(numeric_columns):
+            numeric_stats[name] = {stat: None if all_null[i] else _json_number(values[i]) for stat, values in reductions.items()}
+
+    columns = []
+    for name in df.columns:
+        column_profile = {"name": str(name), "dtype": str(df[name].dtype), "nulls": int(null_counts[name])}
+        if name in numeric_stats:
+            column_profile.update(numeric_stats[name])
+        else:
+            column_profile["unique"] = int(df[name].nunique())
+        columns.append(column_profile)
+
+    profile = {"version": PROFILE_VERSION, "rows": int(len(df)), "columns": columns}
+    if target_col in df.columns:
+        profile["target"] = {"column": target_col, **_distribution(df[target_col])}
+    return profile
+
+def profile_to_json(profile: dict) -> bytes:
+    return json.dumps(profile).encode('utf-8')
+
+def profile_to_dataframe(profile: dict) -> pd.DataFrame:
+    """Per-column table of a profile, for st.dataframe."""
+    return pd.DataFrame(profile["columns"]).set_index("name")
+
+def _profile_cache() -> dict:
+    global _PROFILE_CACHE
+    if _PROFILE_CACHE is None:
+        _PROFILE_CACHE = drive_cache.load_cache_metadata(_PROFILE_CACHE_NAME) if drive_cache.cache_available() else {}
+    return _PROFILE_CACHE
+
+def remember_profile(file_id: str, profile: dict):
+    """Keeps the profile of a file in the local cache (called when its sidecar is written or read)."""
+    with _PROFILE_CACHE_LOCK:
+        profile_cache = _profile_cache()
+        profile_cache[file_id] = profile
+        _MISSING_PROFILES.discard(file_id)
+        if drive_cache.cache_available():
+            drive_cache.save_cache_metadata(_PROFILE_CACHE_NAME, profile_cache)
+
+def get_cached_profile(file_id: str) -> dict | None:
+    """The profile of a file if it is in the local cache (never reads the storage backend)."""
+    with _PROFILE_CACHE_LOCK:
+        return _profile_cache().get(file_id)
+
+def get_dataset_profile(storage_backend, file_id: str) -> dict | None:
+    """
+    The profile of a stored dataset, from the local cache or else from its sidecar in the storage
+    backend (a small JSON file; the dataset itself is never downloaded).
+
+    Returns:
+        The profile dict (see profile_dataframe), or None if the file has no profile.
+    """
+    if not file_id:
+        return None
+    with _PROFILE_CACHE_LOCK:
+        profile = _profile_cache().get(file_id)
+        if profile is not None or file_id in _MISSING_PROFILES:
+            return profile
+    if not storage_backend:
+        return None
+
+    sidecar_id = storage_backend.find_file(profile_file_name(file_id))
+    fh = storage_backend.open_file(sidecar_id) if sidecar_id else None
+    if fh is None:
+        with _PROFILE_CACHE_LOCK:
+            _MISSING_PROFILES.add(file_id)
+        return None
+    try:
+        with fh:
+            profile = json.load(fh)
+    except ValueError as e:
+        print(f"Warning (dataset_profile.get_dataset_profile): Ignoring unreadable profile of file {file_id}: {e}")
+        return None
+    remember_profile(file_id, profile)
+    return profile
@@ -0,0 +1,456 @@
+import hashlib
+import io
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import pandas as pd
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseDownload
+from modules import config
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError: # Optional: without pyarrow only the CSV copies are cached
+    pa = None
+
+# --- Local disk cache for Drive downloads ---
+# Files downloaded from Drive are stored on local disk, addressed by their content: the Drive
+# md5Checksum, or the file ID + modifiedTime for files Drive has no checksum for. Before each load a
+# metadata-only call tells whether the cached copy is still current, so repeated loads of the same
+# dataset (across sessions, reruns and processes) read local disk instead of downloading it again.
+# The cache is bounded by config.DRIVE_CACHE_MAX_BYTES; least recently used entries are evicted first
+# (every hit refreshes the entry's modification time).
+#
+# Next to each cached CSV a typed columnar copy (Arrow IPC file, "<entry>.arrow") is written the first
+# time the CSV is parsed, or when the dataset is uploaded. It stores the schema, is read through a
+# memory map, and only the requested columns are materialized, so later loads skip CSV parsing.
+
+_TEMP_PREFIX = ".download-"
+COLUMNAR_SUFFIX = ".arrow"
+_CACHE_LOCK = threading.Lock() # Serializes eviction within this process; writes are atomic renames anyway
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+def get_cache_dir() -> str:
+    cache_dir = config.DRIVE_CACHE_DIR or os.path.join(tempfile.gettempdir(), "datathon_hub_drive_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def cache_available() -> bool:
+    """False if the cache directory cannot be created (e.g. read-only file system)."""
+    try:
+        get_cache_dir()
+        return True
+    except OSError as e:
+        print(f"Warning (drive_cache.cache_available): Local cache unavailable: {e}")
+        return False
+
+def cache_key(file_metadata: dict) -> str | None:
+    """Content address of a Drive file from its metadata (md5Checksum, else file ID + modifiedTime)."""
+    if file_metadata.get('md5Checksum'):
+        return f"md5-{file_metadata['md5Checksum']}"
+    if file_metadata.get('modifiedTime'):
+        digest = hashlib.sha1(f"{file_metadata['id']}|{file_metadata['modifiedTime']}".encode()).hexdigest()
+        return f"mt-{digest}"
+    return None
+
+def _file_md5(path: str) -> str:
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+def _download_to(drive_service, file_id: str, fh, chunksize: int = config.DRIVE_DOWNLOAD_CHUNK_BYTES):
+    downloader = MediaIoBaseDownload(fh, drive_service.files().get_media(fileId=file_id), chunksize=chunksize)
+    done = False
+    while not done:
+        _, done = downloader.next_chunk()
+
+def _evict(cache_dir: str, max_bytes: int, keep: str | None = None):
+    """Deletes least recently used entries until the cache fits in max_bytes (the entry `keep` is never deleted)."""
+    entries = []
+    total_bytes = 0
+    for entry in os.scandir(cache_dir):
+        if not entry.is_file() or entry.name.startswith('.'): # Temp downloads and cache metadata files
+            continue
+        stat = entry.stat()
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total_bytes += stat.st_size
+    entries.sort() # Oldest (least recently used) first
+    for _, size, path in entries:
+        if total_bytes <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total_bytes -= size
+        except FileNotFoundError:
+            total_bytes -= size # Already evicted by another process
+        except OSError as e:
+            print(f"Warning (drive_cache._evict): Could not remove '{path}': {e}")
+
+def get_file_metadata(drive_service, file_id: str) -> dict | None:
+    """The metadata that decides whether a cached copy is current (one cheap call, no download)."""
+    try:
+        return drive_service.files().get(fileId=file_id, fields='id, md5Checksum, modifiedTime').execute()
+    except HttpError as error:
+        print(f"API error occurred while reading metadata of file {file_id} from Drive: {error.content.decode()}")
+        return None
+
+def entry_path(file_metadata: dict) -> str | None:
+    """Cache path of the file's current content (it may not be cached yet), or None if not cacheable."""
+    key = cache_key(file_metadata)
+    return os.path.join(get_cache_dir(), key) if key else None
+
+def is_cached(path: str) -> bool:
+    """True (and the entry is marked as recently used) if the CSV at path is in the cache."""
+    return _touch(path)
+
+def columnar_path(path: str) -> str:
+    """Path of the columnar copy belonging to a cached CSV."""
+    return path + COLUMNAR_SUFFIX
+
+def _touch(path: str) -> bool:
+    """Marks an entry as recently used. Returns False if it does not exist (or was just evicted)."""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def get_cached_path(drive_service, file_id: str, file_metadata: dict | None = None, require_csv: bool = True) -> str | None:
+    """
+    Returns the path of an up-to-date local copy of a Drive file, downloading it only if the cache
+    has no copy of its current content.
+
+    Args:
+        drive_service: Authenticated Google Drive API service instance.
+        file_id: The ID of the Google Drive file.
+        file_metadata: The file's metadata if the caller already fetched it
+                       (fields id, md5Checksum, modifiedTime); fetched here otherwise.
+        require_csv: If False and a columnar copy of the current content exists, its CSV path is
+                     returned without downloading the CSV (which may have been evicted).
+
+    Returns:
+        The local path, or None if the file could not be fetched (errors are printed).
+        Raises OSError if the cache directory cannot be written.
+    """
+    if file_metadata is None:
+        file_metadata = get_file_metadata(drive_service, file_id)
+        if file_metadata is None:
+            return None
+    path = entry_path(file_metadata)
+    if path is None:
+        print(f"Warning (drive_cache.get_cached_path): No checksum or modification time for file {file_id}; not cacheable.")
+        return None
+
+    cache_dir = os.path.dirname(path)
+    if _touch(path) or (not require_csv and pa is not None and _touch(columnar_path(path))):
+        return path
+
+    # Download next to the final location and rename, so readers never see a partial file
+    fd, temp_path = tempfile.mkstemp(prefix=_TEMP_PREFIX, dir=cache_dir)
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            _download_to(drive_service, file_id, fh)
+        expected_md5 = file_metadata.get('md5Checksum')
+        if expected_md5 and _file_md5(temp_path) != expected_md5:
+            print(f"Error (drive_cache.get_cached_path): Checksum mismatch for downloaded file {file_id}.")
+            return None
+        os.replace(temp_path, path)
+    except HttpError as error:
+        print(f"API error occurred while downloading file {file_id} from Drive: {error.content.decode()}")
+        return None
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    with _CACHE_LOCK:
+        _evict(cache_dir, config.DRIVE_CACHE_MAX_BYTES, keep=path)
+    return path
+
+def _write_atomically(path: str, write):
+    """Calls write(binary file) on a temp file in the cache directory, then renames it to path."""
+    fd, temp_path = tempfile.mkstemp(prefix=_TEMP_PREFIX, dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            write(fh)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def write_columnar_copy(path: str, df: pd.DataFrame) -> bool:
+    """Stores a parsed CSV as the columnar copy of the cached entry at path. Returns True on success."""
+    if pa is None:
+        return False
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        def _write(fh):
+            with pa.ipc.new_file(fh, table.schema) as writer:
+                writer.write_table(table)
+
+        _write_atomically(columnar_path(path), _write)
+    except (pa.ArrowException, OSError) as e:
+        print(f"Warning (drive_cache.write_columnar_copy): Could not write columnar copy of '{path}': {e}")
+        return False
+    with _CACHE_LOCK:
+        _evict(os.path.dirname(path), config.DRIVE_CACHE_MAX_BYTES, keep=columnar_path(path))
+    return True
+
+def read_columnar_copy(path: str, columns: list | None = None) -> pd.DataFrame | None:
+    """
+    Reads the columnar copy of the cached entry at path through a memory map.
+    Only `columns` (those present in the file) are materialized; all of them if None.
+
+    Returns:
+        The DataFrame, or None if there is no usable columnar copy (the caller parses the CSV instead).
+    """
+    if pa is None or not _touch(columnar_path(path)):
+        return None
+    try:
+        # The map is released with the table; with no nulls, numeric columns may be zero-copy views of it.
+        table = pa.ipc.open_file(pa.memory_map(columnar_path(path), 'r')).read_all()
+        if columns is not None:
+            table = table.select([column for column in columns if column in table.column_names])
+        return table.to_pandas()
+    except (pa.ArrowException, OSError) as e:
+        print(f"Warning (drive_cache.read_columnar_copy): Ignoring unreadable columnar copy of '{path}': {e}")
+        return None
+
+def store_uploaded_file(file_metadata: dict, file_obj) -> str | None:
+    """
+    Seeds the cache with a file just uploaded to Drive (file_metadata is the create() response with
+    id, md5Checksum and modifiedTime) and, for CSVs, its columnar copy, so the first load after the
+    upload needs neither a download nor a CSV parse. Returns the cached path, or None if not cached.
+    """
+    key = cache_key(file_metadata)
+    if key is None:
+        return None
+    try:
+        path = os.path.join(get_cache_dir(), key)
+        file_obj.seek(0)
+        _write_atomically(path, lambda fh: shutil.copyfileobj(file_obj, fh))
+        file_obj.seek(0)
+    except OSError as e:
+        print(f"Warning (drive_cache.store_uploaded_file): Could not cache uploaded file {file_metadata.get('id')}: {e}")
+        return None
+    if pa is not None:
+        try:
+            write_columnar_copy(path, pd.read_csv(path))
+        except (pd.errors.ParserError, UnicodeDecodeError, ValueError) as e:
+            print(f"Warning (drive_cache.store_uploaded_file): No columnar copy for {file_metadata.get('id')}: {e}")
+    return path
+
+def load_cache_metadata(name: str) -> dict:
+    """Reads a small JSON file kept in the cache directory (never evicted). Empty if missing or unreadable."""
+    try:
+        with open(os.path.join(get_cache_dir(), f".{name}.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Warning (drive_cache.load_cache_metadata): Ignoring unreadable '{name}': {e}")
+        return {}
+
+def save_cache_metadata(name: str, data: dict) -> bool:
+    """Atomically replaces a JSON metadata file in the cache directory. Returns True on success."""
+    try:
+        path = os.path.join(get_cache_dir(), f".{name}.json")
+        _write_atomically(path, lambda fh: fh.write(json.dumps(data).encode('utf-8')))
+        return True
+    except OSError as e:
+        print(f"Warning (drive_cache.save_cache_metadata): Could not write '{name}': {e}")
+        return False
+
+# --- Streaming downloads ---
+# open_drive_stream() downloads in a background thread and hands the chunks to the reader through a
+# bounded queue, so parsing overlaps the download and at most DRIVE_STREAM_QUEUE_CHUNKS chunks are buffered.
+
+class _DownloadCancelled(Exception):
+    pass
+
+_STREAM_END = object()
+
+class DriveStream(io.RawIOBase):
+    """Readable end of a download running in a background thread (see open_drive_stream)."""
+
+    def __init__(self, max_chunks: int):
+        super().__init__()
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._cancelled = threading.Event()
+        self._buffer = memoryview(b'')
+        self._eof = False
+        self._failed = False # The download raised an error: any kept copy is partial
+        self._copy_path = None # Cache entry the download is committed to (see open_drive_stream)
+        self._copy_fh = None # Or, without a cache, a spooled copy of the downloaded bytes (keep_copy)
+
+    # Producer side (download thread)
+    def _put(self, item):
+        while True:
+            if self._cancelled.is_set():
+                raise _DownloadCancelled()
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _finish(self, error: Exception | None = None):
+        try:
+            self._put((_STREAM_END, error))
+        except _DownloadCancelled:
+            pass
+
+    # Consumer side
+    def readable(self) -> bool:
+        return True
+
+    def _fill(self) -> bool:
+        """Waits for the next chunk if the buffer is empty. Returns False at the end of the file."""
+        while not self._buffer:
+            if self._eof:
+                return False
+            item = self._queue.get()
+            if isinstance(item, tuple) and item[0] is _STREAM_END:
+                self._eof = True
+                if item[1] is not None:
+                    self._failed = True
+                    raise item[1]
+                return False
+            self._buffer = memoryview(item)
+        return True
+
+    def readinto(self, b) -> int:
+        if not self._fill():
+            return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def peek_first_chunk(self) -> bytes:
+        """The bytes that the next read will return, without consuming them (for encoding detection)."""
+        self._fill()
+        return bytes(self._buffer)
+
+    def reopen(self):
+        """
+        Reads the rest of the download and returns a new binary file object over the whole content, taken
+        from the copy kept while downloading (so a failed parse can start over without downloading again).
+        Returns None if no complete copy was kept. Download errors are raised.
+        """
+        while self._fill():
+            self._buffer = memoryview(b'')
+        if self._failed:
+            return None
+        if self._copy_path is not None:
+            try:
+                return open(self._copy_path, 'rb')
+            except FileNotFoundError: # Evicted meanwhile
+                return None
+        copy_fh, self._copy_fh = self._copy_fh, None # Now owned by the caller
+        if copy_fh is not None:
+            copy_fh.seek(0)
+        return copy_fh
+
+    def close(self):
+        self._cancelled.set() # Stops the download thread if the reader gives up early
+        if self._copy_fh is not None:
+            self._copy_fh.close()
+            self._copy_fh = None
+        super().close()
+
+class _StreamWriter:
+    """File-like target of MediaIoBaseDownload: forwards each chunk to the stream and to the cache temp file."""
+
+    def __init__(self, stream: DriveStream, tee_fh=None):
+        self.stream = stream
+        self.tee_fh = tee_fh
+        self.md5 = hashlib.md5()
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        if self.tee_fh is not None:
+            self.tee_fh.write(data)
+            self.md5.update(data)
+        self.stream._put(data)
+        return len(data)
+
+def open_drive_stream(drive_service, file_id: str, file_metadata: dict | None = None, keep_copy: bool = False) -> DriveStream:
+    """
+    Starts downloading a Drive file in a background thread and returns a binary stream of its content
+    that can be read while the download runs (e.g. by pd.read_csv with chunksize).
+
+    If file_metadata (from get_file_metadata) is given and the cache is usable, the bytes are also
+    written to the cache entry, which appears once the download completes with a matching checksum.
+    Otherwise, with keep_copy, they are kept in a temporary file (in memory up to one download chunk).
+    Either copy can be read again with DriveStream.reopen. Download errors are raised by the stream's
+    read methods.
+    """
+    stream = DriveStream(config.DRIVE_STREAM_QUEUE_CHUNKS)
+    path = entry_path(file_metadata) if file_metadata is not None and cache_available() else None
+    if path is not None:
+        stream._copy_path = path
+    elif keep_copy:
+        stream._copy_fh = tempfile.SpooledTemporaryFile(max_size=config.DRIVE_DOWNLOAD_CHUNK_BYTES)
+
+    def _produce():
+        temp_path = None
+        try:
+            if path is None:
+                _download_to(drive_service, file_id, _StreamWriter(stream, stream._copy_fh))
+            else:
+                fd, temp_path = tempfile.mkstemp(prefix=_TEMP_PREFIX, dir=os.path.dirname(path))
+                with os.fdopen(fd, 'wb') as tee_fh:
+                    writer = _StreamWriter(stream, tee_fh)
+                    _download_to(drive_service, file_id, writer)
+                expected_md5 = file_metadata.get('md5Checksum')
+                if expected_md5 and writer.md5.hexdigest() != expected_md5:
+                    raise IOError(f"Checksum mismatch for downloaded file {file_id}")
+                os.replace(temp_path, path)
+                with _CACHE_LOCK:
+                    _evict(os.path.dirname(path), config.DRIVE_CACHE_MAX_BYTES, keep=path)
+            stream._finish()
+        except _DownloadCancelled:
+            pass
+        except Exception as e:
+            stream._finish(e)
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    threading.Thread(target=_produce, name=f"drive-download-{file_id}", daemon=True).start()
+    return stream
+
+def open_drive_file(drive_service, file_id: str):
+    """
+    Opens a Drive file for binary reading, from the local cache when possible.
+    If the cache directory is not writable, the file is downloaded into memory instead.
+
+    Returns:
+        A binary file object (use it in a `with` block), or None if the file could not be fetched.
+    """
+    if cache_available():
+        path = get_cached_path(drive_service, file_id)
+        return open(path, 'rb') if path else None
+
+    try:
+        fh = io.BytesIO()
+        _download_to(drive_service, file_id, fh)
+        fh.seek(0)
+        return fh
+    except HttpError as error:
+        print(f"API error occurred while downloading file {file_id} from Drive: {error.content.decode()}")
+        return None
+
+def clear_drive_cache():
+    """Deletes every cached file."""
+    with _CACHE_LOCK:
+        _evict(get_cache_dir(), 0)
@@ -0,0 +1,107 @@
+import threading
+import time
+from googleapiclient.errors import HttpError
+from modules import config
+
+# --- Incremental Drive folder index ---
+# The CSV files of a Drive folder are listed once (all pages) and then kept current from the Drive
+# changes feed: each later lookup makes a single changes().list call from the stored page token and
+# applies only what changed. The index is rebuilt from scratch when it is older than
+# config.DRIVE_FOLDER_INDEX_TTL_SECONDS, or when the changes feed fails (e.g. an expired token),
+# so anything the feed might not report is eventually picked up.
+
+CSV_MIME_TYPE = 'text/csv'
+_FILE_FIELDS = 'id, name, mimeType, parents, trashed, md5Checksum, modifiedTime, size'
+
+class FolderIndex:
+    """The CSV files of one Drive folder (file ID -> metadata) and the changes page token it is current up to."""
+
+    def __init__(self, folder_id: str):
+        self.folder_id = folder_id
+        self.files = {}
+        self.page_token = None
+        self.seeded_at = 0.0
+        self.lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        return self.page_token is None or time.monotonic() - self.seeded_at > config.DRIVE_FOLDER_INDEX_TTL_SECONDS
+
+    def _belongs(self, file_resource: dict) -> bool:
+        return (file_resource.get('mimeType') == CSV_MIME_TYPE and not file_resource.get('trashed')
+                and self.folder_id in (file_resource.get('parents') or []))
+
+    def seed(self, drive_service):
+        """Lists the whole folder. The page token is taken first, so changes made while listing are not lost."""
+        page_token = drive_service.changes().getStartPageToken().execute()['startPageToken']
+        files = {}
+        query = f"'{self.folder_id}' in parents and mimeType='{CSV_MIME_TYPE}' and trashed=false"
+        list_token = None
+        while True:
+            response = drive_service.files().list(
+                q=query,
+                spaces='drive',
+                fields=f'nextPageToken, files({_FILE_FIELDS})',
+                pageSize=1000,
+                pageToken=list_token
+            ).execute()
+            for file_resource in response.get('files', []):
+                files[file_resource['id']] = file_resource
+            list_token = response.get('nextPageToken')
+            if list_token is None:
+                break
+        self.files = files
+        self.page_token = page_token
+        self.seeded_at = time.monotonic()
+
+    def apply_changes(self, drive_service) -> int:
+        """Applies every change since the stored page token. Returns the number of changes read."""
+        page_token = self.page_token
+        n_changes = 0
+        while page_token is not None:
+            response = drive_service.changes().list(
+                pageToken=page_token,
+                spaces='drive',
+                pageSize=1000,
+                fields=f'nextPageToken, newStartPageToken, changes(fileId, removed, file({_FILE_FIELDS}))'
+            ).execute()
+            for change in response.get('changes', []):
+                n_changes += 1
+                file_resource = change.get('file')
+                if change.get('removed') or file_resource is None or not self._belongs(file_resource):
+                    self.files.pop(change.get('fileId'), None) # Deleted, trashed, moved away or no longer a CSV
+                else:
+                    self.files[file_resource['id']] = file_resource
+            if 'newStartPageToken' in response:
+                self.page_token = response['newStartPageToken']
+                break
+            page_token = response.get('nextPageToken')
+        return n_changes
+
+_FOLDER_INDEXES = {} # folder_id -> FolderIndex, shared by every session of this process
+_INDEXES_LOCK = threading.Lock()
+
+def get_folder_files(drive_service, folder_id: str) -> list:
+    """
+    Returns the metadata dicts (id, name, md5Checksum, modifiedTime, size, ...) of the CSV files in a
+    Drive folder, from the process-wide index. API errors of a full listing are raised to the caller.
+    """
+    with _INDEXES_LOCK:
+        index = _FOLDER_INDEXES.setdefault(folder_id, FolderIndex(folder_id))
+    with index.lock:
+        if index.is_stale():
+            index.seed(drive_service)
+        else:
+            try:
+                index.apply_changes(drive_service)
+            except HttpError as error:
+                print(f"Warning (drive_index.get_folder_files): Changes feed failed for folder {folder_id} ({error}). Relisting it.")
+                index.seed(drive_service)
+        return list(index.files.values())
+
+def invalidate_folder_index(folder_id: str | None = None):
+    """Forces the next lookup of one folder (or of all folders) to list it again."""
+    with _INDEXES_LOCK:
+        if folder_id is None:
+            _FOLDER_INDEXES.clear()
+        else:
+            _FOLDER_INDEXES.pop(folder_id, None)
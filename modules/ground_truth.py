@@ -0,0 +1,219 @@
+import threading
+import numpy as np
+import pandas as pd
+from modules import metrics, config
+
+# --- Process-wide ground-truth cache ---
+# The test outputs of a datathon are downloaded and parsed once per file revision and shared by
+# every session in this Streamlit process. Scoring a submission then only needs the prediction
+# parse plus one kernel call against the cached arrays and precomputed invariants.
+
+DEFAULT_TARGET_COLUMN = 'Actual'
+
+# --- ID-keyed alignment ---
+# When both the test outputs and a prediction file carry config.ID_COLUMN_NAME, predictions are
+# matched to the true rows by ID instead of by position, so a shuffled submission scores correctly.
+# The truth side (sort order + sorted IDs) is built once per ground truth; aligning a submission is
+# one vectorized searchsorted, and nothing at all when its IDs are already in the truth's order.
+
+MAX_REPORTED_IDS = 10 # Example IDs listed per problem in describe_alignment_problems()
+
+def _normalize_ids(values, numeric: bool) -> np.ndarray:
+    """IDs as float64 (numeric IDs, unparsable values become NaN and never match) or as fixed-width strings."""
+    if numeric:
+        return pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.asarray(values).astype(str)
+
+class IdIndex:
+    """The ID column of a test outputs file, pre-sorted for joins. All arrays are plain (shareable) NumPy arrays."""
+
+    def __init__(self, ids: np.ndarray, order: np.ndarray | None = None, sorted_ids: np.ndarray | None = None):
+        self.ids = ids                # IDs in file order (float64 or fixed-width str)
+        self.numeric = ids.dtype.kind == 'f'
+        self.order = np.argsort(ids, kind='stable') if order is None else order
+        self.sorted_ids = ids[self.order] if sorted_ids is None else sorted_ids
+
+    @classmethod
+    def from_column(cls, column: pd.Series) -> "IdIndex":
+        numeric = pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column)
+        return cls(_normalize_ids(column.to_numpy(), numeric))
+
+    def duplicate_ids(self) -> np.ndarray:
+        """IDs that appear more than once in the test outputs (alignment is impossible if any)."""
+        repeated = self.sorted_ids[1:][self.sorted_ids[1:] == self.sorted_ids[:-1]]
+        return np.unique(repeated)
+
+    def align(self, pred_ids, y_pred) -> tuple[np.ndarray | None, dict]:
+        """
+        Reorders predictions into the row order of the test outputs.
+
+        Args:
+            pred_ids: The ID column of the prediction file.
+            y_pred: The predictions, in the same order as pred_ids.
+
+        Returns:
+            (aligned predictions, problems). The aligned array is y_pred itself when the IDs are
+            already in order, and None if any ID is missing, unknown or duplicated. problems holds
+            every offending ID at once: {"missing": [...], "unknown": [...], "duplicate": [...]}.
+        """
+        pred_ids = _normalize_ids(pred_ids, self.numeric)
+        problems = {"missing": [], "unknown": [], "duplicate": []}
+        n_rows = len(self.ids)
+
+        # Fast path: same IDs in the same order, the predictions are used as they are
+        if len(pred_ids) == n_rows and np.array_equal(pred_ids, self.ids):
+            return y_pred, problems
+
+        positions = np.searchsorted(self.sorted_ids, pred_ids)
+        positions[positions == n_rows] = 0 # Past the last ID: cannot match, checked below
+        found = self.sorted_ids[positions] == pred_ids
+        truth_rows = self.order[positions[found]]
+
+        counts = np.bincount(truth_rows, minlength=n_rows)
+        problems["unknown"] = pd.unique(pred_ids[~found]).tolist()
+        problems["duplicate"] = self.ids[counts > 1].tolist()
+        problems["missing"] = self.ids[counts == 0].tolist()
+        if problems["unknown"] or problems["duplicate"] or problems["missing"]:
+            return None, problems
+
+        y_pred = np.asarray(y_pred)
+        aligned = np.empty(n_rows, dtype=y_pred.dtype)
+        aligned[truth_rows] = y_pred
+        return aligned, problems
+
+def describe_alignment_problems(problems: dict, max_ids: int = MAX_REPORTED_IDS) -> str:
+    """One message summarizing every alignment problem, with up to max_ids example IDs each."""
+    def _format_id(value):
+        return str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+
+    descriptions = {
+        "missing": "IDs of the test outputs with no prediction",
+        "unknown": "IDs in your file that are not in the test outputs",
+        "duplicate": "IDs predicted more than once",
+    }
+    parts = []
+    for key, description in descriptions.items():
+        ids = problems.get(key) or []
+        if ids:
+            examples = ", ".join(_format_id(value) for value in ids[:max_ids])
+            more = f" and {len(ids) - max_ids} more" if len(ids) > max_ids else ""
+            parts.append(f"{len(ids)} {description} ({examples}{more})")
+    return "; ".join(parts)
+
+class GroundTruth:
+    """The target column of a test outputs file as a typed NumPy array, plus per-task-type invariants."""
+
+    def __init__(self, file_id: str, revision: str, target_col: str, actual: np.ndarray,
+                 id_col: str | None = None, id_index: IdIndex | None = None):
+        self.file_id = file_id
+        self.revision = revision
+        self.target_col = target_col
+        self.actual = actual          # float64 when the column is numeric, object labels otherwise
+        self.n_rows = len(actual)
+        self.id_col = id_col
+        self.id_index = id_index      # None when the test outputs have no (unique) ID column
+        self._stats = {}              # datathon type (lowercase) -> metrics.precompute_truth_stats(...)
+        self._stats_lock = threading.Lock()
+
+    def stats(self, datathon_type: str) -> dict:
+        """Precomputed invariants for a datathon type (mean/ss_tot/zero mask, or classes/encoded labels)."""
+        key = datathon_type.lower()
+        with self._stats_lock:
+            if key not in self._stats:
+                self._stats[key] = metrics.precompute_truth_stats(self.actual, key)
+            return self._stats[key]
+
+_GROUND_TRUTH_CACHE = {}    # file_id -> GroundTruth (only the latest revision of each file is kept)
+_CACHE_LOCK = threading.Lock()
+_LOAD_LOCKS = {}            # file_id -> Lock, so concurrent sessions trigger a single download per file
+
+def _load_lock(file_id: str) -> threading.Lock:
+    with _CACHE_LOCK:
+        return _LOAD_LOCKS.setdefault(file_id, threading.Lock())
+
+def _column_to_array(column: pd.Series) -> np.ndarray:
+    """Numeric columns become contiguous float64 arrays; anything else stays as an object array of labels."""
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        return np.ascontiguousarray(column.to_numpy(dtype=np.float64, na_value=np.nan))
+    return column.to_numpy(dtype=object)
+
+def _build_id_index(df_true_outputs: pd.DataFrame, id_col: str | None, file_id: str) -> IdIndex | None:
+    if not id_col or id_col not in df_true_outputs.columns:
+        return None
+    id_index = IdIndex.from_column(df_true_outputs[id_col])
+    duplicates = id_index.duplicate_ids()
+    if duplicates.size:
+        print(f"Warning (ground_truth.get_ground_truth): {duplicates.size} duplicate values in ID column '{id_col}' "
+              f"of test outputs file {file_id}. Predictions will be matched by position.")
+        return None
+    return id_index
+
+def get_ground_truth(storage_backend, file_id: str, datathon_type: str | None = None, target_col: str = DEFAULT_TARGET_COLUMN,
+                     id_col: str | None = config.ID_COLUMN_NAME, revision: str | None = None) -> GroundTruth | None:
+    """
+    Returns the cached ground truth of a test outputs file, downloading it only if the file's
+    revision changed since it was cached (or it was never loaded in this process).
+
+    Args:
+        storage_backend: The storage.StorageBackend holding the file (Drive or local).
+        file_id: File ID of the test outputs CSV (datathon_test_outputs_file_id).
+        datathon_type: If given, the invariants for this type are precomputed right away.
+        target_col: Name of the target column in the test outputs file.
+        id_col: Name of the optional ID column used to align predictions (None disables alignment).
+        revision: The file's current revision, if the caller just read it (saves reading it again).
+
+    Returns:
+        A GroundTruth, or None if the file could not be loaded or has no target column.
+    """
+    if revision is None:
+        revision = storage_backend.get_file_revision(file_id)
+    if revision is None:
+        return None
+
+    with _load_lock(file_id):
+        with _CACHE_LOCK:
+            cached = _GROUND_TRUTH_CACHE.get(file_id)
+        if (cached is not None and cached.revision == revision and cached.target_col == target_col
+                and cached.id_col == id_col):
+            ground_truth = cached
+        else:
+            # Only the target and ID columns are parsed (projected from the columnar copy when cached),
+            # numeric targets straight into float64
+            scoring_plan = metrics.get_scoring_plan(datathon_type) if datathon_type else None
+            dtype = {target_col: scoring_plan.value_dtype} if scoring_plan and scoring_plan.value_dtype else None
+            df_true_outputs = storage_backend.download_dataframe(file_id, columns=[target_col, id_col] if id_col else [target_col],
+                                                                 dtype=dtype)
+            if df_true_outputs is None:
+                print(f"Error (ground_truth.get_ground_truth): Could not load test outputs file {file_id}.")
+                return None
+            if target_col not in df_true_outputs.columns:
+                print(f"Error (ground_truth.get_ground_truth): Missing target column '{target_col}' in test outputs file {file_id}.")
+                return None
+            if df_true_outputs.empty:
+                print(f"Error (ground_truth.get_ground_truth): Test outputs file {file_id} has no rows.")
+                return None
+            ground_truth = GroundTruth(file_id, revision, target_col, _column_to_array(df_true_outputs[target_col]),
+                                       id_col=id_col, id_index=_build_id_index(df_true_outputs, id_col, file_id))
+            del df_true_outputs # Only the typed target and ID columns are kept
+            with _CACHE_LOCK:
+                _GROUND_TRUTH_CACHE[file_id] = ground_truth
+
+    if datathon_type:
+        ground_truth.stats(datathon_type)
+    return ground_truth
+
+def get_cached_ground_truth(file_id: str) -> GroundTruth | None:
+    """
+    The ground truth of a file as last loaded in this process, without checking its revision (no API
+    call). It may be stale; use it only for cheap pre-checks, never for scoring.
+    """
+    with _CACHE_LOCK:
+        return _GROUND_TRUTH_CACHE.get(file_id)
+
+def clear_ground_truth_cache(file_id: str | None = None):
+    """Drops one cached ground truth, or all of them."""
+    with _CACHE_LOCK:
+        if file_id is None:
+            _GROUND_TRUTH_CACHE.clear()
+        else:
+            _GROUND_TRUTH_CACHE.pop(file_id, None)
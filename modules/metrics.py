@@ -1,33 +1,322 @@
+from functools import lru_cache
 import pandas as pd
 import numpy as np
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score, accuracy_score, precision_score, recall_score, f1_score
+from modules import config
+
+# --- Vectorized metric kernels ---
+# Each kernel takes the true and predicted values as NumPy arrays and computes every metric
+# for its task type in a single pass: one NaN mask, one residual vector and all reductions
+# taken from it. The calculate_*_metrics functions below are thin DataFrame wrappers over them.
+
+def _as_float_array(values) -> np.ndarray:
+    """Returns the values as a contiguous float64 array (no copy if already in that layout)."""
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+def _masked_residuals(y_true, y_pred) -> tuple[np.ndarray, np.ndarray, int] | None:
+    """
+    Builds the NaN mask and the residual vector shared by all numeric metrics, without printing anything.
+    Returns (y_true_valid, residual, n_dropped) where residual = y_true - y_pred, or None on a length mismatch.
+    """
+    y_true = _as_float_array(y_true)
+    y_pred = _as_float_array(y_pred)
+
+    if y_true.shape != y_pred.shape:
+        return None
+
+    residual = y_true - y_pred # NaN wherever either side is NaN
+    valid_mask = ~np.isnan(residual)
+    if valid_mask.all():
+        return y_true, residual, 0
+    return y_true[valid_mask], residual[valid_mask], int(residual.size - valid_mask.sum())
+
+def _paired_residuals(y_true, y_pred) -> tuple[np.ndarray, np.ndarray] | None:
+    """Same as _masked_residuals, reporting length mismatches and dropped NaNs. Returns None if nothing is left to score."""
+    masked = _masked_residuals(y_true, y_pred)
+    if masked is None:
+        print("Error: True values and predictions have different lengths.")
+        return None
+    y_true, residual, n_dropped = masked
+    if n_dropped:
+        print("Warning: Data contains NaN values. Metrics might be affected or fail. Attempting to drop NaNs for calculation.")
+        if residual.size == 0:
+            print("Error: All data removed after dropping NaNs. Cannot calculate metrics.")
+            return None
+    return y_true, residual
+
+def _same_rows_as_truth(truth_stats: dict | None, n_scored: int) -> bool:
+    """True if only the truth's own NaN rows were dropped, i.e. precomputed truth invariants still apply."""
+    return truth_stats is not None and truth_stats.get("n_valid") == n_scored
+
+def regression_kernel(y_true, y_pred, truth_stats: dict | None = None) -> dict | None:
+    """
+    Computes MSE, MAE and R-squared from a single residual vector.
+    truth_stats (from precompute_truth_stats) lets R² reuse the precomputed total sum of squares.
+    """
+    paired = _paired_residuals(y_true, y_pred)
+    if paired is None:
+        return None
+    y_true, residual = paired
+
+    n = residual.size
+    ss_res = float(np.dot(residual, residual))
+    mse = ss_res / n
+    mae = float(np.abs(residual).sum()) / n
+
+    if n < 2:
+        r2 = float('nan') # R² is not well-defined with less than two samples (same as sklearn)
+    else:
+        if _same_rows_as_truth(truth_stats, n):
+            ss_tot = truth_stats["ss_tot"]
+        else:
+            deviation = y_true - y_true.mean()
+            ss_tot = float(np.dot(deviation, deviation))
+        if ss_tot == 0.0:
+            # Constant target: perfect predictions score 1.0, anything else 0.0 (sklearn's force_finite behaviour)
+            r2 = 1.0 if ss_res == 0.0 else 0.0
+        else:
+            r2 = 1.0 - ss_res / ss_tot
+
+    return {"MSE": mse, "MAE": mae, "R²": r2}
+
+def forecasting_kernel(y_true, y_pred, truth_stats: dict | None = None) -> dict | None:
+    """
+    Computes RMSE and MAPE from a single residual vector.
+    truth_stats (from precompute_truth_stats) lets MAPE reuse the precomputed zero mask of the targets.
+    """
+    paired = _paired_residuals(y_true, y_pred)
+    if paired is None:
+        return None
+    y_true, residual = paired
+
+    n = residual.size
+    rmse = np.sqrt(float(np.dot(residual, residual)) / n)
+
+    # Avoid division by zero for MAPE if y_true contains 0.
+    # Replace 0 with a tiny number for MAPE calculation, as before.
+    abs_true = np.abs(y_true)
+    zero_mask = truth_stats["zero_mask"] if _same_rows_as_truth(truth_stats, n) else (abs_true == 0)
+    abs_true[zero_mask] = np.finfo(float).eps
+    mape = float((np.abs(residual) / abs_true).sum()) / n * 100
+
+    return {"RMSE": float(rmse), "MAPE (%)": mape}
+
+def sarima_kernel(y_true, y_pred, truth_stats: dict | None = None) -> dict | None:
+    """Same reductions as forecasting_kernel, reported under the SARIMA metric names."""
+    metrics = forecasting_kernel(y_true, y_pred, truth_stats=truth_stats)
+    if metrics:
+        return {"RMSE (SARIMA)": metrics["RMSE"], "MAPE (%) (SARIMA)": metrics["MAPE (%)"]}
+    return None
+
+# --- Classification: one label encoding, one confusion matrix ---
+
+def get_class_vocabulary(y_true) -> np.ndarray:
+    """
+    Returns the sorted class labels of y_true (NaNs excluded). It is computed once per ground truth
+    (revision) in precompute_truth_stats, so repeated submissions do not re-derive it.
+    """
+    y_true = np.asarray(y_true)
+    return np.unique(y_true[~pd.isna(y_true)])
+
+def encode_labels(values, classes) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Integer-encodes labels against a class vocabulary with one hash lookup.
+    Labels missing from the vocabulary (e.g. a predicted class that never occurs in the truth)
+    are appended to it. Returns (codes, labels) where labels[codes] == values.
+    """
+    labels = pd.Index(classes)
+    codes = labels.get_indexer(values)
+    unseen = codes < 0
+    if unseen.any():
+        extra_labels, extra_codes = np.unique(np.asarray(values)[unseen], return_inverse=True)
+        codes[unseen] = len(labels) + extra_codes
+        labels = labels.append(pd.Index(extra_labels))
+    return codes, labels.to_numpy()
+
+def confusion_matrix_kernel(y_true, y_pred, classes=None, true_codes=None) -> tuple[np.ndarray, np.ndarray] | None:
+    """
+    Builds the confusion matrix (rows = true, columns = predicted) with a single np.bincount.
+    `classes` is an optional precomputed vocabulary (see get_class_vocabulary). If `true_codes`
+    (y_true already encoded against `classes`, -1 for missing values) is given too, only y_pred is encoded.
+    Returns (confusion matrix, labels) or None if nothing can be scored.
+    """
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+
+    if y_true.shape != y_pred.shape:
+        print("Error: True values and predictions have different lengths.")
+        return None
+
+    if true_codes is not None and classes is not None:
+        valid_mask = (true_codes >= 0) & ~pd.isna(y_pred)
+    else:
+        true_codes = None
+        valid_mask = ~(pd.isna(y_true) | pd.isna(y_pred))
+    if not valid_mask.all():
+        print("Warning: Data contains NaN values. Metrics might be affected or fail. Attempting to drop NaNs for calculation.")
+        y_true = y_true[valid_mask]
+        y_pred = y_pred[valid_mask]
+        if true_codes is not None:
+            true_codes = true_codes[valid_mask]
+        if y_true.size == 0:
+            print("Error: All data removed after dropping NaNs. Cannot calculate metrics.")
+            return None
+
+    if classes is None:
+        classes = get_class_vocabulary(y_true)
+    # Labels outside the vocabulary (on either side) are appended to it, so the matrix is always complete.
+    if true_codes is None:
+        true_codes, labels = encode_labels(y_true, classes)
+    else:
+        labels = np.asarray(classes)
+    pred_codes, labels = encode_labels(y_pred, labels)
+
+    n_labels = len(labels)
+    confusion = np.bincount(true_codes * n_labels + pred_codes, minlength=n_labels * n_labels).reshape(n_labels, n_labels)
+    return confusion, labels
+
+def _binary_positive_index(labels) -> int:
+    """Index of the positive class for binary scoring: label 1 if present, otherwise the last label in sorted order."""
+    for i, label in enumerate(labels):
+        if label == 1:
+            return i
+    return len(labels) - 1
+
+def classification_report_from_confusion(confusion: np.ndarray, labels) -> dict:
+    """
+    Derives accuracy and precision/recall/F1 under every averaging scheme from a confusion matrix.
+    Ill-defined ratios are reported as 0 (sklearn's zero_division=0).
+
+    Returns:
+        {
+          "metrics": {"Accuracy", "Precision", "Recall", "F1-Score"} using 'binary' averaging when the
+                     true labels have two classes and 'weighted' otherwise (the headline scores),
+          "averages": {"binary": {...} or None, "macro": {...}, "weighted": {...}, "micro": {...}},
+          "confusion_matrix": the matrix as given, "labels": the labels of its rows/columns
+        }
+    """
+    confusion = np.asarray(confusion)
+    counts = confusion.astype(np.float64)
+    true_support = counts.sum(axis=1)
+    pred_support = counts.sum(axis=0)
+    true_positive = np.diag(counts)
+    total = true_support.sum()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(pred_support > 0, true_positive / pred_support, 0.0)
+        recall = np.where(true_support > 0, true_positive / true_support, 0.0)
+        f1_denominator = true_support + pred_support # = 2TP + FP + FN
+        f1 = np.where(f1_denominator > 0, 2 * true_positive / f1_denominator, 0.0)
+
+    def _scores(p, r, f):
+        return {"Precision": float(p), "Recall": float(r), "F1-Score": float(f)}
+
+    averages = {}
+    present_classes = np.flatnonzero(true_support > 0)
+    if present_classes.size == 2:
+        pos = present_classes[_binary_positive_index([labels[i] for i in present_classes])]
+        averages["binary"] = _scores(precision[pos], recall[pos], f1[pos])
+    else:
+        averages["binary"] = None
+    averages["macro"] = _scores(precision.mean(), recall.mean(), f1.mean())
+    weights = true_support / total if total else true_support
+    averages["weighted"] = _scores(np.dot(precision, weights), np.dot(recall, weights), np.dot(f1, weights))
+    tp_sum = true_positive.sum()
+    micro = tp_sum / total if total else 0.0 # Single-label: micro precision = micro recall = accuracy
+    averages["micro"] = _scores(micro, micro, micro)
+
+    headline = averages["binary"] if averages["binary"] is not None else averages["weighted"]
+    accuracy = float(tp_sum / total) if total else 0.0
+    return {
+        "metrics": {"Accuracy": accuracy, **headline},
+        "averages": averages,
+        "confusion_matrix": confusion,
+        "labels": labels,
+    }
+
+def classification_scores_from_confusion(confusion: np.ndarray, labels) -> dict:
+    """Headline Accuracy, Precision, Recall and F1-score of a confusion matrix."""
+    return classification_report_from_confusion(confusion, labels)["metrics"]
+
+def classification_report_kernel(y_true, y_pred, classes=None, truth_stats: dict | None = None) -> dict | None:
+    """
+    Encodes the labels once, builds one confusion matrix and derives every classification score from it.
+    truth_stats (from precompute_truth_stats) supplies the vocabulary and the already-encoded true labels.
+    """
+    true_codes = None
+    if truth_stats is not None:
+        classes, true_codes = truth_stats["classes"], truth_stats["true_codes"]
+    result = confusion_matrix_kernel(y_true, y_pred, classes=classes, true_codes=true_codes)
+    if result is None:
+        return None
+    confusion, labels = result
+    return classification_report_from_confusion(confusion, labels)
+
+def classification_kernel(y_true, y_pred, classes=None, truth_stats: dict | None = None) -> dict | None:
+    """Computes Accuracy, Precision, Recall and F1-score from a single confusion matrix."""
+    report = classification_report_kernel(y_true, y_pred, classes=classes, truth_stats=truth_stats)
+    return report["metrics"] if report else None
+
+def confusion_matrix_to_dataframe(confusion: np.ndarray, labels) -> pd.DataFrame:
+    """Labels a confusion matrix for display (rows = true class, columns = predicted class)."""
+    # Integer class labels read from a float column (e.g. 1.0) are shown as integers.
+    names = [str(int(label)) if isinstance(label, float) and label.is_integer() else str(label) for label in labels]
+    index = pd.Index(names, name="True")
+    columns = pd.Index(names, name="Predicted")
+    return pd.DataFrame(confusion, index=index, columns=columns)
+
+def metric_cell_value(value):
+    """A metric value as written to a Submissions sheet cell: Sheets cannot store NaN/inf (e.g. an undefined R²), so those are empty."""
+    if isinstance(value, (float, np.floating)):
+        return float(value) if np.isfinite(value) else ""
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+# --- Precomputed ground-truth invariants ---
+
+def precompute_truth_stats(y_true, datathon_type: str) -> dict:
+    """
+    Computes the parts of the metrics that depend only on the true values, once per ground truth,
+    so that scoring a submission only has to touch the predictions.
+
+    Returns a dict with "n_valid" (non-NaN true values) and, for classification, "classes" and
+    "true_codes" (y_true encoded against classes, -1 where missing); for the numeric task types,
+    "mean" and "ss_tot" (for R²) and "zero_mask" (targets equal to 0, for MAPE) over the non-NaN values.
+    """
+    if datathon_type.lower() == "classification":
+        y_true = np.asarray(y_true)
+        valid_mask = ~pd.isna(y_true)
+        classes = get_class_vocabulary(y_true)
+        true_codes = np.full(y_true.shape, -1, dtype=np.int64)
+        true_codes[valid_mask], _ = encode_labels(y_true[valid_mask], classes)
+        return {"n_valid": int(valid_mask.sum()), "classes": classes, "true_codes": true_codes}
+
+    y_true = _as_float_array(y_true)
+    valid_values = y_true[~np.isnan(y_true)]
+    mean = float(valid_values.mean()) if valid_values.size else float('nan')
+    deviation = valid_values - mean
+    return {
+        "n_valid": int(valid_values.size),
+        "mean": mean,
+        "ss_tot": float(np.dot(deviation, deviation)),
+        "zero_mask": valid_values == 0,
+    }
+
+# --- DataFrame wrappers ---
+
+def _extract_columns(y_true_df: pd.DataFrame, y_pred_df: pd.DataFrame, target_col: str, pred_col: str, as_float: bool = True):
+    """Pulls the target and prediction columns out as NumPy arrays. Raises KeyError if a column is missing."""
+    y_true = y_true_df[target_col].to_numpy()
+    y_pred = y_pred_df[pred_col].to_numpy()
+    if as_float:
+        return _as_float_array(y_true), _as_float_array(y_pred)
+    return y_true, y_pred
 
 def calculate_regression_metrics(y_true_df: pd.DataFrame, y_pred_df: pd.DataFrame, target_col: str, pred_col: str) -> dict | None:
     """Calculates regression metrics: MSE, MAE, R-squared."""
     try:
-        y_true = y_true_df[target_col]
-        y_pred = y_pred_df[pred_col]
-
-        if len(y_true) != len(y_pred):
-            # st.error("True values and predictions have different lengths.") # Cannot use st here
-            print("Error: True values and predictions have different lengths.")
-            return None
-        if y_true.isnull().any() or y_pred.isnull().any():
-            # st.warning("Data contains NaN values. Metrics might be affected or fail. Attempting to drop NaNs for calculation.")
-            print("Warning: Data contains NaN values. Metrics might be affected or fail. Attempting to drop NaNs for calculation.")
-            combined = pd.DataFrame({'true': y_true, 'pred': y_pred}).dropna()
-            y_true = combined['true']
-            y_pred = combined['pred']
-            if combined.empty:
-                print("Error: All data removed after dropping NaNs. Cannot calculate metrics.")
-                return None
-
-
-        mse = mean_squared_error(y_true, y_pred)
-        mae = mean_absolute_error(y_true, y_pred)
-        r2 = r2_score(y_true, y_pred)
-        
-        return {"MSE": mse, "MAE": mae, "R²": r2}
+        y_true, y_pred = _extract_columns(y_true_df, y_pred_df, target_col, pred_col)
+        return regression_kernel(y_true, y_pred)
     except KeyError as e:
         # st.error(f"Column not found: {e}. Ensure target column is '{target_col}' and prediction column is '{pred_col}'.")
         print(f"KeyError: Column not found: {e}. Ensure target column is '{target_col}' and prediction column is '{pred_col}'.")
@@ -37,38 +326,14 @@ def calculate_regression_metrics(y_true_df: pd.DataFrame, y_pred_df: pd.DataFram
         print(f"An error occurred during regression metrics calculation: {e}")
         return None
 
-def calculate_classification_metrics(y_true_df: pd.DataFrame, y_pred_df: pd.DataFrame, target_col: str, pred_col: str) -> dict | None:
-    """Calculates classification metrics: Accuracy, Precision, Recall, F1-score."""
+def calculate_classification_report(y_true_df: pd.DataFrame, y_pred_df: pd.DataFrame, target_col: str, pred_col: str) -> dict | None:
+    """
+    Calculates the full classification report (see classification_report_from_confusion), including the
+    confusion matrix so the UI can display it without rescoring.
+    """
     try:
-        y_true = y_true_df[target_col]
-        y_pred = y_pred_df[pred_col]
-
-        if len(y_true) != len(y_pred):
-            print("Error: True values and predictions have different lengths.")
-            return None
-        # Basic check for NaNs, though classification metrics might handle them or require specific preprocessing.
-        if y_true.isnull().any() or y_pred.isnull().any():
-            print("Warning: Data contains NaN values. Metrics might be affected or fail. Attempting to drop NaNs for calculation.")
-            combined = pd.DataFrame({'true': y_true, 'pred': y_pred}).dropna()
-            y_true = combined['true']
-            y_pred = combined['pred']
-            if combined.empty:
-                print("Error: All data removed after dropping NaNs. Cannot calculate metrics.")
-                return None
-
-        # Determine average method for multiclass precision, recall, f1
-        # If binary or only a few unique values, can use 'binary' or 'micro'/'macro'/'weighted'
-        # For simplicity, using 'weighted' for multi-class, auto-adjusts for binary.
-        num_classes = y_true.nunique()
-        average_method = 'binary' if num_classes == 2 else 'weighted'
-        
-        accuracy = accuracy_score(y_true, y_pred)
-        # Specify zero_division=0 to return 0 instead of warning for ill-defined precision/recall
-        precision = precision_score(y_true, y_pred, average=average_method, zero_division=0)
-        recall = recall_score(y_true, y_pred, average=average_method, zero_division=0)
-        f1 = f1_score(y_true, y_pred, average=average_method, zero_division=0)
-        
-        return {"Accuracy": accuracy, "Precision": precision, "Recall": recall, "F1-Score": f1}
+        y_true, y_pred = _extract_columns(y_true_df, y_pred_df, target_col, pred_col, as_float=False)
+        return classification_report_kernel(y_true, y_pred)
     except KeyError as e:
         print(f"KeyError: Column not found: {e}. Ensure target column is '{target_col}' and prediction column is '{pred_col}'.")
         return None
@@ -76,32 +341,16 @@ def calculate_classification_metrics(y_true_df: pd.DataFrame, y_pred_df: pd.Data
         print(f"An error occurred during classification metrics calculation: {e}")
         return None
 
+def calculate_classification_metrics(y_true_df: pd.DataFrame, y_pred_df: pd.DataFrame, target_col: str, pred_col: str) -> dict | None:
+    """Calculates classification metrics: Accuracy, Precision, Recall, F1-score."""
+    report = calculate_classification_report(y_true_df, y_pred_df, target_col, pred_col)
+    return report["metrics"] if report else None
+
 def calculate_forecasting_metrics(y_true_df: pd.DataFrame, y_pred_df: pd.DataFrame, target_col: str, pred_col: str) -> dict | None:
     """Calculates forecasting metrics: RMSE, MAPE."""
     try:
-        y_true = y_true_df[target_col]
-        y_pred = y_pred_df[pred_col]
-
-        if len(y_true) != len(y_pred):
-            print("Error: True values and predictions have different lengths.")
-            return None
-        if y_true.isnull().any() or y_pred.isnull().any():
-            print("Warning: Data contains NaN values. Metrics might be affected or fail. Attempting to drop NaNs for calculation.")
-            combined = pd.DataFrame({'true': y_true, 'pred': y_pred}).dropna()
-            y_true = combined['true']
-            y_pred = combined['pred']
-            if combined.empty:
-                print("Error: All data removed after dropping NaNs. Cannot calculate metrics.")
-                return None
-        
-        # Avoid division by zero for MAPE if y_true contains 0.
-        # Replace 0 with a very small number, or handle as per specific requirements.
-        # For now, we'll calculate MAPE carefully.
-        y_true_mape = y_true.replace(0, np.finfo(float).eps) # Replace 0 with a tiny number for MAPE calculation
-        mape = np.mean(np.abs((y_true - y_pred) / y_true_mape)) * 100
-        rmse = np.sqrt(mean_squared_error(y_true, y_pred))
-        
-        return {"RMSE": rmse, "MAPE (%)": mape}
+        y_true, y_pred = _extract_columns(y_true_df, y_pred_df, target_col, pred_col)
+        return forecasting_kernel(y_true, y_pred)
     except KeyError as e:
         print(f"KeyError: Column not found: {e}. Ensure target column is '{target_col}' and prediction column is '{pred_col}'.")
         return None
@@ -118,12 +367,334 @@ def calculate_sarima_metrics(y_true_df: pd.DataFrame, y_pred_df: pd.DataFrame, t
     # For now, SARIMA will use the same core forecasting metrics (RMSE, MAPE)
     # as AIC/BIC require model parameters not available from just true/pred values.
     # This can be expanded if model objects or their summaries become available.
-    metrics = calculate_forecasting_metrics(y_true_df, y_pred_df, target_col, pred_col)
-    if metrics:
-        # Potentially rename or add specific SARIMA context if needed in future
-        # For now, just returning what calculate_forecasting_metrics provides
-        return {"RMSE (SARIMA)": metrics.get("RMSE"), "MAPE (%) (SARIMA)": metrics.get("MAPE (%)")}
-    return None
+    try:
+        y_true, y_pred = _extract_columns(y_true_df, y_pred_df, target_col, pred_col)
+        return sarima_kernel(y_true, y_pred)
+    except KeyError as e:
+        print(f"KeyError: Column not found: {e}. Ensure target column is '{target_col}' and prediction column is '{pred_col}'.")
+        return None
+    except Exception as e:
+        print(f"An error occurred during SARIMA metrics calculation: {e}")
+        return None
+
+# --- Streaming (out-of-core) accumulators ---
+# Accumulators are fed chunk by chunk and can be merged across workers, so prediction files
+# larger than RAM can be scored with memory bounded by the chunk size.
+
+class RegressionAccumulator:
+    """
+    Mergeable running sums for MSE, MAE, R², RMSE and MAPE.
+    The mean and sum of squared deviations of the true values are kept Welford-style,
+    so R² can be finalized without a second pass over the data.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.dropped = 0                 # Rows skipped because either side was NaN
+        self.sum_squared_residual = 0.0
+        self.sum_abs_residual = 0.0
+        self.sum_abs_pct_error = 0.0     # MAPE numerator, with 0 targets replaced by eps (as in forecasting_kernel)
+        self.true_mean = 0.0
+        self.true_m2 = 0.0               # Sum of squared deviations of y_true around true_mean
+
+    def update(self, y_true, y_pred) -> bool:
+        """Adds one chunk. Returns False (and leaves the state unchanged) if the chunk lengths differ."""
+        masked = _masked_residuals(y_true, y_pred)
+        if masked is None:
+            return False
+        y_true, residual, n_dropped = masked
+        self.dropped += n_dropped
+        if residual.size == 0:
+            return True
+
+        abs_residual = np.abs(residual)
+        abs_true = np.abs(y_true)
+        abs_true[abs_true == 0] = np.finfo(float).eps
+
+        chunk = RegressionAccumulator()
+        chunk.count = residual.size
+        chunk.sum_squared_residual = float(np.dot(residual, residual))
+        chunk.sum_abs_residual = float(abs_residual.sum())
+        chunk.sum_abs_pct_error = float((abs_residual / abs_true).sum())
+        chunk.true_mean = float(y_true.mean())
+        deviation = y_true - chunk.true_mean
+        chunk.true_m2 = float(np.dot(deviation, deviation))
+        self.merge(chunk)
+        return True
+
+    def merge(self, other: "RegressionAccumulator") -> "RegressionAccumulator":
+        """Combines another accumulator into this one (Chan et al. parallel update for the mean/M2)."""
+        self.dropped += other.dropped
+        if other.count == 0:
+            return self
+        combined = self.count + other.count
+        delta = other.true_mean - self.true_mean
+        self.true_mean += delta * other.count / combined
+        self.true_m2 += other.true_m2 + delta * delta * self.count * other.count / combined
+        self.count = combined
+        self.sum_squared_residual += other.sum_squared_residual
+        self.sum_abs_residual += other.sum_abs_residual
+        self.sum_abs_pct_error += other.sum_abs_pct_error
+        return self
+
+    def _check_not_empty(self) -> bool:
+        if self.dropped:
+            print(f"Warning: {self.dropped} rows contained NaN values and were dropped for calculation.")
+        if self.count == 0:
+            print("Error: No valid rows were accumulated. Cannot calculate metrics.")
+            return False
+        return True
+
+    def regression_metrics(self) -> dict | None:
+        if not self._check_not_empty():
+            return None
+        mse = self.sum_squared_residual / self.count
+        if self.count < 2:
+            r2 = float('nan')
+        elif self.true_m2 == 0.0:
+            r2 = 1.0 if self.sum_squared_residual == 0.0 else 0.0
+        else:
+            r2 = 1.0 - self.sum_squared_residual / self.true_m2
+        return {"MSE": mse, "MAE": self.sum_abs_residual / self.count, "R²": r2}
+
+    def forecasting_metrics(self) -> dict | None:
+        if not self._check_not_empty():
+            return None
+        return {"RMSE": float(np.sqrt(self.sum_squared_residual / self.count)),
+                "MAPE (%)": self.sum_abs_pct_error / self.count * 100}
+
+    def sarima_metrics(self) -> dict | None:
+        metrics = self.forecasting_metrics()
+        if metrics:
+            return {"RMSE (SARIMA)": metrics["RMSE"], "MAPE (%) (SARIMA)": metrics["MAPE (%)"]}
+        return None
+
+def _typed_labels(labels: np.ndarray) -> np.ndarray:
+    """
+    Labels read as text chunk by chunk, typed the way parsing the whole column would have typed them:
+    numbers if every label is numeric, text otherwise. Labels that are not all text are returned as is.
+    """
+    if labels.size and all(isinstance(label, str) for label in labels):
+        numeric = pd.to_numeric(pd.Series(labels, dtype=object), errors='coerce')
+        if not numeric.isna().any():
+            return numeric.to_numpy(dtype=object)
+    return labels
+
+class ClassificationAccumulator:
+    """
+    Mergeable (true label, predicted label) -> count table, finalized into classification metrics.
+    `classes` is the optional vocabulary of the truth (see get_class_vocabulary); without it, the true
+    labels seen so far are used.
+    """
+
+    def __init__(self, classes=None):
+        self.classes = classes
+        self.pair_counts = {}
+        self.dropped = 0
+
+    def update(self, y_true, y_pred) -> bool:
+        """Adds one chunk. Returns False (and leaves the state unchanged) if the chunk lengths differ."""
+        y_true = np.asarray(y_true)
+        y_pred = np.asarray(y_pred)
+        if y_true.shape != y_pred.shape:
+            return False
+
+        valid_mask = ~(pd.isna(y_true) | pd.isna(y_pred))
+        self.dropped += int(valid_mask.size - valid_mask.sum())
+        if not valid_mask.any():
+            return True
+
+        # One vectorized group-by per chunk; only the (small) table of distinct pairs is kept.
+        pairs = pd.DataFrame({'true': y_true[valid_mask], 'pred': y_pred[valid_mask]}).value_counts(sort=False)
+        for pair, count in pairs.items():
+            self.pair_counts[pair] = self.pair_counts.get(pair, 0) + int(count)
+        return True
+
+    def merge(self, other: "ClassificationAccumulator") -> "ClassificationAccumulator":
+        self.dropped += other.dropped
+        if self.classes is None:
+            self.classes = other.classes
+        for pair, count in other.pair_counts.items():
+            self.pair_counts[pair] = self.pair_counts.get(pair, 0) + count
+        return self
+
+    def confusion_matrix(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (confusion matrix, labels) built from the accumulated pair counts, with the labels in the
+        same order as confusion_matrix_kernel (the truth's vocabulary, then unseen predicted labels).
+        """
+        true_labels = np.array([true_label for true_label, _ in self.pair_counts], dtype=object)
+        pred_labels = _typed_labels(np.array([pred_label for _, pred_label in self.pair_counts], dtype=object))
+        counts = np.fromiter(self.pair_counts.values(), dtype=np.int64, count=len(self.pair_counts))
+        classes = self.classes if self.classes is not None else get_class_vocabulary(true_labels)
+        true_codes, labels = encode_labels(true_labels, classes)
+        pred_codes, labels = encode_labels(pred_labels, labels)
+        confusion = np.zeros((len(labels), len(labels)), dtype=np.int64)
+        np.add.at(confusion, (true_codes, pred_codes), counts)
+        return confusion, labels
+
+    def classification_metrics(self) -> dict | None:
+        if self.dropped:
+            print(f"Warning: {self.dropped} rows contained NaN values and were dropped for calculation.")
+        if not self.pair_counts:
+            print("Error: No valid rows were accumulated. Cannot calculate metrics.")
+            return None
+        confusion, labels = self.confusion_matrix()
+        return classification_scores_from_confusion(confusion, labels)
+
+def calculate_streaming_metrics(y_true, prediction_chunks, pred_col: str, datathon_type: str) -> dict | None:
+    """
+    Scores prediction chunks (e.g. from data_loader.iter_csv_chunks) against the true values (e.g.
+    GroundTruth.actual), matched by position in file order. Only one prediction chunk is held in memory
+    at a time. Classification predictions should be parsed as str: each chunk would otherwise infer its
+    own label type, so they are typed once all chunks are seen (see _typed_labels). Returns a report like ScoringPlan.score (for classification with "confusion_matrix" and
+    "labels"), or None if no metrics could be computed. A missing prediction column or a row count
+    that differs from the true values raises ValueError.
+    """
+    plan = get_scoring_plan(datathon_type)
+    if plan is None:
+        print(f"Error: Unsupported datathon type '{datathon_type}' for streaming metrics.")
+        return None
+    accumulator_cls, finalize = plan.streaming
+
+    y_true = np.asarray(y_true)
+    accumulator = accumulator_cls()
+    if isinstance(accumulator, ClassificationAccumulator):
+        accumulator.classes = get_class_vocabulary(y_true) # Same label order as the in-memory kernel
+    offset = 0
+    for chunk in prediction_chunks:
+        if pred_col not in chunk.columns:
+            raise ValueError(f"Missing prediction column '{pred_col}'.")
+        y_pred = chunk[pred_col].to_numpy()
+        end = offset + len(y_pred)
+        if end > len(y_true):
+            raise ValueError(f"Row count mismatch: True outputs have {len(y_true)} rows, your predictions have more.")
+        accumulator.update(y_true[offset:end], y_pred) # Slices are views, no copy of the ground truth
+        offset = end
+    if offset != len(y_true):
+        raise ValueError(f"Row count mismatch: True outputs have {len(y_true)} rows, your predictions have {offset} rows.")
+
+    scores = finalize(accumulator)
+    if not scores:
+        return None
+    report = {"metrics": scores}
+    if isinstance(accumulator, ClassificationAccumulator):
+        report["confusion_matrix"], report["labels"] = accumulator.confusion_matrix()
+    return report
+
+# --- Metric registry ---
+# Single source of truth for every task type: its kernel, the metrics it reports with their sort
+# direction (True = lower is better, i.e. ascending), its default primary metric, its streaming
+# accumulator, and "value_dtype", the dtype its true values and predictions are parsed as.
+# Classification has no value_dtype: its labels keep the type pandas infers.
+# Keys are the lowercase datathon types. To rank by another metric than the default, set it in
+# config.PRIMARY_METRIC_OVERRIDES instead of editing this table.
+METRIC_REGISTRY = {
+    "regression": {
+        "kernel": regression_kernel,
+        "metrics": {"MSE": True, "MAE": True, "R²": False},
+        "primary": "R²",
+        "value_dtype": "float64",
+        "streaming": (RegressionAccumulator, RegressionAccumulator.regression_metrics),
+    },
+    "classification": {
+        "kernel": classification_kernel,
+        "report_kernel": classification_report_kernel, # Also returns the confusion matrix for display
+        "metrics": {"Accuracy": False, "Precision": False, "Recall": False, "F1-Score": False},
+        "primary": "F1-Score",
+        "streaming": (ClassificationAccumulator, ClassificationAccumulator.classification_metrics),
+    },
+    "forecasting": {
+        "kernel": forecasting_kernel,
+        "metrics": {"RMSE": True, "MAPE (%)": True},
+        "primary": "MAPE (%)",
+        "value_dtype": "float64",
+        "streaming": (RegressionAccumulator, RegressionAccumulator.forecasting_metrics),
+    },
+    "sarima": {
+        "kernel": sarima_kernel,
+        "metrics": {"RMSE (SARIMA)": True, "MAPE (%) (SARIMA)": True},
+        "primary": "MAPE (%) (SARIMA)",
+        "value_dtype": "float64",
+        "streaming": (RegressionAccumulator, RegressionAccumulator.sarima_metrics),
+    },
+}
+
+class ScoringPlan:
+    """A resolved registry entry: everything needed to score and rank submissions of one task type."""
+
+    def __init__(self, datathon_type: str, entry: dict, primary_metric: str):
+        self.datathon_type = datathon_type
+        self.kernel = entry["kernel"]
+        self.report_kernel = entry.get("report_kernel")
+        self.metric_names = tuple(entry["metrics"])
+        self.lower_is_better = dict(entry["metrics"])
+        self.primary_metric = primary_metric
+        self.primary_ascending = entry["metrics"][primary_metric]
+        self.streaming = entry["streaming"]
+        self.value_dtype = entry.get("value_dtype") # Parse hint for the value columns, None for labels
+
+    def score(self, y_true, y_pred, truth_stats: dict | None = None) -> dict | None:
+        """
+        Scores one submission. Returns a dict with "metrics" (metric name -> value) and, for task types
+        with a report kernel (classification), its extra entries such as "confusion_matrix" and "labels".
+        Returns None if the kernel failed (errors are printed).
+        """
+        if self.report_kernel is not None:
+            return self.report_kernel(y_true, y_pred, truth_stats=truth_stats)
+        scores = self.kernel(y_true, y_pred, truth_stats=truth_stats)
+        return {"metrics": scores} if scores else None
+
+@lru_cache(maxsize=None)
+def _resolve_scoring_plan(type_key: str) -> ScoringPlan | None:
+    entry = METRIC_REGISTRY.get(type_key)
+    if entry is None:
+        return None
+    primary_metric = config.PRIMARY_METRIC_OVERRIDES.get(type_key, entry["primary"])
+    if primary_metric not in entry["metrics"]:
+        print(f"Warning: Primary metric override '{primary_metric}' is not reported for '{type_key}'. Using '{entry['primary']}'.")
+        primary_metric = entry["primary"]
+    return ScoringPlan(type_key, entry, primary_metric)
+
+def get_scoring_plan(datathon_type: str | None) -> ScoringPlan | None:
+    """
+    Returns the ScoringPlan of a datathon type ("Regression", "classification", ...), resolved once per
+    process and shared by every rerun, or None for an unsupported type.
+    """
+    if not datathon_type:
+        return None
+    return _resolve_scoring_plan(datathon_type.lower())
+
+def rank_submissions(submissions_df: pd.DataFrame, datathon_type: str, best_per_team: bool = True) -> pd.DataFrame | None:
+    """
+    Orders submissions by the primary metric of their datathon type, best first, with a 1-based "Rank"
+    column. Ties keep their sheet order, so the earlier submission ranks higher.
+
+    Args:
+        submissions_df: Rows of a "Submissions_<datathon_id>" sheet (values may be strings, as read from Sheets).
+        datathon_type: The datathon type used to look up the scoring plan.
+        best_per_team: Keep only the best submission of every team (requires a "TeamName" column).
+
+    Returns:
+        The ranked DataFrame (rows without a numeric primary metric are left out), or None if the
+        datathon type is unsupported or the primary metric column is missing.
+    """
+    plan = get_scoring_plan(datathon_type)
+    if plan is None:
+        print(f"Error: Unsupported datathon type '{datathon_type}' for ranking.")
+        return None
+    if plan.primary_metric not in submissions_df.columns:
+        print(f"Error: Primary metric column '{plan.primary_metric}' not found in submissions.")
+        return None
+
+    ranked = submissions_df.copy()
+    ranked[plan.primary_metric] = pd.to_numeric(ranked[plan.primary_metric], errors='coerce')
+    ranked = ranked.dropna(subset=[plan.primary_metric])
+    ranked = ranked.sort_values(plan.primary_metric, ascending=plan.primary_ascending, kind='mergesort')
+    if best_per_team and "TeamName" in ranked.columns:
+        ranked = ranked.drop_duplicates(subset="TeamName", keep='first')
+    ranked.insert(0, "Rank", np.arange(1, len(ranked) + 1))
+    return ranked.reset_index(drop=True)
 
 # Note: Streamlit components (st.error, st.warning) are not used here as this is a backend module.
 # Calling functions should handle presenting errors/warnings to the UI if needed.
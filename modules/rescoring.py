@@ -0,0 +1,260 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import gspread
+from modules import ground_truth, metrics, storage, config, team_roster
+
+# --- Batch rescoring of all historical submissions ---
+# When the test outputs of a datathon are fixed or replaced, every row of its
+# "Submissions_<datathon_id>" sheet has stale scores. rescore_all_submissions() downloads and
+# scores every stored prediction file across a process pool. The ground truth lives once in
+# shared memory and is attached by every worker; the new metrics go back in one bulk update.
+
+PREDICTION_COLUMN_NAME = 'Predicted' # Same assumption as the student scoring block
+
+# Per-process state of a rescoring worker, filled once by _init_worker
+_worker_state = {}
+
+# Shared arrays of the ground truth's ID index (see ground_truth.IdIndex), kept apart from the metric invariants
+_ID_INDEX_ARRAYS = ("id_index.ids", "id_index.order", "id_index.sorted_ids")
+
+def _share_array(array: np.ndarray) -> tuple[shared_memory.SharedMemory, tuple]:
+    """Copies an array into a new shared memory block. Returns the block and a picklable descriptor."""
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+def _attach_array(descriptor: tuple) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    name, shape, dtype = descriptor
+    shm = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    array.flags.writeable = False
+    return shm, array
+
+def _init_worker(datathon_type: str, truth_descriptors: dict, truth_scalars: dict, storage_spec, storage_backend=None):
+    """
+    Sets up a worker: attaches the shared ground-truth arrays and rebuilds the storage backend for the process
+    from storage_spec (storage.StorageBackend.worker_spec). `storage_backend` is only passed when running in-process.
+    """
+    shared_blocks = []
+    truth_stats = dict(truth_scalars)
+    for key, descriptor in truth_descriptors.items():
+        shm, array = _attach_array(descriptor)
+        shared_blocks.append(shm) # Keep the blocks referenced for the lifetime of the worker
+        truth_stats[key] = array
+
+    if storage_backend is None and storage_spec:
+        storage_backend = storage.backend_from_spec(storage_spec)
+
+    id_index = None
+    if _ID_INDEX_ARRAYS[0] in truth_stats:
+        id_index = ground_truth.IdIndex(*(truth_stats.pop(key) for key in _ID_INDEX_ARRAYS))
+
+    # For classification the encoded labels stand in for the (object) labels, which cannot be shared.
+    y_true = truth_stats["true_codes"] if "true_codes" in truth_stats else truth_stats.pop("actual")
+    scoring_plan = metrics.get_scoring_plan(datathon_type)
+    _worker_state.update({
+        "kernel": scoring_plan.kernel,
+        "prediction_dtype": {PREDICTION_COLUMN_NAME: scoring_plan.value_dtype} if scoring_plan.value_dtype else None,
+        "y_true": y_true,
+        "truth_stats": truth_stats,
+        "id_index": id_index,
+        "storage_backend": storage_backend,
+        "shared_blocks": shared_blocks,
+    })
+
+def _rescore_one(prediction_file_id: str) -> tuple[str, dict | None, str | None]:
+    """Downloads and scores one stored prediction file. Returns (file ID, metrics or None, error message or None)."""
+    df_predictions = _worker_state["storage_backend"].download_dataframe(prediction_file_id,
+                                                                        columns=[PREDICTION_COLUMN_NAME, config.ID_COLUMN_NAME],
+                                                                        dtype=_worker_state["prediction_dtype"])
+    if df_predictions is None:
+        return prediction_file_id, None, "could not download or parse the prediction file"
+    if PREDICTION_COLUMN_NAME not in df_predictions.columns:
+        return prediction_file_id, None, f"missing '{PREDICTION_COLUMN_NAME}' column"
+    y_true = _worker_state["y_true"]
+    y_pred = df_predictions[PREDICTION_COLUMN_NAME].to_numpy()
+    id_index = _worker_state["id_index"]
+    if id_index is not None and config.ID_COLUMN_NAME in df_predictions.columns:
+        y_pred, alignment_problems = id_index.align(df_predictions[config.ID_COLUMN_NAME].to_numpy(), y_pred)
+        if y_pred is None:
+            return prediction_file_id, None, ground_truth.describe_alignment_problems(alignment_problems)
+    elif len(df_predictions) != len(y_true):
+        return prediction_file_id, None, f"row count mismatch ({len(df_predictions)} vs {len(y_true)})"
+    try:
+        scores = _worker_state["kernel"](y_true, y_pred, truth_stats=_worker_state["truth_stats"])
+    except (TypeError, ValueError) as e:
+        return prediction_file_id, None, f"could not score predictions: {e}"
+    if scores is None:
+        return prediction_file_id, None, "metrics calculation failed"
+    return prediction_file_id, scores, None
+
+def _split_truth(truth: ground_truth.GroundTruth, datathon_type: str) -> tuple[dict, dict]:
+    """Splits the ground truth into arrays (to be shared) and small scalars (to be pickled to each worker)."""
+    stats = truth.stats(datathon_type)
+    arrays, scalars = {}, {}
+    for key, value in stats.items():
+        if isinstance(value, np.ndarray) and value.dtype != object:
+            arrays[key] = value
+        else:
+            scalars[key] = value
+    if "true_codes" not in stats:
+        arrays["actual"] = truth.actual
+    if truth.id_index is not None:
+        id_index = truth.id_index
+        arrays.update(zip(_ID_INDEX_ARRAYS, (id_index.ids, id_index.order, id_index.sorted_ids)))
+    return arrays, scalars
+
+def _column_letter(col: int) -> str:
+    return gspread.utils.rowcol_to_a1(1, col).rstrip('1')
+
+def _file_id_of_row(row: list, header: list) -> str:
+    """PredictionFileID of a submissions row ("" if it has none)."""
+    file_id_index = header.index(config.SUBMISSION_PREDICTION_FILE_ID_COLUMN)
+    return row[file_id_index].strip() if file_id_index < len(row) else ""
+
+def rescore_all_submissions(storage_backend, submissions_worksheet, true_outputs_file_id: str, datathon_type: str,
+                            max_workers: int | None = config.RESCORING_MAX_WORKERS) -> dict | None:
+    """
+    Rescores every row of a submissions worksheet against the current test outputs and writes the
+    new metrics back with a single batch update.
+
+    Args:
+        storage_backend: The storage.StorageBackend holding the test outputs and prediction files. Each worker
+                         process rebuilds it from its worker_spec(); if it has none (e.g. Drive without
+                         serializable credentials), files are rescored sequentially in this process.
+        submissions_worksheet: The gspread.Worksheet "Submissions_<datathon_id>".
+        true_outputs_file_id: File ID of the (fixed) test outputs CSV.
+        datathon_type: "Regression", "Classification", "Forecasting" or "SARIMA".
+        max_workers: Size of the process pool (None = one per CPU core).
+
+    Returns:
+        A summary {"rescored": int, "failed": [(row, file ID, reason), ...], "skipped_rows": int},
+        or None if nothing could be rescored (errors are printed).
+    """
+    scoring_plan = metrics.get_scoring_plan(datathon_type)
+    if scoring_plan is None:
+        print(f"Error (rescoring.rescore_all_submissions): Unsupported datathon type '{datathon_type}'.")
+        return None
+
+    truth = ground_truth.get_ground_truth(storage_backend, true_outputs_file_id, datathon_type)
+    if truth is None:
+        print(f"Error (rescoring.rescore_all_submissions): Could not load test outputs {true_outputs_file_id}.")
+        return None
+
+    roster = team_roster.get_submission_roster(submissions_worksheet, refresh=False)
+    try:
+        with roster.lock:
+            roster.refresh(force=True)
+            header = roster.header()
+            data_rows = [list(row) for row in roster.data_rows()]
+            read_keys = {roster.key_of_row(row) for row in data_rows} # (team, timestamp) of the rows rescored
+    except Exception as e:
+        print(f"Error (rescoring.rescore_all_submissions): Reading submissions sheet: {e}")
+        return None
+    if not data_rows:
+        return {"rescored": 0, "failed": [], "skipped_rows": 0}
+
+    if config.SUBMISSION_PREDICTION_FILE_ID_COLUMN not in header:
+        print(f"Error (rescoring.rescore_all_submissions): No '{config.SUBMISSION_PREDICTION_FILE_ID_COLUMN}' column in '{submissions_worksheet.title}'.")
+        return None
+
+    # Sheet row number (1-based, as read now; only used in the summary) -> prediction file ID.
+    # Several rows may share a file; it is scored once.
+    row_file_ids = {}
+    for row_number, row in enumerate(data_rows, start=2):
+        file_id = _file_id_of_row(row, header)
+        if file_id:
+            row_file_ids[row_number] = file_id
+    unique_file_ids = sorted(set(row_file_ids.values()))
+
+    results = {}
+    if unique_file_ids:
+        truth_arrays, truth_scalars = _split_truth(truth, datathon_type)
+        shared = {key: _share_array(array) for key, array in truth_arrays.items()}
+        descriptors = {key: descriptor for key, (_, descriptor) in shared.items()}
+        try:
+            storage_spec = storage_backend.worker_spec()
+            if storage_spec:
+                n_workers = min(max_workers or multiprocessing.cpu_count(), len(unique_file_ids))
+                # 'spawn' keeps the workers independent of the Streamlit server's threads
+                with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('spawn'),
+                                         initializer=_init_worker,
+                                         initargs=(scoring_plan.datathon_type, descriptors, truth_scalars, storage_spec)) as pool:
+                    chunksize = max(1, len(unique_file_ids) // (n_workers * 4))
+                    for file_id, scores, error in pool.map(_rescore_one, unique_file_ids, chunksize=chunksize):
+                        results[file_id] = (scores, error)
+            else:
+                _init_worker(scoring_plan.datathon_type, descriptors, truth_scalars, None, storage_backend=storage_backend)
+                for file_id in unique_file_ids:
+                    _, scores, error = _rescore_one(file_id)
+                    results[file_id] = (scores, error)
+        finally:
+            for block in _worker_state.pop("shared_blocks", []):
+                block.close()
+            _worker_state.clear()
+            for shm, _ in shared.values():
+                shm.close()
+                shm.unlink()
+
+    # --- Single bulk write of the new metrics ---
+    metric_names = []
+    for scores, _ in results.values():
+        if scores:
+            metric_names = list(scores.keys())
+            break
+
+    failed = []
+    for row_number, file_id in row_file_ids.items():
+        scores, error = results.get(file_id, (None, "not scored"))
+        if scores is None:
+            failed.append((row_number, file_id, error))
+    summary = {"rescored": len(row_file_ids) - len(failed), "failed": failed,
+               "skipped_rows": len(data_rows) - len(row_file_ids)}
+    if not metric_names:
+        return summary
+
+    # Rows may have moved while the files were scored (submissions appended by the submission log, rows
+    # deleted from the teacher page), so the rows to write are resolved now from the roster's current
+    # rows, under its lock (which deletes take too): the rows read above are found again by their
+    # (TeamName, Timestamp) key and get the scores of their own prediction file; rows appended since
+    # were scored against the current test outputs already. Only rescored cells are written, RAW like
+    # the submission log, so Sheets does not reparse any value.
+    try:
+        with roster.lock:
+            roster.refresh(force=True)
+            header = roster.header()
+            data = []
+            header_changed = False
+            for name in metric_names:
+                if name not in header:
+                    header.append(name)
+                    header_changed = True
+            if header_changed:
+                if submissions_worksheet.col_count < len(header):
+                    submissions_worksheet.add_cols(len(header) - submissions_worksheet.col_count)
+                data.append({'range': f"A1:{_column_letter(len(header))}1", 'values': [header]})
+
+            first_row = roster.index.first_row
+            row_scores = [results.get(_file_id_of_row(row, header), (None, None))[0] if roster.key_of_row(row) in read_keys else None
+                          for row in roster.data_rows()]
+            for name in metric_names:
+                letter = _column_letter(header.index(name) + 1)
+                # One range per run of consecutive rescored rows
+                run_start, run_values = None, []
+                for offset, scores in enumerate(row_scores + [None]):
+                    if scores is not None:
+                        if run_start is None:
+                            run_start = first_row + offset
+                        run_values.append([metrics.metric_cell_value(scores[name])])
+                    elif run_values:
+                        data.append({'range': f"{letter}{run_start}:{letter}{run_start + len(run_values) - 1}", 'values': run_values})
+                        run_start, run_values = None, []
+            submissions_worksheet.batch_update(data, value_input_option='RAW')
+    except Exception as e:
+        print(f"Error (rescoring.rescore_all_submissions): Writing rescored metrics to '{submissions_worksheet.title}': {e}")
+        return None
+    finally:
+        team_roster.mark_stale(submissions_worksheet) # The cached submission rows hold the old metrics
+    return summary
@@ -0,0 +1,136 @@
+# --- Row index that survives row deletions ---
+# Deleting a sheet row moves every row below it up by one, so a plain key -> row number dict needs
+# rebuilding after every delete. RowIndex instead gives every record a permanent slot (its position
+# when loaded or appended) and keeps a Fenwick tree (binary indexed tree) over the slots, holding 1
+# for records still in the sheet and 0 for deleted ones. A record's current row is the number of live
+# slots up to its own, so deletes and appends are O(log n) and row lookups by key need no search.
+
+class RowIndex:
+    """
+    Current sheet rows of keyed records, maintained across deletes and appends.
+
+    Args:
+        keys: Key of each data row in sheet order (None for rows without a key, e.g. blank ones).
+        first_row: Sheet row of the first data row (2 below a header row).
+    """
+
+    def __init__(self, keys: list, first_row: int = 2):
+        self.first_row = first_row
+        self._keys = list(keys) # slot -> key
+        self._alive = [True] * len(self._keys) # slot -> still in the sheet
+        self._live_count = len(self._keys)
+        self._slots = {} # key -> slots of its live records, ascending (duplicates keep sheet order)
+        for slot, key in enumerate(self._keys):
+            if key is not None:
+                self._slots.setdefault(key, []).append(slot)
+        self._build(max(16, len(self._keys)))
+
+    def _build(self, capacity: int):
+        """(Re)builds the tree over `capacity` slots in O(capacity)."""
+        self._capacity = capacity
+        tree = [0] * (capacity + 1) # 1-based
+        for slot, alive in enumerate(self._alive):
+            tree[slot + 1] += alive
+        for i in range(1, capacity + 1):
+            parent = i + (i & -i)
+            if parent <= capacity:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _add(self, slot: int, delta: int):
+        i = slot + 1
+        while i <= self._capacity:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _live_up_to(self, slot: int) -> int:
+        """Number of live slots in [0, slot]."""
+        i, total = slot + 1, 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    def live_slots(self) -> list:
+        """Slots of the records still in the sheet, in sheet order."""
+        return [slot for slot, alive in enumerate(self._alive) if alive]
+
+    def row_of_slot(self, slot: int) -> int | None:
+        """Current sheet row of a slot, or None if its record was deleted."""
+        if not (0 <= slot < len(self._alive)) or not self._alive[slot]:
+            return None
+        return self.first_row + self._live_up_to(slot) - 1
+
+    def slot_of_row(self, row_number: int) -> int | None:
+        """Slot of the record currently at a sheet row (O(log n) descent of the tree), or None."""
+        k = row_number - self.first_row + 1 # k-th live slot
+        if not (1 <= k <= self._live_count):
+            return None
+        position, step = 0, 1 << self._capacity.bit_length()
+        while step:
+            nxt = position + step
+            if nxt <= self._capacity and self._tree[nxt] < k:
+                position = nxt
+                k -= self._tree[nxt]
+            step >>= 1
+        return position # 0-based slot = 1-based tree position - 1
+
+    def find(self, key) -> int | None:
+        """Current sheet row of the first live record with this key, or None."""
+        slots = self._slots.get(key)
+        return self.row_of_slot(slots[0]) if slots else None
+
+    def find_all(self, key) -> list:
+        """Current sheet rows of every live record with this key, ascending."""
+        return [self.row_of_slot(slot) for slot in self._slots.get(key, [])]
+
+    def key_of_row(self, row_number: int):
+        slot = self.slot_of_row(row_number)
+        return None if slot is None else self._keys[slot]
+
+    def append(self, key) -> int:
+        """Adds a record after the last row. Returns its slot."""
+        slot = len(self._alive)
+        if slot >= self._capacity:
+            self._keys.append(key)
+            self._alive.append(True)
+            self._build(self._capacity * 2) # Amortized O(1): the tree is rebuilt when it doubles
+        else:
+            self._keys.append(key)
+            self._alive.append(True)
+            self._add(slot, 1)
+        self._live_count += 1
+        if key is not None:
+            self._slots.setdefault(key, []).append(slot)
+        return slot
+
+    def delete_row(self, row_number: int) -> int | None:
+        """Removes the record at a sheet row (the rows below move up one). Returns its slot, or None."""
+        slot = self.slot_of_row(row_number)
+        if slot is None:
+            return None
+        self._alive[slot] = False
+        self._live_count -= 1
+        self._add(slot, -1)
+        self._unlink(slot)
+        return slot
+
+    def set_key(self, slot: int, key):
+        """Changes the key of a live record (e.g. a renamed team)."""
+        self._unlink(slot)
+        self._keys[slot] = key
+        if key is not None:
+            slots = self._slots.setdefault(key, [])
+            slots.append(slot)
+            slots.sort()
+
+    def _unlink(self, slot: int):
+        key = self._keys[slot]
+        slots = self._slots.get(key)
+        if slots and slot in slots:
+            slots.remove(slot)
+            if not slots:
+                del self._slots[key]
@@ -0,0 +1,109 @@
+import threading
+from concurrent.futures import Future
+import gspread
+from modules import config
+
+# --- Coalescing write queue for Google Sheets ---
+# Each team mutation used to be its own update_cell/append_row request, so the login rush at the start
+# of an event (every student creating or joining a team within a minute) ran into the per-minute
+# write quota. Writes to a worksheet are now queued for SHEET_WRITE_COALESCE_SECONDS and sent together:
+# all queued appends as one append_rows, then all queued cell updates as one batch_update. Every queued
+# write returns a concurrent.futures.Future, resolved once its batch was sent (its exception is the
+# API error if the batch failed), so callers still learn whether their own write succeeded.
+#
+# Appends are flushed before cell updates, so an update may target a row appended in the same window.
+
+_QUEUES = {} # (spreadsheet ID, worksheet ID) -> WorksheetWriteQueue
+_QUEUES_LOCK = threading.Lock()
+
+class WorksheetWriteQueue:
+    """Pending writes of one worksheet, flushed together after a short window (or by flush())."""
+
+    def __init__(self, worksheet: gspread.worksheet.Worksheet):
+        self.worksheet = worksheet
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock() # One batch in flight per worksheet, so batches land in order
+        self._cell_updates = [] # (row, col, value, future)
+        self._appends = [] # (row values, future)
+        self._timer = None
+
+    def _schedule(self):
+        # Called with _lock held: the first write of a window starts its timer
+        if self._timer is None:
+            self._timer = threading.Timer(config.SHEET_WRITE_COALESCE_SECONDS, self.flush)
+            self._timer.start()
+
+    def update_cell(self, row: int, col: int, value) -> Future:
+        """Queues a single-cell write (1-based row and column). The future resolves to None."""
+        future = Future()
+        with self._lock:
+            self._cell_updates.append((row, col, value, future))
+            self._schedule()
+        return future
+
+    def append_row(self, values: list) -> Future:
+        """Queues a row append. The future resolves to the 1-based sheet row the row was written to."""
+        future = Future()
+        with self._lock:
+            self._appends.append((list(values), future))
+            self._schedule()
+        return future
+
+    def flush(self):
+        """Sends every queued write now and resolves their futures (also called by the window timer)."""
+        with self._flush_lock:
+            with self._lock:
+                cell_updates, self._cell_updates = self._cell_updates, []
+                appends, self._appends = self._appends, []
+                if self._timer is not None:
+                    self._timer.cancel() # No-op when called from the timer itself
+                    self._timer = None
+            if appends:
+                self._send_appends(appends)
+            if cell_updates:
+                self._send_cell_updates(cell_updates)
+
+    def _send_appends(self, appends: list):
+        try:
+            response = self.worksheet.append_rows([values for values, _ in appends], value_input_option='USER_ENTERED')
+            # e.g. "'Datathon_1'!A5:F7": the sheet decides where the table ends
+            updated_range = response['updates']['updatedRange']
+            first_row = gspread.utils.a1_to_rowcol(updated_range.split('!')[-1].split(':')[0])[0]
+        except Exception as e:
+            for _, future in appends:
+                future.set_exception(e)
+            return
+        for i, (_, future) in enumerate(appends):
+            future.set_result(first_row + i)
+
+    def _send_cell_updates(self, cell_updates: list):
+        # The same cell written twice in one window is sent once, with its last value
+        latest = {}
+        for row, col, value, _ in cell_updates:
+            latest[(row, col)] = value
+        data = [{'range': gspread.utils.rowcol_to_a1(row, col), 'values': [[value]]} for (row, col), value in latest.items()]
+        try:
+            self.worksheet.batch_update(data, value_input_option='USER_ENTERED')
+        except Exception as e:
+            for *_, future in cell_updates:
+                future.set_exception(e)
+            return
+        for *_, future in cell_updates:
+            future.set_result(None)
+
+def get_write_queue(worksheet: gspread.worksheet.Worksheet) -> WorksheetWriteQueue:
+    """The process-wide write queue of a worksheet."""
+    key = (worksheet.spreadsheet_id, worksheet.id)
+    with _QUEUES_LOCK:
+        queue = _QUEUES.get(key)
+        if queue is None:
+            queue = _QUEUES[key] = WorksheetWriteQueue(worksheet)
+    queue.worksheet = worksheet # The newest handle (pages open the worksheet again on every rerun)
+    return queue
+
+def flush_all():
+    """Sends the queued writes of every worksheet now."""
+    with _QUEUES_LOCK:
+        queues = list(_QUEUES.values())
+    for queue in queues:
+        queue.flush()
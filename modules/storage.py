@@ -0,0 +1,395 @@
+import streamlit as st
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+import pandas as pd
+from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseUpload
+from modules import client_pool, config, data_loader, dataset_profile, drive_cache
+
+# --- Storage backends ---
+# Everything the app stores (datasets, test outputs, prediction files, the UI config) goes through a
+# StorageBackend: list, upload, download, share link and metadata. DriveStorage is the Google Drive
+# implementation (built on data_loader / drive_cache / drive_index); LocalStorage keeps the same files
+# in a directory on this machine, for offline rehearsals, benchmarks at disk speed and large events
+# that must not stall on Drive quotas.
+#
+# The backend is chosen by st.secrets["storage"]["backend"] ("drive" or "local"), falling back to
+# config.STORAGE_BACKEND. get_storage_backend() returns the one to use for the current session.
+
+class StorageBackend:
+    """
+    Interface of a file store. File and folder IDs are opaque strings of the backend.
+    Methods print or display their errors and return None / empty results, like data_loader does.
+    """
+
+    display_name = "storage"
+
+    def list_csv_files(self, folder_id: str | None = None) -> list:
+        """[{'id', 'name'}, ...] of the CSV files in a folder (the configured datasets folder if None), sorted by name."""
+        raise NotImplementedError
+
+    def upload_csvs(self, uploaded_files: dict, unique_id: str) -> dict:
+        """Stores the uploaded datathon files (see data_loader.upload_csvs_to_drive). Returns {kind: file ID or None}."""
+        raise NotImplementedError
+
+    def download_dataframe(self, file_id: str, columns: list | None = None, dtype: dict | None = None) -> pd.DataFrame | None:
+        """Loads a stored CSV (only `columns` if given, with optional dtype hints). None if it cannot be read."""
+        raise NotImplementedError
+
+    def get_shareable_links(self, file_ids: list) -> dict:
+        """file_id -> link participants can open (None where it could not be obtained)."""
+        raise NotImplementedError
+
+    def get_shareable_link(self, file_id: str) -> str | None:
+        if not file_id:
+            st.warning("No file ID provided to get shareable link.")
+            return None
+        return self.get_shareable_links([file_id]).get(file_id)
+
+    def get_file_metadata(self, file_id: str) -> dict | None:
+        """{'id', 'name', 'md5Checksum', 'modifiedTime', 'size'} of a file, or None."""
+        raise NotImplementedError
+
+    def get_file_revision(self, file_id: str) -> str | None:
+        """A cheap string that changes whenever the file content is replaced (see data_loader.get_drive_file_revision)."""
+        raise NotImplementedError
+
+    def open_file(self, file_id: str):
+        """A readable binary file object with the file content (the caller closes it), or None."""
+        raise NotImplementedError
+
+    def find_file(self, name: str, folder_id: str | None = None) -> str | None:
+        """ID of the first file with this name (in folder_id if given), or None."""
+        raise NotImplementedError
+
+    def save_file(self, name: str, content, mimetype: str, folder_id: str | None = None) -> str | None:
+        """
+        Creates the file, or replaces the content of the existing file with this name. Returns its ID or None.
+        `content` is bytes or a readable binary file object (streamed from its start, not copied).
+        """
+        raise NotImplementedError
+
+    def worker_spec(self):
+        """A picklable description from which another process can rebuild this backend (backend_from_spec), or None."""
+        return None
+
+    def predictions_folder(self) -> str | None:
+        """Folder ID that uploaded prediction files are saved to (see submission_log)."""
+        return None
+
+class DriveStorage(StorageBackend):
+    """Google Drive, through an authenticated (pooled) Drive service."""
+
+    display_name = "Google Drive"
+
+    def __init__(self, drive_service, credentials_info: dict | None = None):
+        self.drive_service = drive_service
+        self.credentials_info = credentials_info # Serializable credentials, needed to use Drive from other processes
+
+    def list_csv_files(self, folder_id=None):
+        return data_loader.list_csv_files_from_drive(self.drive_service, folder_id)
+
+    def upload_csvs(self, uploaded_files, unique_id):
+        return data_loader.upload_csvs_to_drive(uploaded_files, unique_id, self.drive_service)
+
+    def download_dataframe(self, file_id, columns=None, dtype=None):
+        return data_loader.download_csv_from_drive_to_dataframe(self.drive_service, file_id, columns=columns, dtype=dtype)
+
+    def get_shareable_links(self, file_ids):
+        return data_loader.get_drive_shareable_links(file_ids, self.drive_service)
+
+    def get_file_metadata(self, file_id):
+        try:
+            return self.drive_service.files().get(fileId=file_id, fields='id, name, md5Checksum, modifiedTime, size').execute()
+        except HttpError as error:
+            print(f"API error occurred while reading metadata of file {file_id} from Drive: {error.content.decode()}")
+            return None
+
+    def get_file_revision(self, file_id):
+        return data_loader.get_drive_file_revision(self.drive_service, file_id)
+
+    def open_file(self, file_id):
+        return drive_cache.open_drive_file(self.drive_service, file_id)
+
+    def find_file(self, name, folder_id=None):
+        query_parts = [f"name='{name}'", "trashed=false"]
+        if folder_id and folder_id.lower() != "root": # "root" is not an ID but a valid parent alias
+            query_parts.append(f"'{folder_id}' in parents")
+        try:
+            response = self.drive_service.files().list(q=" and ".join(query_parts), spaces='drive', fields='files(id, name)').execute()
+        except Exception as e:
+            print(f"Error (storage.DriveStorage.find_file): Searching for '{name}': {e}")
+            return None
+        files = response.get('files', [])
+        return files[0]['id'] if files else None
+
+    def save_file(self, name, content, mimetype, folder_id=None):
+        file_id = self.find_file(name, folder_id)
+        if hasattr(content, 'read'):
+            content.seek(0)
+        else:
+            content = io.BytesIO(content)
+        media_body = MediaIoBaseUpload(content, mimetype=mimetype, resumable=True)
+        try:
+            if file_id: # File exists, replace its content
+                return self.drive_service.files().update(fileId=file_id, media_body=media_body, fields='id').execute().get('id')
+            file_metadata = {'name': name}
+            if folder_id and folder_id.lower() != "root": # Without parents it is created in "My Drive"
+                file_metadata['parents'] = [folder_id]
+            return self.drive_service.files().create(body=file_metadata, media_body=media_body, fields='id').execute().get('id')
+        except Exception as e:
+            print(f"Error (storage.DriveStorage.save_file): Saving '{name}': {e}")
+            return None
+
+    def worker_spec(self):
+        return ("drive", self.credentials_info) if self.credentials_info else None
+
+    def predictions_folder(self):
+        return config.DRIVE_PREDICTIONS_FOLDER_ID
+
+class LocalStorage(StorageBackend):
+    """
+    A directory on this machine. File IDs are paths relative to the root ("datasets/train_x.csv") and
+    folder IDs are subdirectories. Files are plain CSVs read straight from disk; their parsed, typed
+    columnar copies live in the local cache (see drive_cache) and are read back through a memory map.
+    """
+
+    display_name = "local storage"
+
+    def __init__(self, root: str, default_folder: str = config.LOCAL_STORAGE_DEFAULT_FOLDER):
+        self.root = os.path.abspath(root)
+        self.default_folder = default_folder
+
+    def _path(self, file_id: str) -> str:
+        """Absolute path of an ID. Raises ValueError for IDs outside the root (e.g. '../x')."""
+        path = os.path.abspath(os.path.join(self.root, file_id))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"'{file_id}' is outside the storage root")
+        return path
+
+    def _file_id(self, path: str) -> str:
+        return Path(os.path.relpath(path, self.root)).as_posix()
+
+    def _write(self, path: str, write):
+        """Calls write(binary file) on a hidden temp file next to path, then renames it to path (readers never see partial files)."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".upload-", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                write(fh)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _columnar_entry(self, path: str, stat: os.stat_result) -> str | None:
+        """Cache entry path whose columnar copy holds this version of the file (None without a cache)."""
+        if not drive_cache.cache_available():
+            return None
+        key = hashlib.sha1(f"{path}|{stat.st_mtime_ns}|{stat.st_size}".encode('utf-8')).hexdigest()
+        return os.path.join(drive_cache.get_cache_dir(), f"local-{key}")
+
+    def list_csv_files(self, folder_id=None):
+        try:
+            folder = self._path(folder_id or self.default_folder)
+            with os.scandir(folder) as entries:
+                csv_files = [{'id': self._file_id(entry.path), 'name': entry.name} for entry in entries
+                             if entry.is_file() and entry.name.lower().endswith('.csv') and not entry.name.startswith('.')]
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            st.error(f"An unexpected error occurred while listing CSV files: {e}")
+            return []
+        return sorted(csv_files, key=lambda x: x['name'].lower())
+
+    def upload_csvs(self, uploaded_files, unique_id):
+        file_ids_map = {key: None for key in data_loader.UPLOAD_FILE_KINDS}
+        existing_files = None # Metadata (with MD5) of the folder's files, read on the first upload
+        for key, uploaded_file_obj in uploaded_files.items():
+            if uploaded_file_obj is None:
+                file_ids_map[key] = None
+                continue
+            file_name = data_loader.upload_file_name(key, unique_id)
+            if file_name is None:
+                st.warning(f"Unknown file type key '{key}'. Skipping upload.")
+                file_ids_map[key] = None
+                continue
+            # Byte-identical files already in the folder are reused, as on Drive (see data_loader.find_duplicate_file)
+            if existing_files is None:
+                existing_files = [metadata for metadata in map(self.get_file_metadata, (f['id'] for f in self.list_csv_files()))
+                                  if metadata is not None]
+            duplicate = data_loader.find_duplicate_file(existing_files, data_loader._file_size_and_md5(uploaded_file_obj)[1], file_name)
+            if duplicate is not None:
+                file_ids_map[key] = duplicate['id']
+                st.info(f"'{file_name}' is identical to '{duplicate['name']}' already in local storage. "
+                        f"Reusing it instead of storing it again. File ID: {duplicate['id']}")
+                continue
+            try:
+                path = self._path(f"{self.default_folder}/{file_name}")
+                uploaded_file_obj.seek(0)
+                self._write(path, lambda fh: shutil.copyfileobj(uploaded_file_obj, fh))
+                uploaded_file_obj.seek(0)
+            except (OSError, ValueError) as e:
+                st.error(f"An unexpected error occurred while storing '{file_name}': {e}")
+                file_ids_map[key] = None
+                continue
+            file_ids_map[key] = self._file_id(path)
+            existing_files.append(self.get_file_metadata(file_ids_map[key]))
+            self._write_profile_sidecar(file_ids_map[key], path)
+            st.success(f"Successfully stored '{file_name}' in local storage. File ID: {file_ids_map[key]}")
+        return file_ids_map
+
+    def _write_profile_sidecar(self, file_id: str, path: str):
+        """Parses a newly stored CSV once: writes its columnar copy and its profile sidecar (see dataset_profile)."""
+        try:
+            with open(path, 'rb') as fh:
+                df = data_loader._read_csv_with_fallback_encoding(fh, file_id)
+            if df is None:
+                return
+            entry = self._columnar_entry(path, os.stat(path))
+            if entry:
+                drive_cache.write_columnar_copy(entry, df)
+            profile = dataset_profile.profile_dataframe(df)
+            dataset_profile.remember_profile(file_id, profile)
+            self.save_file(dataset_profile.profile_file_name(file_id), dataset_profile.profile_to_json(profile), 'application/json')
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Warning (storage.LocalStorage._write_profile_sidecar): No profile stored for '{file_id}': {e}")
+
+    def download_dataframe(self, file_id, columns=None, dtype=None):
+        if not file_id:
+            print("Warning: No file ID provided to storage.LocalStorage.download_dataframe.")
+            return None
+        try:
+            path = self._path(file_id)
+            entry = self._columnar_entry(path, os.stat(path))
+            df = drive_cache.read_columnar_copy(entry, columns) if entry else None
+            if df is not None:
+                return data_loader.apply_dtype_hints(df, dtype)
+            with open(path, 'rb') as fh:
+                df = data_loader._read_csv_with_fallback_encoding(fh, file_id, columns, dtype)
+        except (OSError, ValueError) as e:
+            print(f"Error (storage.LocalStorage.download_dataframe): Reading '{file_id}': {e}")
+            return None
+        if df is not None and entry and columns is None:
+            drive_cache.write_columnar_copy(entry, df) # Only a full parse makes a complete columnar copy
+        return df
+
+    def get_shareable_links(self, file_ids):
+        links = {}
+        for file_id in file_ids:
+            try:
+                path = self._path(file_id)
+                links[file_id] = Path(path).as_uri() if os.path.isfile(path) else None
+            except ValueError:
+                links[file_id] = None
+        return links
+
+    def get_file_metadata(self, file_id):
+        try:
+            path = self._path(file_id)
+            stat = os.stat(path)
+            return {
+                'id': file_id,
+                'name': os.path.basename(path),
+                'md5Checksum': _local_md5(path, stat),
+                'modifiedTime': datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+                'size': str(stat.st_size), # Drive reports sizes as strings too
+            }
+        except (OSError, ValueError) as e:
+            print(f"Error (storage.LocalStorage.get_file_metadata): '{file_id}': {e}")
+            return None
+
+    def get_file_revision(self, file_id):
+        try:
+            stat = os.stat(self._path(file_id))
+        except (OSError, ValueError) as e:
+            print(f"Error (storage.LocalStorage.get_file_revision): '{file_id}': {e}")
+            return None
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def open_file(self, file_id):
+        try:
+            return open(self._path(file_id), 'rb')
+        except (OSError, ValueError) as e:
+            print(f"Error (storage.LocalStorage.open_file): '{file_id}': {e}")
+            return None
+
+    def find_file(self, name, folder_id=None):
+        try:
+            path = self._path(f"{folder_id or self.default_folder}/{name}")
+        except ValueError:
+            return None
+        return self._file_id(path) if os.path.isfile(path) else None
+
+    def save_file(self, name, content, mimetype, folder_id=None):
+        try:
+            path = self._path(f"{folder_id or self.default_folder}/{name}")
+            if hasattr(content, 'read'):
+                content.seek(0)
+                self._write(path, lambda fh: shutil.copyfileobj(content, fh))
+            else:
+                self._write(path, lambda fh: fh.write(content))
+        except (OSError, ValueError) as e:
+            print(f"Error (storage.LocalStorage.save_file): Saving '{name}': {e}")
+            return None
+        return self._file_id(path)
+
+    def worker_spec(self):
+        return ("local", self.root, self.default_folder)
+
+    def predictions_folder(self):
+        return config.LOCAL_PREDICTIONS_FOLDER # Kept apart from the datasets folder, which is listed in the app
+
+# MD5 of local files by (path, mtime, size), so unchanged files are hashed once per process
+_LOCAL_MD5S = {}
+_LOCAL_MD5S_LOCK = threading.Lock()
+
+def _local_md5(path: str, stat: os.stat_result) -> str:
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _LOCAL_MD5S_LOCK:
+        md5 = _LOCAL_MD5S.get(key)
+    if md5 is None:
+        with open(path, 'rb') as fh:
+            md5 = data_loader._file_size_and_md5(fh)[1]
+        with _LOCAL_MD5S_LOCK:
+            _LOCAL_MD5S[key] = md5
+    return md5
+
+def backend_from_spec(spec) -> StorageBackend:
+    """Rebuilds a backend from StorageBackend.worker_spec() (e.g. in a rescoring worker process)."""
+    if spec[0] == "local":
+        return LocalStorage(spec[1], default_folder=spec[2])
+    return DriveStorage(client_pool.get_drive_service(Credentials(**spec[1])), credentials_info=spec[1])
+
+def _storage_settings() -> dict:
+    try:
+        return dict(st.secrets["storage"])
+    except (KeyError, AttributeError, FileNotFoundError): # FileNotFoundError: no secrets.toml at all
+        return {}
+
+def get_storage_backend() -> StorageBackend | None:
+    """
+    The storage backend configured for this app (st.secrets["storage"], else config.STORAGE_BACKEND).
+    For Drive this runs the Google authentication (see data_loader.get_drive_service) and returns None
+    until it succeeds.
+    """
+    settings = _storage_settings()
+    backend = str(settings.get("backend", config.STORAGE_BACKEND)).lower()
+    if backend == "local":
+        return LocalStorage(settings.get("local_root", config.LOCAL_STORAGE_ROOT),
+                            default_folder=settings.get("local_folder", config.LOCAL_STORAGE_DEFAULT_FOLDER))
+    if backend != "drive":
+        st.error(f"Unknown storage backend '{backend}' in the configuration. Use 'drive' or 'local'.")
+        return None
+    drive_service = data_loader.get_drive_service()
+    if not drive_service:
+        return None
+    credentials_info = st.session_state.get('google_credentials')
+    return DriveStorage(drive_service, credentials_info if isinstance(credentials_info, dict) else None)
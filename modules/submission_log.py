@@ -0,0 +1,227 @@
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+import gspread
+from modules import api_quota, config, metrics, team_manager, team_roster
+
+# --- Persisted submission log, written in the background ---
+# Every scored submission is recorded in the datathon's "Submissions_<datathon_id>" worksheet (team,
+# timestamp, datathon, metrics and the ID of the stored prediction file, which rescoring reads back).
+# Writing it from the scoring request would add a Drive upload and a Sheets append to every student's
+# wait and one write request per submission to the quota, so record() only queues the submission and
+# returns. A single writer thread per process uploads the prediction files and sends the rows queued
+# within SUBMISSION_LOG_BATCH_SECONDS as one append_rows per worksheet, with scoring priority (see
+# api_quota). Rows whose append fails stay queued and are retried every SUBMISSION_LOG_RETRY_SECONDS.
+# At interpreter exit the queue is drained (waiting up to SUBMISSION_LOG_SHUTDOWN_TIMEOUT_SECONDS);
+# rows that still could not be written are printed to the log so they can be restored by hand.
+
+_STOP = object() # Queue sentinel asking the writer thread to finish
+
+class SubmissionRecord:
+    """One scored submission waiting to be written."""
+
+    def __init__(self, spreadsheet: gspread.Spreadsheet, storage_backend, datathon_id: str, team_name: str,
+                 timestamp: str, metrics: dict, prediction_file):
+        self.spreadsheet = spreadsheet
+        self.storage_backend = storage_backend
+        self.datathon_id = datathon_id
+        self.team_name = team_name
+        self.timestamp = timestamp
+        self.metrics = dict(metrics)
+        self.prediction_file = prediction_file
+        self.prediction_file_id = None # Set once uploaded, so a retried append does not upload again
+
+class SubmissionRecorder:
+    """Queue of scored submissions and the background thread writing them to the submissions worksheets."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._stop_event = threading.Event() # Set by close(): ends a retry wait early
+        self._worksheets = {} # (spreadsheet ID, datathon ID) -> (worksheet, header), resolved once per process
+
+    def _start(self):
+        # Called with _lock held: the thread starts with the first record
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="submission-log-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def record(self, spreadsheet: gspread.Spreadsheet, storage_backend, datathon_id: str, team_name: str,
+               metrics: dict, prediction_file=None) -> str:
+        """
+        Queues a scored submission for the submissions worksheet and returns immediately.
+
+        Args:
+            spreadsheet: The datathon workbook.
+            storage_backend: Backend the prediction file is saved to (see storage.StorageBackend.predictions_folder).
+            datathon_id: ID of the datathon ("Submissions_<datathon_id>" worksheet).
+            team_name: Team that submitted.
+            metrics: Metric name -> value, as returned by the scoring plan.
+            prediction_file: The uploaded prediction CSV as a binary file object (uploaded from it, not copied;
+                             the caller must not read it afterwards), or None to leave PredictionFileID empty.
+
+        Returns:
+            The submission's timestamp, as it will appear in the Timestamp column.
+        """
+        timestamp = datetime.now().strftime(config.SUBMISSION_TIMESTAMP_FORMAT)
+        record = SubmissionRecord(spreadsheet, storage_backend, datathon_id, team_name, timestamp, metrics, prediction_file)
+        with self._lock:
+            if self._closed: # Interpreter shutting down: too late to queue it, keep it in the log instead
+                print(f"Error (submission_log.record): Submission not recorded (shutting down): {self._describe(record)}")
+                return timestamp
+            self._start()
+            self._queue.put(record)
+        return timestamp
+
+    def flush(self):
+        """Blocks until every submission queued so far was written (or given up on)."""
+        self._queue.join()
+
+    def close(self, timeout: float | None = None):
+        """Writes what is still queued and stops the thread (registered with atexit)."""
+        with self._lock:
+            if self._closed or self._thread is None:
+                self._closed = True
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+            self._stop_event.set()
+        self._thread.join(config.SUBMISSION_LOG_SHUTDOWN_TIMEOUT_SECONDS if timeout is None else timeout)
+        if self._thread.is_alive():
+            print("Error (submission_log.close): Timed out writing the queued submissions; unsent ones follow.")
+            while True:
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is not _STOP:
+                    print(f"Error (submission_log.close): Unsent submission: {self._describe(record)}")
+
+    # --- Writer thread ---
+
+    def _collect(self, pending: list, wait_seconds: float | None) -> bool:
+        """
+        Moves queued records to `pending`: waits up to wait_seconds (None = forever, 0 = only take what is
+        queued) for the first one, then for more until the batch window ends or the batch is full.
+        Returns True if asked to stop.
+        """
+        deadline = None
+        while len(pending) < config.SUBMISSION_LOG_MAX_BATCH_ROWS:
+            timeout = wait_seconds if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                record = self._queue.get_nowait() if timeout == 0 else self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if record is _STOP:
+                self._queue.task_done()
+                return True
+            pending.append(record)
+            if deadline is None:
+                deadline = time.monotonic() + config.SUBMISSION_LOG_BATCH_SECONDS
+        return False
+
+    def _run(self):
+        pending = [] # Records taken from the queue and not written yet (task_done once written or given up)
+        stopping = False
+        with api_quota.priority(api_quota.PRIORITY_SCORING):
+            while True:
+                if pending and not stopping:
+                    # The last append failed: wait before retrying (however many rows are pending), so a
+                    # failing sheet does not drain the write quota shared with every other session
+                    stopping = self._stop_event.wait(config.SUBMISSION_LOG_RETRY_SECONDS)
+                if not stopping: # Rows queued meanwhile join the retry (other datathons' rows are not held up)
+                    stopping = self._collect(pending, None if not pending else 0)
+                if stopping: # Take everything still queued; writes after close() are refused by record()
+                    while True:
+                        try:
+                            record = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if record is _STOP:
+                            self._queue.task_done()
+                        else:
+                            pending.append(record)
+                if pending:
+                    pending = self._write(pending)
+                if stopping:
+                    for record in pending: # Last attempt failed: leave them in the log rather than lose them
+                        print(f"Error (submission_log): Unsent submission: {self._describe(record)}")
+                        self._queue.task_done()
+                    return
+
+    def _write(self, records: list) -> list:
+        """Appends the records, one request per worksheet. Returns those that could not be written."""
+        groups = {}
+        for record in records:
+            groups.setdefault((record.spreadsheet.id, record.datathon_id), []).append(record)
+        failed = []
+        for key, group in groups.items():
+            try:
+                worksheet, header = self._submissions_worksheet(group)
+                for record in group:
+                    self._upload_prediction(record)
+                rows = [self._row(record, header) for record in group]
+                worksheet.append_rows(rows, value_input_option='RAW') # RAW: timestamps stay the exact text written
+                team_roster.mark_stale(worksheet) # Cached rosters did not see these rows
+            except Exception as e:
+                print(f"Error (submission_log): Appending {len(group)} submission(s) of '{key[1]}' failed, "
+                      f"retrying in {config.SUBMISSION_LOG_RETRY_SECONDS}s: {e}")
+                self._worksheets.pop(key, None) # Resolved again on retry (e.g. the sheet was deleted)
+                failed.extend(group)
+                continue
+            for _ in group:
+                self._queue.task_done()
+        return failed
+
+    def _submissions_worksheet(self, group: list) -> tuple:
+        """(worksheet, header) of a group's datathon, created or given the group's metric columns if needed."""
+        record = group[0]
+        key = (record.spreadsheet.id, record.datathon_id)
+        metric_names = list(dict.fromkeys(name for r in group for name in r.metrics))
+        cached = self._worksheets.get(key)
+        if cached is not None and all(name in cached[1] for name in metric_names):
+            return cached
+        worksheet = team_manager.get_or_create_submissions_worksheet(record.spreadsheet, record.datathon_id, metric_names)
+        if worksheet is None:
+            raise RuntimeError(f"Could not open the '{team_manager.submissions_worksheet_title(record.datathon_id)}' worksheet.")
+        cached = self._worksheets[key] = (worksheet, worksheet.row_values(1))
+        return cached
+
+    def _upload_prediction(self, record: SubmissionRecord):
+        if record.prediction_file_id is not None or record.prediction_file is None:
+            return
+        backend = record.storage_backend
+        name = f"{record.datathon_id}_{record.team_name}_{record.timestamp.replace(':', '').replace(' ', '_')}.csv"
+        file_id = backend.save_file(name, record.prediction_file, 'text/csv', folder_id=backend.predictions_folder())
+        if file_id is None: # Keep the scores; only rescoring needs the file
+            print(f"Warning (submission_log): Prediction file of {self._describe(record)} could not be saved; PredictionFileID left empty.")
+            file_id = ""
+        record.prediction_file_id = file_id
+        record.prediction_file = None # Not needed any more
+
+    def _row(self, record: SubmissionRecord, header: list) -> list:
+        values = {"TeamName": record.team_name, "Timestamp": record.timestamp, "DatathonID": record.datathon_id,
+                  config.SUBMISSION_PREDICTION_FILE_ID_COLUMN: record.prediction_file_id or ""}
+        values.update({name: metrics.metric_cell_value(value) for name, value in record.metrics.items()})
+        return [values.get(column, "") for column in header]
+
+    @staticmethod
+    def _describe(record: SubmissionRecord) -> dict:
+        return {"TeamName": record.team_name, "Timestamp": record.timestamp, "DatathonID": record.datathon_id,
+                "PredictionFileID": record.prediction_file_id or "", **{k: metrics.metric_cell_value(v) for k, v in record.metrics.items()}}
+
+_RECORDER = None
+_RECORDER_LOCK = threading.Lock()
+
+def get_recorder() -> SubmissionRecorder:
+    """The process-wide submission recorder."""
+    global _RECORDER
+    with _RECORDER_LOCK:
+        if _RECORDER is None:
+            _RECORDER = SubmissionRecorder()
+        return _RECORDER
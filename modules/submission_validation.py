@@ -0,0 +1,119 @@
+import csv
+import re
+import pandas as pd
+from modules import config, ground_truth, metrics
+
+# --- Early validation of prediction files ---
+# Before the ground truth is loaded (which may mean a download), an uploaded prediction file is
+# checked by streaming it: the header is read, the data rows are counted without building a
+# DataFrame, and a sample of the prediction column is type-checked. The expected row count comes
+# from the in-process ground-truth cache, and only if the cached copy is of the test outputs' current
+# revision (see known_truth_rows), so a fixed or replaced test outputs file never rejects good files.
+# When the row count of the upload cannot be trusted (see scan_csv) that check is left to the full
+# checks after loading the ground truth, which always run; this stage only rejects early.
+
+_SCAN_BLOCK_SIZE = 1024 * 1024
+_BLANK_LINE = re.compile(rb'\n(?=\r?\n)') # A line break directly followed by an empty line
+_LONE_CR = re.compile(rb'\r(?!\n)') # Old Mac line break, counted differently by pandas
+_LINE_BREAK = re.compile(rb'\r\n|\n|\r')
+
+def _decode_header(line: bytes) -> list:
+    try:
+        text = line.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = line.decode('latin1')
+    return next(csv.reader([text]), [])
+
+def read_header(file_obj) -> list:
+    """Column names of a CSV file object: its first non-blank line, whatever its line breaks (the file is rewound)."""
+    file_obj.seek(0)
+    first_block = file_obj.read(_SCAN_BLOCK_SIZE)
+    file_obj.seek(0)
+    for line in _LINE_BREAK.split(first_block):
+        if line.strip():
+            return _decode_header(line)
+    return []
+
+def scan_csv(file_obj) -> tuple[list, int | None]:
+    """
+    Streams a CSV file object once. Returns (header column names, number of data rows).
+    Blank lines are not counted (pandas skips them too). The count is None (unknown) whenever it may
+    differ from the rows pandas parses: if the file has quoted values (which may span lines) or line
+    breaks other than \n and \r\n.
+    """
+    header = read_header(file_obj)
+    n_lines = 0
+    previous_block_end = b'\n' # The start of the file counts as a line start
+    last_byte = b'\n'
+    for block in iter(lambda: file_obj.read(_SCAN_BLOCK_SIZE), b''):
+        if block.endswith(b'\r'):
+            block += file_obj.read(1) # Keep a \r\n pair in one block
+        if b'"' in block or _LONE_CR.search(block):
+            file_obj.seek(0)
+            return header, None
+        n_lines += block.count(b'\n') - len(_BLANK_LINE.findall(block))
+        if previous_block_end == b'\n' and (block.startswith(b'\n') or block.startswith(b'\r\n')):
+            n_lines -= 1 # Empty line right at the block boundary (or at the start of the file)
+        previous_block_end = last_byte = block[-1:]
+    if last_byte != b'\n':
+        n_lines += 1 # Last row without a trailing line break
+    file_obj.seek(0)
+    return header, max(0, n_lines - 1) # The first (non-blank) line is the header
+
+def known_truth_rows(file_id: str, revision: str | None) -> int | None:
+    """
+    Row count of the test outputs if this process holds them at `revision` (their current revision,
+    from storage_backend.get_file_revision), else None. A cached copy of another revision is not used.
+    """
+    truth = ground_truth.get_cached_ground_truth(file_id)
+    if truth is not None and revision is not None and truth.revision == revision:
+        return truth.n_rows
+    return None
+
+def validate_prediction_file(file_obj, datathon_type: str | None, prediction_col: str, expected_rows: int | None = None) -> tuple[list, list]:
+    """
+    Cheap structural checks of an uploaded prediction CSV, run before the ground truth is loaded.
+
+    Args:
+        file_obj: The uploaded file (rewound before returning).
+        datathon_type: Datathon type; predictions of every type but classification must be numeric.
+        prediction_col: Name of the required prediction column.
+        expected_rows: Row count of the test outputs (see known_truth_rows), or None to skip that check.
+
+    Returns:
+        (error messages for the participant, empty if the file passed; the file's column names).
+    """
+    try:
+        header, n_rows = scan_csv(file_obj)
+    except (OSError, csv.Error) as e:
+        return [f"Error reading your uploaded prediction CSV: {e}"], []
+    if not header:
+        return ["Your uploaded prediction file is empty."], header
+    if prediction_col not in header:
+        return [f"Missing prediction column '{prediction_col}' in your uploaded file (found: {', '.join(header[:10])})."], header
+    if n_rows == 0:
+        return ["Your uploaded prediction file has no rows."], header
+
+    errors = []
+    if expected_rows is not None and n_rows is not None and n_rows != expected_rows:
+        errors.append(f"Row count mismatch: True outputs have {expected_rows} rows, "
+                      f"your predictions have {n_rows} rows. Please ensure they match.")
+
+    plan = metrics.get_scoring_plan(datathon_type) if datathon_type else None
+    try:
+        file_obj.seek(0)
+        sample = pd.read_csv(file_obj, usecols=[prediction_col], nrows=config.PREDICTION_VALIDATION_SAMPLE_ROWS)[prediction_col]
+    except (ValueError, pd.errors.ParserError, UnicodeDecodeError) as e:
+        errors.append(f"Error reading your uploaded prediction CSV: {e}")
+        sample = None
+    finally:
+        file_obj.seek(0)
+    # Empty values are not rejected: the metrics skip them wherever they are in the file, as they always did
+    if sample is not None:
+        if plan is not None and plan.datathon_type != "classification" and not pd.api.types.is_numeric_dtype(sample):
+            sample = sample.dropna()
+            bad_values = sample[pd.to_numeric(sample, errors='coerce').isna()]
+            if not bad_values.empty:
+                errors.append(f"The '{prediction_col}' column must be numeric for a {datathon_type} datathon "
+                              f"(row {int(bad_values.index[0]) + 1} has '{bad_values.iloc[0]}').")
+    return errors, header
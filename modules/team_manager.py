@@ -7,7 +7,8 @@ from googleapiclient.errors import HttpError
 import os 
 import random
 import string
-from modules.config import MAX_TEAM_SIZE
+from modules.config import MAX_TEAM_SIZE, SHEET_WRITE_TIMEOUT_SECONDS, SUBMISSION_BASE_COLUMNS
+from modules import client_pool, team_roster
 
 SHEETS_SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 
@@ -115,7 +116,7 @@ def get_gspread_client():
     credentials = get_gspread_credentials()
     if credentials:
         try:
-            client = gspread.authorize(credentials)
+            client = client_pool.get_gspread_client(credentials) # Pooled per credential identity
             # st.success("Successfully authorized gspread client.") # Optional success message
             return client
         except Exception as e:
@@ -208,26 +209,27 @@ def get_or_create_datathon_teams_worksheet(spreadsheet: gspread.Spreadsheet, dat
 
     try:
         # Check if the first row matches the header.
-        # gspread.utils.rowcol_to_a1(1, col_num) can convert col number to A1 notation
-        # worksheet.row_values(1) fetches the first row
-        current_header = worksheet.row_values(1) # Might raise error if sheet is completely empty
-        
-        if current_header != header:
-            # st.info(f"Header mismatch or missing in worksheet '{datathon_id}'. Current: {current_header}. Expected: {header}. Updating header...")
-            # Update header. This overwrites the first row.
-            # Ensure worksheet is large enough for header if it was pre-existing and small
-            if worksheet.col_count < len(header):
-                worksheet.add_cols(len(header) - worksheet.col_count)
-
-            worksheet.update('A1', [header]) # Update the first row with the new header
-            # st.success(f"Header updated for worksheet '{datathon_id}'.")
-        # else:
-            # st.info(f"Header is already correct in worksheet '{datathon_id}'.")
+        # The header comes from the cached roster (see team_roster), so reruns do not read the sheet again.
+        roster = team_roster.get_roster(worksheet)
+        with roster.lock:
+            current_header = roster.header()[:len(header)] # Cached rows are padded to the sheet's width
+
+            if current_header != header:
+                # st.info(f"Header mismatch or missing in worksheet '{datathon_id}'. Current: {current_header}. Expected: {header}. Updating header...")
+                # Update header. This overwrites the first row.
+                # Ensure worksheet is large enough for header if it was pre-existing and small
+                if worksheet.col_count < len(header):
+                    worksheet.add_cols(len(header) - worksheet.col_count)
+
+                roster.set_header(header) # Update the first row with the new header
+                # st.success(f"Header updated for worksheet '{datathon_id}'.")
+            # else:
+                # st.info(f"Header is already correct in worksheet '{datathon_id}'.")
 
     except gspread.exceptions.APIError as api_error:
-        # This can happen if the sheet is completely empty and worksheet.row_values(1) is called.
-        # Or if there are permission issues not caught by initial connection.
+        # Permission issues not caught by the initial connection, or a failed roster load.
         # st.warning(f"APIError checking/updating header for '{datathon_id}': {api_error}. Attempting to set header directly.")
+        team_roster.invalidate_roster(worksheet) # Reloaded on next use
         try:
             if worksheet.col_count < len(header):
                 worksheet.add_cols(len(header) - worksheet.col_count)
@@ -243,6 +245,38 @@ def get_or_create_datathon_teams_worksheet(spreadsheet: gspread.Spreadsheet, dat
 
     return worksheet
 
+def submissions_worksheet_title(datathon_id: str) -> str:
+    return f"Submissions_{datathon_id}"
+
+def get_or_create_submissions_worksheet(spreadsheet: gspread.Spreadsheet, datathon_id: str, metric_names=()) -> gspread.worksheet.Worksheet | None:
+    """
+    Gets or creates the 'Submissions_<datathon_id>' worksheet and makes sure its header has the base
+    columns (config.SUBMISSION_BASE_COLUMNS) and the given metric columns; columns already there keep
+    their position. Used by the background submission writer, so errors are printed.
+
+    Returns:
+        A gspread.Worksheet object if successful, None otherwise.
+    """
+    title = submissions_worksheet_title(datathon_id)
+    header = list(SUBMISSION_BASE_COLUMNS) + [name for name in metric_names if name not in SUBMISSION_BASE_COLUMNS]
+    try:
+        try:
+            worksheet = spreadsheet.worksheet(title)
+        except gspread.exceptions.WorksheetNotFound:
+            worksheet = spreadsheet.add_worksheet(title=title, rows=100, cols=len(header))
+
+        current_header = worksheet.row_values(1)
+        missing_columns = [name for name in header if name not in current_header]
+        if missing_columns:
+            new_header = current_header + missing_columns
+            if worksheet.col_count < len(new_header):
+                worksheet.add_cols(len(new_header) - worksheet.col_count)
+            worksheet.update('A1', [new_header])
+        return worksheet
+    except Exception as e:
+        print(f"Error (team_manager.get_or_create_submissions_worksheet): Worksheet '{title}': {e}")
+        return None
+
 def generate_random_password(length=8):
     """Generates a random alphanumeric password."""
     characters = string.ascii_letters + string.digits
@@ -269,22 +303,24 @@ def create_new_team(teams_worksheet: gspread.worksheet.Worksheet, team_name: str
         return None
 
     try:
-        # Check if team name already exists (case-insensitive check for robustness)
-        # Fetch all team names from the first column.
-        # This assumes TeamName is always in the first column (A).
-        # Skip header row by slicing from the second element: all_records()[1:] or get_all_values()[1:]
-        existing_team_names = teams_worksheet.col_values(1)[1:] # Get all values from 1st col, skip header
-        if team_name.lower() in [name.lower() for name in existing_team_names]:
-            st.warning(f"Team name '{team_name}' already exists. Please choose a different name.")
-            return None
-
-        password = generate_random_password()
-        
-        # Prepare the new row. Member1 is student_id, others are initially empty.
-        max_members = get_max_team_size() # From modules.config via local function
-        new_row = [team_name, password, student_id] + [""] * (max_members - 1)
-        
-        teams_worksheet.append_row(new_row, value_input_option='USER_ENTERED')
+        roster = team_roster.get_roster(teams_worksheet)
+        with roster.lock: # The name check and the append must not interleave with other sessions
+            # Check if team name already exists (case-insensitive check for robustness)
+            # The cached roster indexes the team names of the first column (A).
+            if roster.find_row(team_name) is not None:
+                st.warning(f"Team name '{team_name}' already exists. Please choose a different name.")
+                return None
+
+            password = generate_random_password()
+
+            # Prepare the new row. Member1 is student_id, others are initially empty.
+            max_members = get_max_team_size() # From modules.config via local function
+            new_row = [team_name, password, student_id] + [""] * (max_members - 1)
+
+            write = roster.append_row(new_row) # Cached right away; the sheet append is queued
+        # Wait outside the lock, so writes of other sessions join the same batch (see sheet_write_queue).
+        # A failed write raises its API error here.
+        write.result(timeout=SHEET_WRITE_TIMEOUT_SECONDS)
         # st.success(f"Team '{team_name}' created successfully with password '{password}'.")
         return team_name, password
 
@@ -317,69 +353,61 @@ def join_team(teams_worksheet: gspread.worksheet.Worksheet, team_name: str, pass
         return False
 
     try:
-        # Find the team row by team_name (case-insensitive for robustness)
-        # This assumes TeamName is always in the first column (A).
-        all_team_names_with_case = teams_worksheet.col_values(1) # Includes header
+        roster = team_roster.get_roster(teams_worksheet)
+        with roster.lock: # Two sessions must not take the same free member slot
+            # Find the team row by team_name (case-insensitive for robustness), from the cached roster.
+            # This assumes TeamName is always in the first column (A); the header row is not indexed.
+            found_row_index = roster.find_row(team_name) # gspread rows are 1-indexed
+            if found_row_index is None:
+                st.warning(f"Team '{team_name}' not found.")
+                return False
+
+            # Retrieve the entire row for the found team
+            team_row_values = roster.row_values(found_row_index)
+
+            # Verify password (assuming Password is in the second column B)
+            stored_password = team_row_values[1] if len(team_row_values) > 1 else None
+            if stored_password != password:
+                st.warning(f"Incorrect password for team '{team_name}'.")
+                return False
+
+            # Check if student is already in the team (Member columns start from index 2)
+            member_columns = team_row_values[2:]
+            if student_id in member_columns:
+                st.info(f"Student '{student_id}' is already a member of team '{team_name}'.")
+                # Depending on desired behavior, this could be True or a specific message.
+                # For "joining", if already a member, it's not a new join action.
+                return False # Or True if "being in the team" counts as "joined"
+
+            # Find the next empty "MemberX" column
+            # Member columns start at index 2 in team_row_values list (Column C in sheets)
+            max_members = get_max_team_size()
+            first_empty_member_col_index_in_row = -1 # Index within team_row_values
         
-        # Find index, being mindful of header row and case
-        found_row_index = -1
-        for i, name_in_sheet in enumerate(all_team_names_with_case):
-            if name_in_sheet.lower() == team_name.lower():
-                if i == 0: # Header row
-                    st.error("Error: Team name matches header row. This should not happen.")
-                    return False 
-                found_row_index = i + 1 # gspread rows are 1-indexed
-                break
+            # Iterate from Member1 up to MaxMembers
+            # Column C is index 2, D is 3, etc. Member1 is at team_row_values[2]
+            for i in range(max_members):
+                member_col_in_row_values = 2 + i # Index in team_row_values list
+                if member_col_in_row_values < len(team_row_values) and not team_row_values[member_col_in_row_values].strip():
+                    first_empty_member_col_index_in_row = member_col_in_row_values
+                    break
+                elif member_col_in_row_values >= len(team_row_values): # Cell doesn't exist, means it's empty
+                    first_empty_member_col_index_in_row = member_col_in_row_values
+                    break 
         
-        if found_row_index == -1:
-            st.warning(f"Team '{team_name}' not found.")
-            return False
-
-        # Retrieve the entire row for the found team
-        team_row_values = teams_worksheet.row_values(found_row_index)
-
-        # Verify password (assuming Password is in the second column B)
-        stored_password = team_row_values[1] if len(team_row_values) > 1 else None
-        if stored_password != password:
-            st.warning(f"Incorrect password for team '{team_name}'.")
-            return False
-
-        # Check if student is already in the team (Member columns start from index 2)
-        member_columns = team_row_values[2:]
-        if student_id in member_columns:
-            st.info(f"Student '{student_id}' is already a member of team '{team_name}'.")
-            # Depending on desired behavior, this could be True or a specific message.
-            # For "joining", if already a member, it's not a new join action.
-            return False # Or True if "being in the team" counts as "joined"
-
-        # Find the next empty "MemberX" column
-        # Member columns start at index 2 in team_row_values list (Column C in sheets)
-        max_members = get_max_team_size()
-        first_empty_member_col_index_in_row = -1 # Index within team_row_values
+            if first_empty_member_col_index_in_row == -1:
+                st.warning(f"Team '{team_name}' is already full (max {max_members} members).")
+                return False
+
+            # Update the sheet: Add student_id to the found empty member column
+            # Convert list index to sheet column (1-indexed: A=1, B=2, ...)
+            # first_empty_member_col_index_in_row is 0-indexed for the list, 
+            # but refers to content starting from column C.
+            # So, if it's 2, it's the 3rd item, hence column C.
+            sheet_col_to_update = first_empty_member_col_index_in_row + 1 
         
-        # Iterate from Member1 up to MaxMembers
-        # Column C is index 2, D is 3, etc. Member1 is at team_row_values[2]
-        for i in range(max_members):
-            member_col_in_row_values = 2 + i # Index in team_row_values list
-            if member_col_in_row_values < len(team_row_values) and not team_row_values[member_col_in_row_values].strip():
-                first_empty_member_col_index_in_row = member_col_in_row_values
-                break
-            elif member_col_in_row_values >= len(team_row_values): # Cell doesn't exist, means it's empty
-                first_empty_member_col_index_in_row = member_col_in_row_values
-                break 
-        
-        if first_empty_member_col_index_in_row == -1:
-            st.warning(f"Team '{team_name}' is already full (max {max_members} members).")
-            return False
-
-        # Update the sheet: Add student_id to the found empty member column
-        # Convert list index to sheet column (1-indexed: A=1, B=2, ...)
-        # first_empty_member_col_index_in_row is 0-indexed for the list, 
-        # but refers to content starting from column C.
-        # So, if it's 2, it's the 3rd item, hence column C.
-        sheet_col_to_update = first_empty_member_col_index_in_row + 1 
-        
-        teams_worksheet.update_cell(found_row_index, sheet_col_to_update, student_id)
+            write = roster.update_cell(found_row_index, sheet_col_to_update, student_id) # Cached now, sheet write queued
+        write.result(timeout=SHEET_WRITE_TIMEOUT_SECONDS) # Outside the lock, so other joins share the batch
         # st.success(f"Student '{student_id}' successfully joined team '{team_name}'.")
         return True
 
@@ -411,36 +439,30 @@ def remove_team_member(teams_worksheet: gspread.worksheet.Worksheet, team_name:
         return False
 
     try:
-        # Find the team row by team_name (case-insensitive)
-        all_team_names_with_case = teams_worksheet.col_values(1) # Includes header
-        found_row_index = -1
-        for i, name_in_sheet in enumerate(all_team_names_with_case):
-            if name_in_sheet.lower() == team_name.lower():
-                if i == 0: # Header row
-                    st.error("Error: Team name matches header row. Cannot modify.")
-                    return False
-                found_row_index = i + 1 # gspread rows are 1-indexed
-                break
-        
-        if found_row_index == -1:
-            st.warning(f"Team '{team_name}' not found. Cannot remove member.")
-            return False
-
-        team_row_values = teams_worksheet.row_values(found_row_index)
-        
-        # Find the member in MemberX columns (starting from index 2 of team_row_values)
-        member_col_to_clear = -1 # 1-indexed sheet column
-        for i in range(2, len(team_row_values)): # Iterate through Member columns
-            if team_row_values[i] == member_student_id_to_remove:
-                member_col_to_clear = i + 1 # Convert 0-indexed list to 1-indexed sheet col
-                break
-        
-        if member_col_to_clear == -1:
-            st.warning(f"Member '{member_student_id_to_remove}' not found in team '{team_name}'.")
-            return False
-
-        # Clear the cell
-        teams_worksheet.update_cell(found_row_index, member_col_to_clear, "")
+        roster = team_roster.get_roster(teams_worksheet)
+        with roster.lock:
+            # Find the team row by team_name (case-insensitive), from the cached roster
+            found_row_index = roster.find_row(team_name) # gspread rows are 1-indexed
+            if found_row_index is None:
+                st.warning(f"Team '{team_name}' not found. Cannot remove member.")
+                return False
+
+            team_row_values = roster.row_values(found_row_index)
+
+            # Find the member in MemberX columns (starting from index 2 of team_row_values)
+            member_col_to_clear = -1 # 1-indexed sheet column
+            for i in range(2, len(team_row_values)): # Iterate through Member columns
+                if team_row_values[i] == member_student_id_to_remove:
+                    member_col_to_clear = i + 1 # Convert 0-indexed list to 1-indexed sheet col
+                    break
+
+            if member_col_to_clear == -1:
+                st.warning(f"Member '{member_student_id_to_remove}' not found in team '{team_name}'.")
+                return False
+
+            # Clear the cell (in the cached roster now; the sheet write is queued)
+            write = roster.update_cell(found_row_index, member_col_to_clear, "")
+        write.result(timeout=SHEET_WRITE_TIMEOUT_SECONDS)
         # st.success(f"Member '{member_student_id_to_remove}' removed from team '{team_name}'.")
         return True
 
@@ -470,25 +492,19 @@ def reset_team_password(teams_worksheet: gspread.worksheet.Worksheet, team_name:
         return None
 
     try:
-        # Find the team row by team_name (case-insensitive)
-        all_team_names_with_case = teams_worksheet.col_values(1) # Includes header
-        found_row_index = -1
-        for i, name_in_sheet in enumerate(all_team_names_with_case):
-            if name_in_sheet.lower() == team_name.lower():
-                if i == 0: # Header row
-                    st.error("Error: Team name matches header row. Cannot modify.")
-                    return False # Should be None as per return type, but False indicates failure too
-                found_row_index = i + 1 # gspread rows are 1-indexed
-                break
-
-        if found_row_index == -1:
-            st.warning(f"Team '{team_name}' not found. Cannot reset password.")
-            return None
-
-        new_password = generate_random_password()
-        
-        # Update the password cell (assuming Password is in the second column B, which is col index 2)
-        teams_worksheet.update_cell(found_row_index, 2, new_password)
+        roster = team_roster.get_roster(teams_worksheet)
+        with roster.lock:
+            # Find the team row by team_name (case-insensitive), from the cached roster
+            found_row_index = roster.find_row(team_name) # gspread rows are 1-indexed
+            if found_row_index is None:
+                st.warning(f"Team '{team_name}' not found. Cannot reset password.")
+                return None
+
+            new_password = generate_random_password()
+
+            # Update the password cell (assuming Password is in the second column B, which is col index 2)
+            write = roster.update_cell(found_row_index, 2, new_password)
+        write.result(timeout=SHEET_WRITE_TIMEOUT_SECONDS)
         # st.success(f"Password for team '{team_name}' has been reset to: {new_password}")
         return new_password
 
@@ -521,29 +537,22 @@ def delete_team_row(teams_worksheet: gspread.worksheet.Worksheet, team_name: str
         return False
 
     try:
-        # Find the row index for the team_name (case-insensitive for robustness)
-        # Assumes TeamName is in the first column (A).
-        cell_list = teams_worksheet.findall(team_name, in_column=1, case_sensitive=False)
-        
-        if not cell_list:
-            # st.warning(f"Team '{team_name}' not found. Cannot delete.")
-            print(f"Warning (team_manager.delete_team_row): Team '{team_name}' not found.")
-            return False
-        
-        # Assuming team names are unique, take the first found cell's row
-        # If multiple matches, this will delete the first one.
-        # Consider if stricter unique name enforcement is needed elsewhere or if this is acceptable.
-        row_to_delete = cell_list[0].row
-        
-        if row_to_delete == 1: # Header row protection
-            # st.error("Attempted to delete the header row. Operation aborted.")
-            print("Error (team_manager.delete_team_row): Attempted to delete the header row.")
-            return False
-
-        teams_worksheet.delete_rows(row_to_delete)
-        # st.success(f"Team '{team_name}' (row {row_to_delete}) deleted successfully.")
-        print(f"Info (team_manager.delete_team_row): Team '{team_name}' (row {row_to_delete}) deleted.")
-        return True
+        roster = team_roster.get_roster(teams_worksheet)
+        with roster.lock:
+            # Find the row index for the team_name (case-insensitive for robustness), from the cached roster.
+            # Assumes TeamName is in the first column (A); the header row is never indexed.
+            # Assuming team names are unique; if multiple rows match, this deletes the first one.
+            row_to_delete = roster.find_row(team_name)
+
+            if row_to_delete is None:
+                # st.warning(f"Team '{team_name}' not found. Cannot delete.")
+                print(f"Warning (team_manager.delete_team_row): Team '{team_name}' not found.")
+                return False
+
+            roster.delete_row(row_to_delete) # The cached rows below it move up too
+            # st.success(f"Team '{team_name}' (row {row_to_delete}) deleted successfully.")
+            print(f"Info (team_manager.delete_team_row): Team '{team_name}' (row {row_to_delete}) deleted.")
+            return True
 
     except gspread.exceptions.APIError as e:
         # st.error(f"Google Sheets API error while deleting team '{team_name}': {e}")
@@ -554,6 +563,32 @@ def delete_team_row(teams_worksheet: gspread.worksheet.Worksheet, team_name: str
         print(f"UnexpectedError (team_manager.delete_team_row): Deleting team '{team_name}': {e}")
         return False
 
+def delete_team_rows(teams_worksheet: gspread.worksheet.Worksheet, team_names: list) -> int:
+    """
+    Deletes several teams with a single Sheets request (rows are resolved from the cached roster and
+    deleted bottom-up, so no deletion shifts another). Team names that are not found are skipped.
+
+    Returns:
+        The number of rows deleted (0 on errors, which are printed).
+    """
+    if not teams_worksheet:
+        print("Error (team_manager.delete_team_rows): Teams worksheet not provided.")
+        return 0
+    try:
+        roster = team_roster.get_roster(teams_worksheet)
+        with roster.lock:
+            rows = []
+            for team_name in team_names:
+                row = roster.find_row(team_name)
+                if row is None:
+                    print(f"Warning (team_manager.delete_team_rows): Team '{team_name}' not found.")
+                else:
+                    rows.append(row)
+            return roster.delete_rows(rows)
+    except Exception as e:
+        print(f"Error (team_manager.delete_team_rows): Deleting {len(team_names)} teams: {e}")
+        return 0
+
 def delete_submission_row(submissions_worksheet: gspread.worksheet.Worksheet, team_name: str, timestamp: str) -> bool:
     """
     Deletes a submission row based on TeamName and Timestamp from the 'Submissions' worksheet.
@@ -580,45 +615,18 @@ def delete_submission_row(submissions_worksheet: gspread.worksheet.Worksheet, te
         return False
 
     try:
-        # Find rows matching the team_name first (assuming 'TeamName' is column 1 or 'A')
-        team_cell_list = submissions_worksheet.findall(team_name, in_column=1, case_sensitive=False)
-        if not team_cell_list:
-            # st.warning(f"No submissions found for team '{team_name}'. Cannot delete.")
-            print(f"Info (team_manager.delete_submission_row): No submissions for team '{team_name}'.")
-            return False
-
-        row_to_delete = -1
-        # Iterate through rows where team_name matched
-        for cell in team_cell_list:
-            # Check if the timestamp in that row matches (assuming 'Timestamp' is column 2 or 'B')
-            # This requires knowing the exact column index for Timestamp.
-            # If header is ["DatathonID", "TeamName", "Timestamp", ...], then Timestamp is col 3.
-            # If header is ["TeamName", "Timestamp", ...], then Timestamp is col 2.
-            # Assuming header from Student App Step 6 was:
-            # ["TeamName", "Timestamp", "DatathonID", "Metric1_Name", "Metric1_Value", ...]
-            # So, Timestamp is column 2.
-            
-            # Fetch the entire row to check the timestamp value.
-            # Using cell.row to get the row number.
-            row_values = submissions_worksheet.row_values(cell.row)
-            
-            # Adjust index based on actual 'Timestamp' column position.
-            # If header is [TeamName, Timestamp, DatathonID, Metric1_Name, ...], Timestamp is at index 1 of row_values
-            timestamp_col_index_in_row = 1 # 0-indexed for list, for Column B
-            
-            if len(row_values) > timestamp_col_index_in_row and row_values[timestamp_col_index_in_row] == timestamp:
-                if cell.row == 1: # Header row protection
-                    print("Error (team_manager.delete_submission_row): Matched header row. Aborted.")
-                    continue # Should not happen if findall skips header, but good check
-                row_to_delete = cell.row
-                break 
-            
-        if row_to_delete == -1:
-            # st.warning(f"Submission for team '{team_name}' with timestamp '{timestamp}' not found.")
-            print(f"Info (team_manager.delete_submission_row): Submission for '{team_name}' at '{timestamp}' not found.")
-            return False
-
-        submissions_worksheet.delete_rows(row_to_delete)
+        # Rows are looked up by (case-insensitive TeamName, exact Timestamp) in the cached roster of the
+        # sheet (see team_roster), whose row numbers stay correct across earlier deletes.
+        # Assumes the header ["TeamName", "Timestamp", "DatathonID", ...] (config.SUBMISSION_BASE_COLUMNS).
+        roster = team_roster.get_submission_roster(submissions_worksheet)
+        with roster.lock:
+            row_to_delete = roster.find_row(team_name, timestamp)
+            if row_to_delete is None:
+                # st.warning(f"Submission for team '{team_name}' with timestamp '{timestamp}' not found.")
+                print(f"Info (team_manager.delete_submission_row): Submission for '{team_name}' at '{timestamp}' not found.")
+                return False
+
+            roster.delete_row(row_to_delete)
         # st.success(f"Submission for team '{team_name}' (timestamp: {timestamp}, row: {row_to_delete}) deleted.")
         print(f"Info (team_manager.delete_submission_row): Submission for '{team_name}' at '{timestamp}' (row {row_to_delete}) deleted.")
         return True
@@ -632,6 +640,36 @@ def delete_submission_row(submissions_worksheet: gspread.worksheet.Worksheet, te
         print(f"UnexpectedError (team_manager.delete_submission_row): Deleting submission for '{team_name}': {e}")
         return False
 
+def delete_submission_rows(submissions_worksheet: gspread.worksheet.Worksheet, submissions: list) -> int:
+    """
+    Deletes several submissions with a single Sheets request (rows are resolved from the cached roster
+    and deleted bottom-up, so no deletion shifts another).
+
+    Args:
+        submissions_worksheet: The gspread.Worksheet for submissions.
+        submissions: (team_name, timestamp) pairs, as for delete_submission_row.
+
+    Returns:
+        The number of rows deleted (0 on errors, which are printed). Pairs that are not found are skipped.
+    """
+    if not submissions_worksheet:
+        print("Error (team_manager.delete_submission_rows): Submissions worksheet not provided.")
+        return 0
+    try:
+        roster = team_roster.get_submission_roster(submissions_worksheet)
+        with roster.lock:
+            rows = []
+            for team_name, timestamp in submissions:
+                row = roster.find_row(team_name, timestamp)
+                if row is None:
+                    print(f"Info (team_manager.delete_submission_rows): Submission for '{team_name}' at '{timestamp}' not found.")
+                else:
+                    rows.append(row)
+            return roster.delete_rows(rows)
+    except Exception as e:
+        print(f"Error (team_manager.delete_submission_rows): Deleting {len(submissions)} submissions: {e}")
+        return 0
+
 # Placeholder for other functions
 # Example:
 # def get_worksheet_data(workbook, worksheet_name: str):
@@ -0,0 +1,258 @@
+import threading
+import time
+from concurrent.futures import Future
+import gspread
+from modules import config, row_index, sheet_write_queue
+
+# --- Write-through cache of the team and submissions worksheets ---
+# Every team operation used to read the sheet first (col_values(1) to find the team, then
+# row_values(...) for its members) before writing, so each login or join cost several Sheets reads,
+# and deleting a submission cost a findall plus one row_values per match.
+# The rows of each datathon's "Teams" worksheet (TeamRoster, keyed by case-folded team name) and
+# "Submissions" worksheet (SubmissionRoster, keyed by team and timestamp) are now kept in memory,
+# process-wide, with a key -> sheet row index (row_index.RowIndex) that stays correct as rows are
+# deleted and appended. Lookups are served from memory; every write made through a roster updates
+# the cached rows right away and queues the sheet write (see sheet_write_queue), whose future the
+# caller waits on. If a queued write fails, the roster is reloaded on next use. Deletes are sent at
+# once (all rows of a bulk delete in one request, bottom row first) since they shift the rows below.
+#
+# Edits made outside the app (e.g. by hand in the spreadsheet) are detected with a cheap revision
+# check: the spreadsheet's Drive modifiedTime, fetched at most once every ROSTER_REVISION_CHECK_SECONDS.
+# Our own writes change it too and cannot be told apart from other edits, so a changed revision always
+# reloads the rows; since checks are rate limited, a burst of writes costs at most one reload per interval.
+# If that metadata is not readable (the Sheets OAuth scope does not cover Drive metadata), the rows
+# are only reloaded once they are older than ROSTER_CACHE_TTL_SECONDS, which also bounds staleness
+# when the check is available.
+
+_ROSTERS = {} # (spreadsheet ID, worksheet ID) -> SheetRoster
+_ROSTERS_LOCK = threading.Lock()
+
+def team_name_key(team_name: str) -> str:
+    """Key of a team name in the roster index (team names are matched case-insensitively)."""
+    return team_name.casefold()
+
+class SheetRoster:
+    """
+    Cached rows of one worksheet (a header row, then keyed data rows) and a key -> sheet row index.
+    Callers hold `lock` around a lookup and the write that depends on it, so sessions of this process
+    cannot interleave (e.g. two students taking the same free member slot).
+    Subclasses define KEY_COLUMNS (1-based) and key_of_row.
+    """
+
+    KEY_COLUMNS = (1,)
+
+    def __init__(self, worksheet: gspread.worksheet.Worksheet):
+        self.worksheet = worksheet
+        self.lock = threading.RLock()
+        self.header_row = []
+        self.index = None # row_index.RowIndex over the data rows, None until loaded
+        self._slot_rows = [] # RowIndex slot -> row values (lists of cell strings); None once deleted
+        self.revision = None # Spreadsheet modifiedTime seen at the last load
+        self.loaded_at = 0.0
+        self.checked_at = 0.0
+        self._revision_available = True
+        self._stale = False # A queued write failed or landed elsewhere than expected: reload on next use
+
+    def key_of_row(self, row: list):
+        raise NotImplementedError
+
+    # --- Loading and revision checks ---
+
+    def _fetch_revision(self) -> str | None:
+        """Drive modifiedTime of the spreadsheet, or None if it could not be read."""
+        if not self._revision_available:
+            return None
+        try:
+            return self.worksheet.client.get_file_drive_metadata(self.worksheet.spreadsheet_id)["modifiedTime"]
+        except gspread.exceptions.APIError as e:
+            if e.response is not None and e.response.status_code in (401, 403):
+                # No Drive scope: fall back to the TTL for this roster
+                print(f"Info (team_roster): Revision checks unavailable for '{self.worksheet.title}' ({e}); reloading every {config.ROSTER_CACHE_TTL_SECONDS}s instead.")
+                self._revision_available = False
+            else:
+                print(f"Warning (team_roster): Revision check of '{self.worksheet.title}' failed: {e}")
+            return None
+        except Exception as e: # e.g. a network error; serve the cached rows until the next check
+            print(f"Warning (team_roster): Revision check of '{self.worksheet.title}' failed: {e}")
+            return None
+
+    def _load(self):
+        # The revision is read before the values: an edit landing in between is seen by the next check
+        revision = self._fetch_revision()
+        values = self.worksheet.get_all_values()
+        self.header_row = list(values[0]) if values else []
+        self._slot_rows = [list(row) for row in values[1:]]
+        self.index = row_index.RowIndex([self.key_of_row(row) for row in self._slot_rows])
+        self.revision = revision
+        self.loaded_at = self.checked_at = time.monotonic()
+        self._stale = False
+
+    def refresh(self, force: bool = False):
+        """Reloads the rows if never loaded, forced, older than the TTL, or changed outside the app."""
+        with self.lock:
+            now = time.monotonic()
+            if self.index is None or force or self._stale or now - self.loaded_at >= config.ROSTER_CACHE_TTL_SECONDS:
+                self._load()
+                return
+            if now - self.checked_at < config.ROSTER_REVISION_CHECK_SECONDS:
+                return
+            self.checked_at = now
+            revision = self._fetch_revision()
+            if revision is not None and revision != self.revision:
+                self._load()
+
+    # --- Reads (served from memory) ---
+
+    def header(self) -> list:
+        return list(self.header_row)
+
+    def row_values(self, row_number: int) -> list:
+        """Copy of a sheet row (1-based); empty if the row does not exist."""
+        if row_number == 1:
+            return self.header()
+        slot = self.index.slot_of_row(row_number)
+        return list(self._slot_rows[slot]) if slot is not None else []
+
+    def data_rows(self) -> list:
+        """The data rows in sheet order (not copies)."""
+        return [self._slot_rows[slot] for slot in self.index.live_slots()]
+
+    def records(self) -> list:
+        """Data rows as dicts keyed by the header (like Worksheet.get_all_records, but all values are strings)."""
+        header = self.header_row
+        return [dict(zip(header, row + [""] * (len(header) - len(row)))) for row in self.data_rows() if any(row)]
+
+    # --- Write-through mutations ---
+
+    def _slot_for_write(self, row_number: int, n_cols: int = 0) -> int:
+        """Slot of a data row, adding blank rows if the row is past the last one; pads it to n_cols cells."""
+        while row_number >= self.index.first_row + len(self.index):
+            self._slot_rows.append([])
+            self.index.append(None)
+        slot = self.index.slot_of_row(row_number)
+        row = self._slot_rows[slot]
+        if len(row) < n_cols:
+            row.extend([""] * (n_cols - len(row)))
+        return slot
+
+    def _mark_stale_on_failure(self, future: Future, expected_result=None):
+        def _check(done: Future):
+            if done.exception() is not None or done.result() != expected_result:
+                self._stale = True
+        future.add_done_callback(_check)
+        return future
+
+    def set_header(self, header: list):
+        self.worksheet.update('A1', [header])
+        self.header_row[:len(header)] = header
+
+    def append_row(self, values: list) -> Future:
+        """
+        Appends a row to the cache and queues it for the sheet. The future resolves to its 1-based sheet
+        row (expected right after the last cached row; the roster is reloaded if the sheet disagrees).
+        """
+        row_number = self.index.first_row + len(self.index)
+        self._slot_rows.append(list(values))
+        self.index.append(self.key_of_row(values))
+        future = sheet_write_queue.get_write_queue(self.worksheet).append_row(values)
+        return self._mark_stale_on_failure(future, expected_result=row_number)
+
+    def update_cell(self, row_number: int, col: int, value: str) -> Future:
+        """Writes one cell (1-based row and column) to the cache and queues it for the sheet."""
+        slot = self._slot_for_write(row_number, col)
+        self._slot_rows[slot][col - 1] = value
+        if col in self.KEY_COLUMNS:
+            self.index.set_key(slot, self.key_of_row(self._slot_rows[slot]))
+        return self._mark_stale_on_failure(sheet_write_queue.get_write_queue(self.worksheet).update_cell(row_number, col, value))
+
+    def delete_rows(self, row_numbers: list) -> int:
+        """
+        Deletes data rows (1-based sheet rows as currently numbered) with one request, bottom row first so
+        no deletion shifts another. Queued writes are sent first, while their row numbers still match.
+        Returns the number of rows deleted; errors are raised to the caller.
+        """
+        rows = sorted({row for row in row_numbers if self.index.slot_of_row(row) is not None}, reverse=True)
+        if not rows:
+            return 0
+        sheet_write_queue.get_write_queue(self.worksheet).flush()
+        if len(rows) == 1:
+            self.worksheet.delete_rows(rows[0])
+        else:
+            self.worksheet.client.batch_update(self.worksheet.spreadsheet_id, {"requests": [
+                {"deleteDimension": {"range": {"sheetId": self.worksheet.id, "dimension": "ROWS",
+                                               "startIndex": row - 1, "endIndex": row}}}
+                for row in rows
+            ]})
+        for row in rows: # Descending, so each row number is still current when it is removed
+            self._slot_rows[self.index.delete_row(row)] = None
+        return len(rows)
+
+    def delete_row(self, row_number: int):
+        """Deletes a sheet row; the rows below it move up one."""
+        self.delete_rows([row_number])
+
+class TeamRoster(SheetRoster):
+    """Roster of a "Teams" worksheet (TeamName, Password, Member1, ...), keyed by case-folded team name."""
+
+    KEY_COLUMNS = (1,)
+
+    def key_of_row(self, row: list):
+        return team_name_key(row[0]) if row and row[0] else None
+
+    def find_row(self, team_name: str) -> int | None:
+        """1-based sheet row of a team (case-insensitive; the first one for duplicate names), or None."""
+        return self.index.find(team_name_key(team_name))
+
+    def team_names(self) -> list:
+        return [row[0] for row in self.data_rows() if row and row[0]]
+
+class SubmissionRoster(SheetRoster):
+    """Roster of a "Submissions_<datathon_id>" worksheet (TeamName, Timestamp, ...), keyed by (team, timestamp)."""
+
+    KEY_COLUMNS = (1, 2)
+
+    def key_of_row(self, row: list):
+        return (team_name_key(row[0]), row[1]) if len(row) > 1 and row[0] else None
+
+    def find_row(self, team_name: str, timestamp: str) -> int | None:
+        """1-based sheet row of a team's submission at a timestamp (team name case-insensitive), or None."""
+        return self.index.find((team_name_key(team_name), timestamp))
+
+def _get(roster_class, worksheet: gspread.worksheet.Worksheet, refresh: bool):
+    key = (worksheet.spreadsheet_id, worksheet.id)
+    with _ROSTERS_LOCK:
+        roster = _ROSTERS.get(key)
+        if not isinstance(roster, roster_class):
+            roster = _ROSTERS[key] = roster_class(worksheet)
+    roster.worksheet = worksheet # The newest handle (pages open the worksheet again on every rerun)
+    if refresh:
+        roster.refresh()
+    return roster
+
+def get_roster(teams_worksheet: gspread.worksheet.Worksheet, refresh: bool = True) -> TeamRoster:
+    """
+    The process-wide roster of a "Teams" worksheet, loaded on first use and (with refresh=True)
+    checked for edits made outside the app (see SheetRoster.refresh).
+    """
+    return _get(TeamRoster, teams_worksheet, refresh)
+
+def get_submission_roster(submissions_worksheet: gspread.worksheet.Worksheet, refresh: bool = True) -> SubmissionRoster:
+    """The process-wide roster of a "Submissions_<datathon_id>" worksheet (see get_roster)."""
+    return _get(SubmissionRoster, submissions_worksheet, refresh)
+
+def mark_stale(worksheet: gspread.worksheet.Worksheet):
+    """Makes the cached roster of a worksheet (if any) reload on next use, e.g. after rows were appended without it."""
+    with _ROSTERS_LOCK:
+        roster = _ROSTERS.get((worksheet.spreadsheet_id, worksheet.id))
+    if roster is not None:
+        roster._stale = True
+
+def invalidate_roster(worksheet: gspread.worksheet.Worksheet):
+    """Drops the cached rows of a worksheet; the next get_roster reloads them."""
+    with _ROSTERS_LOCK:
+        _ROSTERS.pop((worksheet.spreadsheet_id, worksheet.id), None)
+
+def clear_roster_cache():
+    """Drops every cached roster (e.g. when the admin asks for fresh data)."""
+    with _ROSTERS_LOCK:
+        _ROSTERS.clear()
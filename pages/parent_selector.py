@@ -1,5 +1,6 @@
 import streamlit as st
-from modules import data_loader # Assuming data_loader.py is in a 'modules' folder at the root
+from modules import storage # Google Drive or local storage, as configured (see modules/storage.py)
+from modules import dataset_profile
 
 def show_parent_selector_page():
     st.set_page_config(layout="wide") # Optional: Use wide layout for more space
@@ -7,16 +8,16 @@ def show_parent_selector_page():
     st.write("This page allows you to select or upload datasets and configure the datathon type.")
     st.markdown("---")
 
-    # --- 1. Google Drive Authentication ---
-    st.header("Step 1: Connect to Google Drive")
-    drive_service = data_loader.get_drive_service()
+    # --- 1. Storage Connection (Google Drive authentication unless local storage is configured) ---
+    st.header("Step 1: Connect to Storage")
+    storage_backend = storage.get_storage_backend()
 
-    if not drive_service:
+    if not storage_backend:
         st.warning("Please authenticate with Google Drive to proceed.")
-        # data_loader.get_drive_service() should display auth instructions/link
-        st.stop() # Stop further execution if no service
+        # storage.get_storage_backend() (via data_loader.get_drive_service()) should display auth instructions/link
+        st.stop() # Stop further execution if no backend
     
-    st.success("Successfully connected to Google Drive!")
+    st.success(f"Successfully connected to {storage_backend.display_name}!")
     st.markdown("---")
 
     # Placeholder for upcoming sections
@@ -29,7 +30,7 @@ def show_parent_selector_page():
     if 'selected_drive_dataset_info' not in st.session_state:
         st.session_state.selected_drive_dataset_info = None
 
-    csv_files_list = data_loader.list_csv_files_from_drive(drive_service)
+    csv_files_list = storage_backend.list_csv_files()
 
     if csv_files_list:
         dataset_options = {f"{file_info['name']} (ID: {file_info['id']})": file_info for file_info in csv_files_list}
@@ -91,10 +92,9 @@ def show_parent_selector_page():
                 files_to_upload_for_drive = {'train': uploaded_main_csv}
 
                 with st.spinner(f"Uploading '{new_dataset_name}' to Google Drive..."):
-                    upload_results = data_loader.upload_csvs_to_drive(
+                    upload_results = storage_backend.upload_csvs(
                         uploaded_files=files_to_upload_for_drive,
-                        unique_id=safe_dataset_name, # This will result in train_safe_dataset_name.csv
-                        drive_service=drive_service
+                        unique_id=safe_dataset_name # This will result in train_safe_dataset_name.csv
                     )
 
                 uploaded_file_id = upload_results.get('train')
@@ -118,12 +118,20 @@ def show_parent_selector_page():
         
         # Display shareable link for the selected main dataset
         with st.spinner(f"Fetching shareable link for {selected_info['name']}..."):
-            link = data_loader.get_drive_shareable_link(selected_info['id'], drive_service)
+            link = storage_backend.get_shareable_link(selected_info['id'])
             if link:
                 st.markdown(f"**Link to main dataset '{selected_info['name']}':** [{link}]({link})")
             else:
                 st.error(f"Could not retrieve shareable link for {selected_info['name']}.")
 
+        # Dataset stats from the profile stored at upload time (the CSV itself is not downloaded)
+        selected_profile = dataset_profile.get_dataset_profile(storage_backend, selected_info['id'])
+        if selected_profile:
+            with st.expander(f"Dataset stats: {selected_profile['rows']:,} rows, {len(selected_profile['columns'])} columns", expanded=False):
+                st.dataframe(dataset_profile.profile_to_dataframe(selected_profile))
+        else:
+            st.caption("No stats are available for this dataset (it was uploaded before dataset profiles were introduced).")
+
         st.write("You can now upload corresponding test input and test output files for this dataset.")
 
         # File uploaders for test data
@@ -158,10 +166,9 @@ def show_parent_selector_page():
                         base_unique_id = base_unique_id[:-len(ext)]
                 
                 with st.spinner(f"Uploading test files for '{selected_info['name']}'..."):
-                    upload_results = data_loader.upload_csvs_to_drive(
+                    upload_results = storage_backend.upload_csvs(
                         uploaded_files=files_to_upload_for_drive,
-                        unique_id=base_unique_id, 
-                        drive_service=drive_service
+                        unique_id=base_unique_id
                     )
 
                 if upload_results:
@@ -170,7 +177,7 @@ def show_parent_selector_page():
                         test_inputs_id = upload_results['test_inputs']
                         st.session_state.current_test_inputs_id = test_inputs_id # STORE HERE
                         with st.spinner("Generating shareable link for test inputs..."):
-                            link_ti = data_loader.get_drive_shareable_link(test_inputs_id, drive_service)
+                            link_ti = storage_backend.get_shareable_link(test_inputs_id)
                             if link_ti:
                                 st.markdown(f"**Test Inputs ('test_inputs_{base_unique_id}.csv') Link:** [{link_ti}]({link_ti})")
                     
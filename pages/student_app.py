@@ -1,5 +1,5 @@
 import streamlit as st
-from modules import data_loader, team_manager, metrics, config, config_manager # Assuming these modules exist and have the required functions
+from modules import storage, team_manager, metrics, config, config_manager, ground_truth, dataset_profile, submission_validation, data_loader, api_quota, submission_log # Assuming these modules exist and have the required functions
 
 import pandas as pd # Will be needed later
 
@@ -27,11 +27,11 @@ def show_student_page():
     # --- 1. Authenticate Google Services ---
     st.header("Connecting to Google Services...")
     
-    # Get Google Drive Service
-    drive_service = data_loader.get_drive_service()
-    if not drive_service:
+    # Get the storage backend (Google Drive, or local storage if configured)
+    storage_backend = storage.get_storage_backend()
+    if not storage_backend:
         st.warning("Google Drive authentication failed or is pending. Please complete the authentication process if prompted.")
-        # data_loader.get_drive_service() handles showing the auth link/input
+        # storage.get_storage_backend() (via data_loader.get_drive_service()) handles showing the auth link/input
         st.stop()
     # st.success("Connected to Google Drive successfully!") # Optional: Can make UI noisy
 
@@ -69,195 +69,246 @@ def show_student_page():
     # --- Placeholder for Step 2: Team Login/Join UI ---
     # (This code replaces the placeholder for Step 2 in show_student_page)
 
-        # --- Step 2: Team Login / Join UI ---
-        st.header("Step 2: Create or Join a Team")
+    # --- Step 2: Team Login / Join UI ---
+    st.header("Step 2: Create or Join a Team")
 
-        # Initialize session state variables if they don't exist
-        if 'student_logged_in' not in st.session_state:
+    # Initialize session state variables if they don't exist
+    if 'student_logged_in' not in st.session_state:
+        st.session_state.student_logged_in = False
+    if 'student_team_name' not in st.session_state:
+        st.session_state.student_team_name = None
+    if 'student_id' not in st.session_state: # For the student's own ID/email
+        st.session_state.student_id = "" 
+    if 'is_team_leader' not in st.session_state:
+        st.session_state.is_team_leader = False
+    
+    # Retrieve teams_worksheet from session state (should have been set in Step 1)
+    teams_worksheet = st.session_state.get('teams_worksheet')
+    if not teams_worksheet:
+        st.error("Team management sheet not available. Cannot proceed with login/join. Please ensure Step 1 completed successfully.")
+        st.stop()
+
+    if st.session_state.student_logged_in:
+        st.success(f"You are logged in as **{st.session_state.student_id}** in Team: **{st.session_state.student_team_name}**.")
+        if st.button("Log Out"):
             st.session_state.student_logged_in = False
-        if 'student_team_name' not in st.session_state:
             st.session_state.student_team_name = None
-        if 'student_id' not in st.session_state: # For the student's own ID/email
-            st.session_state.student_id = "" 
-        if 'is_team_leader' not in st.session_state:
+            st.session_state.student_id = "" # Clear student ID as well
             st.session_state.is_team_leader = False
-        
-        # Retrieve teams_worksheet from session state (should have been set in Step 1)
-        teams_worksheet = st.session_state.get('teams_worksheet')
-        if not teams_worksheet:
-            st.error("Team management sheet not available. Cannot proceed with login/join. Please ensure Step 1 completed successfully.")
-            st.stop()
-
-        if st.session_state.student_logged_in:
-            st.success(f"You are logged in as **{st.session_state.student_id}** in Team: **{st.session_state.student_team_name}**.")
-            if st.button("Log Out"):
-                st.session_state.student_logged_in = False
-                st.session_state.student_team_name = None
-                st.session_state.student_id = "" # Clear student ID as well
-                st.session_state.is_team_leader = False
-                # Clear other session state related to student's specific submission if any
-                if 'submission_successful' in st.session_state:
-                    del st.session_state.submission_successful
-                if 'calculated_metrics' in st.session_state:
-                    del st.session_state.calculated_metrics
-                st.rerun()
-        else:
-            create_tab, join_tab = st.tabs(["Create New Team", "Join Existing Team"])
-
-            with create_tab:
-                st.subheader("Create a New Team")
-                with st.form("create_team_form"):
-                    new_team_name = st.text_input("Choose a Team Name:", key="create_team_name")
-                    creator_student_id = st.text_input("Your Student ID/Email (this will be Member 1):", key="creator_id", value=st.session_state.student_id)
-                    submitted_create = st.form_submit_button("Create Team")
-
-                    if submitted_create:
-                        if not new_team_name.strip():
-                            st.error("Team Name cannot be empty.")
-                        elif not creator_student_id.strip():
-                            st.error("Your Student ID/Email cannot be empty.")
+            # Clear other session state related to student's specific submission if any
+            if 'submission_successful' in st.session_state:
+                del st.session_state.submission_successful
+            if 'calculated_metrics' in st.session_state:
+                del st.session_state.calculated_metrics
+            if 'calculated_confusion_matrix' in st.session_state:
+                del st.session_state.calculated_confusion_matrix
+            st.rerun()
+    else:
+        create_tab, join_tab = st.tabs(["Create New Team", "Join Existing Team"])
+
+        with create_tab:
+            st.subheader("Create a New Team")
+            with st.form("create_team_form"):
+                new_team_name = st.text_input("Choose a Team Name:", key="create_team_name")
+                creator_student_id = st.text_input("Your Student ID/Email (this will be Member 1):", key="creator_id", value=st.session_state.student_id)
+                submitted_create = st.form_submit_button("Create Team")
+
+                if submitted_create:
+                    if not new_team_name.strip():
+                        st.error("Team Name cannot be empty.")
+                    elif not creator_student_id.strip():
+                        st.error("Your Student ID/Email cannot be empty.")
+                    else:
+                        st.session_state.student_id = creator_student_id # Store entered ID
+                        result = team_manager.create_new_team(teams_worksheet, new_team_name, creator_student_id)
+                        if result:
+                            team_name_created, password_created = result
+                            st.session_state.student_logged_in = True
+                            st.session_state.student_team_name = team_name_created
+                            # student_id already set from input
+                            st.session_state.is_team_leader = True
+                            st.success(f"Team '{team_name_created}' created successfully!")
+                            st.info(f"IMPORTANT: Your new team password is: **{password_created}**. Share this with your teammates to join.")
+                            st.balloons()
+                            st.rerun() # Rerun to reflect logged-in state
                         else:
-                            st.session_state.student_id = creator_student_id # Store entered ID
-                            result = team_manager.create_new_team(teams_worksheet, new_team_name, creator_student_id)
-                            if result:
-                                team_name_created, password_created = result
-                                st.session_state.student_logged_in = True
-                                st.session_state.student_team_name = team_name_created
-                                # student_id already set from input
-                                st.session_state.is_team_leader = True
-                                st.success(f"Team '{team_name_created}' created successfully!")
-                                st.info(f"IMPORTANT: Your new team password is: **{password_created}**. Share this with your teammates to join.")
-                                st.balloons()
-                                st.rerun() # Rerun to reflect logged-in state
-                            else:
-                                # Error message already shown by create_new_team if team exists or other issues
-                                pass # team_manager function already shows st.error/warning
-
-            with join_tab:
-                st.subheader("Join an Existing Team")
-                with st.form("join_team_form"):
-                    existing_team_name = st.text_input("Team Name to Join:", key="join_team_name")
-                    team_password = st.text_input("Team Password:", type="password", key="join_team_password")
-                    joiner_student_id = st.text_input("Your Student ID/Email:", key="joiner_id", value=st.session_state.student_id)
-                    submitted_join = st.form_submit_button("Join Team")
-
-                    if submitted_join:
-                        if not existing_team_name.strip():
-                            st.error("Team Name cannot be empty.")
-                        elif not team_password: # Password can be anything, so just check if empty
-                            st.error("Password cannot be empty.")
-                        elif not joiner_student_id.strip():
-                            st.error("Your Student ID/Email cannot be empty.")
+                            # Error message already shown by create_new_team if team exists or other issues
+                            pass # team_manager function already shows st.error/warning
+
+        with join_tab:
+            st.subheader("Join an Existing Team")
+            with st.form("join_team_form"):
+                existing_team_name = st.text_input("Team Name to Join:", key="join_team_name")
+                team_password = st.text_input("Team Password:", type="password", key="join_team_password")
+                joiner_student_id = st.text_input("Your Student ID/Email:", key="joiner_id", value=st.session_state.student_id)
+                submitted_join = st.form_submit_button("Join Team")
+
+                if submitted_join:
+                    if not existing_team_name.strip():
+                        st.error("Team Name cannot be empty.")
+                    elif not team_password: # Password can be anything, so just check if empty
+                        st.error("Password cannot be empty.")
+                    elif not joiner_student_id.strip():
+                        st.error("Your Student ID/Email cannot be empty.")
+                    else:
+                        st.session_state.student_id = joiner_student_id # Store entered ID
+                        joined = team_manager.join_team(teams_worksheet, existing_team_name, team_password, joiner_student_id)
+                        if joined:
+                            st.session_state.student_logged_in = True
+                            st.session_state.student_team_name = existing_team_name
+                            # student_id already set from input
+                            st.session_state.is_team_leader = False # Not leader if joining
+                            st.success(f"Successfully joined team '{existing_team_name}'!")
+                            st.balloons()
+                            st.rerun() # Rerun to reflect logged-in state
                         else:
-                            st.session_state.student_id = joiner_student_id # Store entered ID
-                            joined = team_manager.join_team(teams_worksheet, existing_team_name, team_password, joiner_student_id)
-                            if joined:
-                                st.session_state.student_logged_in = True
-                                st.session_state.student_team_name = existing_team_name
-                                # student_id already set from input
-                                st.session_state.is_team_leader = False # Not leader if joining
-                                st.success(f"Successfully joined team '{existing_team_name}'!")
-                                st.balloons()
-                                st.rerun() # Rerun to reflect logged-in state
-                            else:
-                                # Error message already shown by join_team
-                                pass # team_manager function already shows st.error/warning
-        
-        st.markdown("---") # Separator after login/join section
+                            # Error message already shown by join_team
+                            pass # team_manager function already shows st.error/warning
+    
+    st.markdown("---") # Separator after login/join section
 
     # --- Placeholder for Step 3: Post-Login UI (Download, Upload) ---
     # (This will be shown conditionally based on login state)
-        # (This code should be placed after the "Step 2: Team Login / Join UI" st.markdown("---") )
-        # It will be conditionally displayed based on login status.
+    # (This code should be placed after the "Step 2: Team Login / Join UI" st.markdown("---") )
+    # It will be conditionally displayed based on login status.
 
-        # --- Step 3: Datathon Participation (Post-Login) ---
-        if st.session_state.get('student_logged_in', False):
-            st.header(f"Welcome, Team: {st.session_state.student_team_name} (Student: {st.session_state.student_id})")
-            st.markdown("---")
+    # --- Step 3: Datathon Participation (Post-Login) ---
+    if st.session_state.get('student_logged_in', False):
+        st.header(f"Welcome, Team: {st.session_state.student_team_name} (Student: {st.session_state.student_id})")
+        st.markdown("---")
 
-            # A. Download Test Dataset
-            st.subheader("A. Download Test Data")
-            test_inputs_file_id = st.session_state.get('datathon_test_inputs_file_id', None) # Set by parent_selector
-            
-            # Retrieve drive_service from session_state if stored, or call get_drive_service() again
-            # Assuming drive_service is available in the scope of show_student_page() from Step 1
-            # If not, it might need to be explicitly passed or retrieved from session state.
-            # For this subtask, assume 'drive_service' variable from Step 1 is accessible.
-            
-            if test_inputs_file_id:
-                with st.spinner("Fetching download link for test input data..."):
-                    test_input_link = data_loader.get_drive_shareable_link(test_inputs_file_id, drive_service) # drive_service from Step 1
-                if test_input_link:
-                    st.markdown(f"**Download your test input data (CSV):** [{test_inputs_file_id}]({test_input_link})")
-                    # Provide direct download button as well for convenience
-                    # To do this, we'd need data_loader.download_csv_from_drive_to_dataframe then st.download_button
-                    # For now, link is sufficient as per plan.
-                else:
-                    st.error("Could not retrieve a shareable link for the test input data. Please contact the admin.")
+        # A. Download Test Dataset
+        st.subheader("A. Download Test Data")
+        test_inputs_file_id = st.session_state.get('datathon_test_inputs_file_id', None) # Set by parent_selector
+        
+        # storage_backend is available in the scope of show_student_page() from Step 1
+        
+        if test_inputs_file_id:
+            with st.spinner("Fetching download link for test input data..."):
+                test_input_link = storage_backend.get_shareable_link(test_inputs_file_id) # storage_backend from Step 1
+            if test_input_link:
+                st.markdown(f"**Download your test input data (CSV):** [{test_inputs_file_id}]({test_input_link})")
+                # Provide direct download button as well for convenience
+                # To do this, we'd need storage_backend.download_dataframe then st.download_button
+                # For now, link is sufficient as per plan.
             else:
-                st.warning("Test input data is not available or not configured for this datathon. Please contact the admin.")
-            
-            st.markdown("---")
+                st.error("Could not retrieve a shareable link for the test input data. Please contact the admin.")
+            # Shape and column types of the test inputs, from the profile stored when they were uploaded
+            test_inputs_profile = dataset_profile.get_dataset_profile(storage_backend, test_inputs_file_id)
+            if test_inputs_profile:
+                with st.expander(f"Test inputs: {test_inputs_profile['rows']:,} rows, {len(test_inputs_profile['columns'])} columns"):
+                    st.dataframe(dataset_profile.profile_to_dataframe(test_inputs_profile))
+        else:
+            st.warning("Test input data is not available or not configured for this datathon. Please contact the admin.")
+        
+        st.markdown("---")
 
-            # B. Upload Predictions
-            st.subheader("B. Upload Your Predictions")
+        # B. Upload Predictions
+        st.subheader("B. Upload Your Predictions")
+        
+        # Initialize session state for submission status if it doesn't exist
+        if 'submission_successful' not in st.session_state:
+            st.session_state.submission_successful = False
+        if 'calculated_metrics' not in st.session_state:
+            st.session_state.calculated_metrics = None
+        if 'calculated_confusion_matrix' not in st.session_state:
+            st.session_state.calculated_confusion_matrix = None
+
+        # If a submission was just made, show metrics and a way to submit again
+        if st.session_state.submission_successful and st.session_state.calculated_metrics:
+            st.success("Your previous submission was successful!")
+            st.write("Calculated Metrics:")
+            # Display metrics in a more structured way if they are a dict
+            if isinstance(st.session_state.calculated_metrics, dict):
+                for metric_name, metric_value in st.session_state.calculated_metrics.items():
+                    st.metric(label=metric_name, value=f"{metric_value:.4f}") # Assuming metrics are float
+            else:
+                st.write(st.session_state.calculated_metrics) # Fallback
+
+            # Classification submissions also get the confusion matrix computed during scoring
+            if st.session_state.calculated_confusion_matrix is not None:
+                st.write("Confusion Matrix (rows: true class, columns: predicted class):")
+                st.dataframe(st.session_state.calculated_confusion_matrix)
             
-            # Initialize session state for submission status if it doesn't exist
-            if 'submission_successful' not in st.session_state:
+            if st.button("Upload Another Prediction File"):
                 st.session_state.submission_successful = False
-            if 'calculated_metrics' not in st.session_state:
                 st.session_state.calculated_metrics = None
-
-            # If a submission was just made, show metrics and a way to submit again
-            if st.session_state.submission_successful and st.session_state.calculated_metrics:
-                st.success("Your previous submission was successful!")
-                st.write("Calculated Metrics:")
-                # Display metrics in a more structured way if they are a dict
-                if isinstance(st.session_state.calculated_metrics, dict):
-                    for metric_name, metric_value in st.session_state.calculated_metrics.items():
-                        st.metric(label=metric_name, value=f"{metric_value:.4f}") # Assuming metrics are float
-                else:
-                    st.write(st.session_state.calculated_metrics) # Fallback
-                
-                if st.button("Upload Another Prediction File"):
-                    st.session_state.submission_successful = False
-                    st.session_state.calculated_metrics = None
-                    st.rerun() # Rerun to show the file uploader again
+                st.session_state.calculated_confusion_matrix = None
+                st.rerun() # Rerun to show the file uploader again
+        
+        # Show file uploader only if no successful submission is currently registered in session
+        if not st.session_state.submission_successful:
+            uploaded_prediction_file = st.file_uploader(
+                "Upload your prediction CSV file here.",
+                type=['csv'],
+                key="prediction_uploader"
+            )
             
-            # Show file uploader only if no successful submission is currently registered in session
-            if not st.session_state.submission_successful:
-                uploaded_prediction_file = st.file_uploader(
-                    "Upload your prediction CSV file here.",
-                    type=['csv'],
-                    key="prediction_uploader"
-                )
-                
-                # Add a submit button for processing the uploaded file
-                # The actual processing logic (Step 5) will be triggered by this button.
-                if st.button("Submit Predictions for Scoring", disabled=(uploaded_prediction_file is None)):
-                    if uploaded_prediction_file is not None:
-                        # Store uploaded file in session state for Step 5 to process
-                        st.session_state.uploaded_prediction_file = uploaded_prediction_file
-                        # Store uploaded file in session state for Step 5 to process
-                        st.session_state.uploaded_prediction_file = uploaded_prediction_file
+            # Add a submit button for processing the uploaded file
+            # The actual processing logic (Step 5) will be triggered by this button.
+            if st.button("Submit Predictions for Scoring", disabled=(uploaded_prediction_file is None)):
+                if uploaded_prediction_file is not None:
+                    # Store uploaded file in session state for Step 5 to process
+                    st.session_state.uploaded_prediction_file = uploaded_prediction_file
+                    # Store uploaded file in session state for Step 5 to process
+                    st.session_state.uploaded_prediction_file = uploaded_prediction_file
+                    
+                    # Scoring requests go ahead of other API traffic when the quota is tight (see api_quota)
+                    with st.spinner("Processing your submission... Hang tight!"), api_quota.priority(api_quota.PRIORITY_SCORING):
+                        # --- Begin Submission Processing Logic (Step 5) ---
+                        true_outputs_file_id = st.session_state.get('datathon_test_outputs_file_id')
+                        datathon_type = st.session_state.get('datathon_type_final')
+                        # storage_backend should be in scope from Step 1 of show_student_page()
+
+                        if not true_outputs_file_id:
+                            st.error("True test output file ID is not configured for this datathon. Cannot score. Please contact admin.")
+                            st.stop()
                         
-                        with st.spinner("Processing your submission... Hang tight!"):
-                            # --- Begin Submission Processing Logic (Step 5) ---
-                            true_outputs_file_id = st.session_state.get('datathon_test_outputs_file_id')
-                            datathon_type = st.session_state.get('datathon_type_final')
-                            # drive_service should be in scope from Step 1 of show_student_page()
-
-                            if not true_outputs_file_id:
-                                st.error("True test output file ID is not configured for this datathon. Cannot score. Please contact admin.")
-                                st.stop()
-                            
-                            df_true_outputs = data_loader.download_csv_from_drive_to_dataframe(drive_service, true_outputs_file_id)
-                            if df_true_outputs is None or df_true_outputs.empty:
-                                st.error(f"Could not load the true test output data from Drive (File ID: {true_outputs_file_id}). Please contact admin.")
-                                st.stop()
+                        # Define expected column names (IMPORTANT ASSUMPTION - document this)
+                        TARGET_COLUMN_NAME = 'Actual'  # Expected in true_outputs.csv
+                        PREDICTION_COLUMN_NAME = 'Predicted' # Expected in student's submission.csv
+
+                        # Malformed files are rejected before the ground truth is loaded: the upload is streamed
+                        # (header, row count, sample of the prediction column) and checked against the cached
+                        # test outputs, if they are of the file's current revision (read once, for both steps).
+                        true_outputs_revision = storage_backend.get_file_revision(true_outputs_file_id)
+                        validation_errors, prediction_header = submission_validation.validate_prediction_file(
+                            st.session_state.uploaded_prediction_file, datathon_type, PREDICTION_COLUMN_NAME,
+                            expected_rows=submission_validation.known_truth_rows(true_outputs_file_id, true_outputs_revision))
+                        if validation_errors:
+                            for validation_error in validation_errors:
+                                st.error(validation_error)
+                            st.stop()
+
+                        # The ground truth is cached process-wide per file revision: only the first submission
+                        # after a (re)upload of the test outputs pays for the download and parse.
+                        truth = ground_truth.get_ground_truth(storage_backend, true_outputs_file_id, datathon_type, TARGET_COLUMN_NAME,
+                                                              revision=true_outputs_revision)
+                        if truth is None:
+                            st.error(f"Could not load the true test output data from {storage_backend.display_name} (File ID: {true_outputs_file_id}), "
+                                     f"or it has no target column named '{TARGET_COLUMN_NAME}'. Please contact admin.")
+                            st.stop()
+
+                        # Only the prediction and ID columns are parsed, numeric predictions straight into float64
+                        scoring_plan = metrics.get_scoring_plan(datathon_type)
+                        prediction_dtype = {PREDICTION_COLUMN_NAME: scoring_plan.value_dtype} if scoring_plan and scoring_plan.value_dtype else None
 
+                        # Large files matched by position are scored chunk by chunk, so memory follows the chunk size
+                        # rather than the file size (the validation above already checked the prediction column).
+                        # Rows matched by ID need the whole ID column, so those files are always loaded in full.
+                        uploaded_prediction_file = st.session_state.uploaded_prediction_file
+                        stream_scoring = uploaded_prediction_file.size >= config.STREAMING_SCORING_MIN_BYTES and not (
+                            truth.id_index is not None and config.ID_COLUMN_NAME in prediction_header)
+
+                        st.info(f"Scoring assumes your prediction file has a column named '{PREDICTION_COLUMN_NAME}' "
+                                f"and the true data has a target column named '{TARGET_COLUMN_NAME}'.")
+
+                        if not stream_scoring:
                             try:
-                                df_predictions = pd.read_csv(st.session_state.uploaded_prediction_file)
+                                st.session_state.uploaded_prediction_file.seek(0)
+                                df_predictions = data_loader.read_csv_columns(st.session_state.uploaded_prediction_file,
+                                                                              columns=[PREDICTION_COLUMN_NAME, config.ID_COLUMN_NAME],
+                                                                              dtype=prediction_dtype)
                             except Exception as e:
                                 st.error(f"Error reading your uploaded prediction CSV: {e}")
                                 st.stop()
@@ -266,58 +317,74 @@ def show_student_page():
                                 st.error("Your uploaded prediction file is empty.")
                                 st.stop()
 
-                            # Define expected column names (IMPORTANT ASSUMPTION - document this)
-                            TARGET_COLUMN_NAME = 'Actual'  # Expected in true_outputs.csv
-                            PREDICTION_COLUMN_NAME = 'Predicted' # Expected in student's submission.csv
-                            
-                            st.info(f"Scoring assumes your prediction file has a column named '{PREDICTION_COLUMN_NAME}' "
-                                    f"and the true data has a target column named '{TARGET_COLUMN_NAME}'.")
-
-                            if TARGET_COLUMN_NAME not in df_true_outputs.columns:
-                                st.error(f"Missing target column '{TARGET_COLUMN_NAME}' in the true test output data. Contact admin.")
-                                st.stop()
                             if PREDICTION_COLUMN_NAME not in df_predictions.columns:
                                 st.error(f"Missing prediction column '{PREDICTION_COLUMN_NAME}' in your uploaded file.")
                                 st.stop()
-                            
-                            if len(df_true_outputs) != len(df_predictions):
-                                st.error(f"Row count mismatch: True outputs have {len(df_true_outputs)} rows, "
+                        
+                            y_pred = df_predictions[PREDICTION_COLUMN_NAME].to_numpy()
+                            if truth.id_index is not None and config.ID_COLUMN_NAME in df_predictions.columns:
+                                # Match rows by ID, so the order of the rows in the file does not matter
+                                y_pred, alignment_problems = truth.id_index.align(df_predictions[config.ID_COLUMN_NAME].to_numpy(), y_pred)
+                                if y_pred is None:
+                                    st.error(f"Your '{config.ID_COLUMN_NAME}' column does not match the test data: "
+                                             f"{ground_truth.describe_alignment_problems(alignment_problems)}.")
+                                    st.stop()
+                            elif truth.n_rows != len(df_predictions):
+                                st.error(f"Row count mismatch: True outputs have {truth.n_rows} rows, "
                                          f"your predictions have {len(df_predictions)} rows. Please ensure they match.")
                                 st.stop()
 
-                            calculated_metrics_dict = None
-                            if datathon_type == "Regression":
-                                calculated_metrics_dict = metrics.calculate_regression_metrics(df_true_outputs, df_predictions, TARGET_COLUMN_NAME, PREDICTION_COLUMN_NAME)
-                            elif datathon_type == "Classification":
-                                calculated_metrics_dict = metrics.calculate_classification_metrics(df_true_outputs, df_predictions, TARGET_COLUMN_NAME, PREDICTION_COLUMN_NAME)
-                            elif datathon_type == "Forecasting":
-                                calculated_metrics_dict = metrics.calculate_forecasting_metrics(df_true_outputs, df_predictions, TARGET_COLUMN_NAME, PREDICTION_COLUMN_NAME)
-                            elif datathon_type == "SARIMA": 
-                                calculated_metrics_dict = metrics.calculate_sarima_metrics(df_true_outputs, df_predictions, TARGET_COLUMN_NAME, PREDICTION_COLUMN_NAME)
+                        calculated_metrics_dict = None
+                        st.session_state.calculated_confusion_matrix = None
+                        if scoring_plan is None:
+                            st.error(f"Unsupported datathon type '{datathon_type}' for scoring.")
+                            st.stop()
+                        try:
+                            if stream_scoring:
+                                # Labels are read as text and typed once all chunks are seen, like a full parse
+                                chunk_dtype = prediction_dtype or {PREDICTION_COLUMN_NAME: str}
+                                scoring_report = metrics.calculate_streaming_metrics(
+                                    truth.actual, data_loader.iter_csv_chunks(uploaded_prediction_file, columns=[PREDICTION_COLUMN_NAME], dtype=chunk_dtype),
+                                    PREDICTION_COLUMN_NAME, datathon_type)
                             else:
-                                st.error(f"Unsupported datathon type '{datathon_type}' for scoring.")
-                                st.stop()
+                                scoring_report = scoring_plan.score(truth.actual, y_pred, truth_stats=truth.stats(datathon_type))
+                            if scoring_report:
+                                calculated_metrics_dict = scoring_report["metrics"]
+                                # Classification reports carry the confusion matrix the scores came from; keep it for display.
+                                if "confusion_matrix" in scoring_report:
+                                    st.session_state.calculated_confusion_matrix = metrics.confusion_matrix_to_dataframe(
+                                        scoring_report["confusion_matrix"], scoring_report["labels"])
+                        except (TypeError, ValueError) as e:
+                            # e.g. non-numeric values in the prediction column of a regression datathon
+                            st.error(f"Could not score the '{PREDICTION_COLUMN_NAME}' column of your file: {e}")
+                            st.stop()
 
-                            if calculated_metrics_dict:
-                                st.session_state.calculated_metrics = calculated_metrics_dict
-                                st.session_state.submission_successful = True
-                            else:
-                                st.error("Metrics calculation failed. Check the console logs in `modules/metrics.py` for more details if you are the admin, or ensure your data format is correct.")
-                                st.session_state.submission_successful = False
-                                st.session_state.calculated_metrics = None
-                            # --- End Submission Processing Logic (Step 5) ---
-                        st.rerun() # Rerun to display metrics or error messages and update UI state
-                    
-                    #This elif handles the case where the button was clicked without a file (if we were tracking button clicks separately)
-                    #For now, the button disabled state handles this, but if that changed, this would be a fallback.
-                    # elif uploaded_prediction_file is None and st.session_state.get('submit_predictions_button_clicked', False): 
-                    #     st.warning("Please upload a prediction file first.")
-                    #     st.session_state.submit_predictions_button_clicked = False # Reset flag
-            
-            st.markdown("---")
-        # else:
-            # This part is implicitly handled: if not logged in, this whole section doesn't show.
-            # st.info("Please log in or create a team to participate.")
+                        if calculated_metrics_dict:
+                            st.session_state.calculated_metrics = calculated_metrics_dict
+                            st.session_state.submission_successful = True
+                            # Logged to "Submissions_<datathon_id>" (with the prediction file) by a background
+                            # writer, so the Drive upload and Sheets append do not delay the results. The upload is
+                            # handed over as is (not copied), so large files are not held twice.
+                            submission_log.get_recorder().record(
+                                datathon_workbook, storage_backend, datathon_id, st.session_state.student_team_name,
+                                calculated_metrics_dict, uploaded_prediction_file)
+                        else:
+                            st.error("Metrics calculation failed. Check the console logs in `modules/metrics.py` for more details if you are the admin, or ensure your data format is correct.")
+                            st.session_state.submission_successful = False
+                            st.session_state.calculated_metrics = None
+                        # --- End Submission Processing Logic (Step 5) ---
+                    st.rerun() # Rerun to display metrics or error messages and update UI state
+                
+                #This elif handles the case where the button was clicked without a file (if we were tracking button clicks separately)
+                #For now, the button disabled state handles this, but if that changed, this would be a fallback.
+                # elif uploaded_prediction_file is None and st.session_state.get('submit_predictions_button_clicked', False): 
+                #     st.warning("Please upload a prediction file first.")
+                #     st.session_state.submit_predictions_button_clicked = False # Reset flag
+        
+        st.markdown("---")
+    # else:
+        # This part is implicitly handled: if not logged in, this whole section doesn't show.
+        # st.info("Please log in or create a team to participate.")
 
     # --- Placeholder for Step 7: Leaderboard ---
     # (This might be shown regardless of login state, or after login)
@@ -1,6 +1,8 @@
 import streamlit as st
-from modules import data_loader, team_manager, config_manager # Assuming these are used by existing teacher_app features or will be by new ones
+from modules import storage, team_manager, config_manager # Assuming these are used by existing teacher_app features or will be by new ones
 from modules import config # Import the config module
+from modules import metrics, rescoring, team_roster, api_quota
+import gspread # For gspread.exceptions.WorksheetNotFound below
 import pandas as pd # For displaying data later
 import uuid # Was used before, might be needed
 
@@ -108,6 +110,7 @@ def show_teacher_page():
             del st.session_state.admin_teams_df
         if 'admin_submissions_df' in st.session_state:
             del st.session_state.admin_submissions_df
+        team_roster.clear_roster_cache() # Team rosters are cached process-wide; reload them too
         st.rerun() # Rerun to trigger the data fetching logic below
 
     # Fetch data if not already loaded in this session or if refresh was clicked
@@ -116,12 +119,16 @@ def show_teacher_page():
     # However, for an admin dashboard, always fetching might be desired to see live data.
     # Let's try always fetching for now, simplifying the logic. Admin can refresh if needed.
 
-    with st.spinner("Connecting to Google Services and fetching data..."):
+    # Admin refreshes wait behind scoring and team operations when the API quota is tight (see api_quota)
+    with st.spinner("Connecting to Google Services and fetching data..."), api_quota.priority(api_quota.PRIORITY_ADMIN):
         gspread_client = team_manager.get_gspread_client()
         if not gspread_client:
             st.error("Failed to get Google Sheets client. Cannot fetch data.")
             st.stop()
 
+        # Storage backend (Google Drive or local) used below for rescoring and the UI settings; may be None
+        storage_backend = storage.get_storage_backend()
+
         datathon_workbook = team_manager.connect_to_workbook(gspread_client) # Uses name from secrets
         if not datathon_workbook:
             st.error("Failed to connect to the main 'DatathonTeams' workbook.")
@@ -131,7 +138,8 @@ def show_teacher_page():
         teams_worksheet = team_manager.get_or_create_datathon_teams_worksheet(datathon_workbook, current_datathon_id)
         if teams_worksheet:
             try:
-                all_teams_data = teams_worksheet.get_all_records(head=1) # head=1 assumes first row is header
+                # Served from the cached roster (see team_roster); the first row is the header
+                all_teams_data = team_roster.get_roster(teams_worksheet).records()
                 if all_teams_data:
                     st.session_state.admin_teams_df = pd.DataFrame(all_teams_data)
                     # st.success("Teams data loaded successfully.")
@@ -215,31 +223,34 @@ def show_teacher_page():
                 # Display more team details if needed, e.g., password column for admin view (though maybe not directly)
                 # st.write(row) # For debugging or more info
 
-                col1, col2 = st.columns(2)
-                with col1:
-                    if st.button(f"Reset Password", key=f"reset_pw_{team_name}_{index}", help=f"Reset password for team {team_name}"):
-                        new_password = team_manager.reset_team_password(teams_worksheet, team_name)
-                        if new_password:
-                            st.success(f"Password for team '{team_name}' has been reset to: **{new_password}**")
-                            # No automatic data refresh here as the password change is not directly visible in the main df view
-                            # Admin should be aware the action was performed.
-                        else:
-                            st.error(f"Failed to reset password for team '{team_name}'.")
-                        # No rerun needed, as it would close the expander and lose the message.
-
-                with col2:
-                    # Using a form for delete button to add a confirmation step if desired,
-                    # but a direct button is also common. For now, direct button.
-                    if st.button(f"⚠️ Remove Team", key=f"remove_team_{team_name}_{index}", help=f"Permanently remove team {team_name}"):
-                        if team_manager.delete_team_row(teams_worksheet, team_name):
-                            st.success(f"Team '{team_name}' removed successfully.")
-                            # Clear session state DF to trigger refresh on rerun
-                            if 'admin_teams_df' in st.session_state:
-                                del st.session_state.admin_teams_df 
-                            st.rerun()
-                        else:
-                            st.error(f"Failed to remove team '{team_name}'. Team might have already been removed or an error occurred.")
-                            # Consider a rerun even on failure if state might be inconsistent
+                if st.button(f"Reset Password", key=f"reset_pw_{team_name}_{index}", help=f"Reset password for team {team_name}"):
+                    new_password = team_manager.reset_team_password(teams_worksheet, team_name)
+                    if new_password:
+                        st.success(f"Password for team '{team_name}' has been reset to: **{new_password}**")
+                        # No automatic data refresh here as the password change is not directly visible in the main df view
+                        # Admin should be aware the action was performed.
+                    else:
+                        st.error(f"Failed to reset password for team '{team_name}'.")
+                    # No rerun needed, as it would close the expander and lose the message.
+
+        # Teams are removed together: all selected rows go in one request (see team_manager.delete_team_rows)
+        team_name_options = list(dict.fromkeys(str(name) for name in admin_teams_df.get("TeamName", []) if str(name).strip()))
+        selected_team_names = st.multiselect(
+            "Select the teams to remove:",
+            options=team_name_options,
+            key="select_teams_to_remove"
+        )
+        if st.button("⚠️ Remove Selected Teams", key="remove_teams_button", disabled=not selected_team_names,
+                     help="Permanently remove the selected teams"):
+            n_removed = team_manager.delete_team_rows(teams_worksheet, selected_team_names)
+            if n_removed == len(selected_team_names):
+                st.success(f"Removed {n_removed} team(s).")
+                # Clear session state DF to trigger refresh on rerun
+                if 'admin_teams_df' in st.session_state:
+                    del st.session_state.admin_teams_df
+                st.rerun()
+            else:
+                st.error(f"Removed {n_removed} of {len(selected_team_names)} selected teams. Some might have already been removed or an error occurred.")
 
         st.markdown("---") # Separator after the teams list
     
@@ -276,10 +287,20 @@ def show_teacher_page():
     else: # This means admin_submissions_df is not empty AND submissions_worksheet is available (or df is empty and this block is skipped)
         st.dataframe(admin_submissions_df) # Display all submissions
 
+        # Resolved once for the whole table instead of once per row
+        scoring_plan = metrics.get_scoring_plan(st.session_state.get('datathon_type_final')) # from parent_selector Step 4
+        primary_metric_name = scoring_plan.primary_metric if scoring_plan else None
+
+        if scoring_plan:
+            st.write(f"Leaderboard (best submission per team, ranked by {primary_metric_name}):")
+            leaderboard_df = metrics.rank_submissions(admin_submissions_df, scoring_plan.datathon_type)
+            if leaderboard_df is not None:
+                st.dataframe(leaderboard_df, hide_index=True)
+
         st.markdown("---")
-        st.write("Delete a specific submission:")
+        st.write("Delete submissions:")
         
-        submission_options = ["None"]
+        submission_options = []
         submission_identifiers_map = {}
 
         for index, row in admin_submissions_df.iterrows():
@@ -288,8 +309,6 @@ def show_teacher_page():
             
             # Attempt to get the primary metric for display, if configured and present
             primary_metric_display = ""
-            current_datathon_type_for_metric = st.session_state.get('datathon_type_final', '').lower() # from parent_selector Step 4
-            primary_metric_name = config.PRIMARY_METRICS.get(current_datathon_type_for_metric)
             
             if primary_metric_name and primary_metric_name in row:
                 try:
@@ -305,50 +324,84 @@ def show_teacher_page():
             
             display_text = f"Team: {team_name}, Time: {timestamp}{primary_metric_display} (Index: {index})"
             submission_options.append(display_text)
-            submission_identifiers_map[display_text] = (team_name, timestamp)
+            submission_identifiers_map[display_text] = (str(team_name), str(timestamp))
 
-        selected_submission_display = st.selectbox(
-            "Select a submission to delete:",
+        selected_submission_displays = st.multiselect(
+            "Select the submissions to delete:",
             options=submission_options,
-            index=0, 
             key="select_submission_to_delete"
         )
 
-        if st.button("⚠️ Delete Selected Submission", key="delete_submission_button", disabled=(selected_submission_display == "None")):
-            if selected_submission_display != "None" and submissions_worksheet: # Ensure worksheet is available
-                team_to_delete_from, ts_to_delete = submission_identifiers_map[selected_submission_display]
-                
-                if team_manager.delete_submission_row(submissions_worksheet, team_to_delete_from, ts_to_delete):
-                    st.success(f"Submission for Team '{team_to_delete_from}' at '{ts_to_delete}' deleted successfully.")
+        if st.button("⚠️ Delete Selected Submissions", key="delete_submission_button", disabled=not selected_submission_displays):
+            if selected_submission_displays and submissions_worksheet: # Ensure worksheet is available
+                # All selected rows are deleted with one request (see team_manager.delete_submission_rows)
+                to_delete = [submission_identifiers_map[display] for display in selected_submission_displays]
+                n_deleted = team_manager.delete_submission_rows(submissions_worksheet, to_delete)
+                if n_deleted == len(to_delete):
+                    st.success(f"Deleted {n_deleted} submission(s).")
                     if 'admin_submissions_df' in st.session_state:
                         del st.session_state.admin_submissions_df
                     st.rerun()
                 else:
-                    st.error(f"Failed to delete submission for Team '{team_to_delete_from}' at '{ts_to_delete}'. It might have already been removed or an error occurred.")
+                    st.error(f"Deleted {n_deleted} of {len(to_delete)} selected submissions. Some might have already been removed or an error occurred.")
             elif submissions_worksheet is None:
                  st.error("Cannot delete: Submissions worksheet is not accessible. Try refreshing data.")
             else:
                 st.warning("No submission selected for deletion.")
+
+        # --- Rescore all submissions (e.g. after fixing or replacing the test outputs file) ---
+        st.markdown("---")
+        st.write("Rescore all submissions against the current test outputs file:")
+        if st.button("🔁 Rescore All Submissions", key="rescore_all_submissions_button"):
+            true_outputs_file_id = st.session_state.get('datathon_test_outputs_file_id')
+            datathon_type_for_rescoring = st.session_state.get('datathon_type_final')
+            if not true_outputs_file_id or not datathon_type_for_rescoring:
+                st.error("Test outputs file or datathon type not configured. Please complete the 'Parent/Teacher Setup' first.")
+            elif not storage_backend:
+                st.error("Storage backend not available. Cannot load prediction files for rescoring.")
+            else:
+                with st.spinner("Rescoring all stored submissions..."), api_quota.priority(api_quota.PRIORITY_ADMIN):
+                    rescoring_summary = rescoring.rescore_all_submissions(
+                        storage_backend, submissions_worksheet, true_outputs_file_id, datathon_type_for_rescoring
+                    )
+                if rescoring_summary is None:
+                    st.error("Rescoring failed. Check the server logs for details.")
+                else:
+                    st.success(f"Rescored {rescoring_summary['rescored']} submissions.")
+                    if rescoring_summary['skipped_rows']:
+                        st.info(f"{rescoring_summary['skipped_rows']} rows have no stored prediction file and were left unchanged.")
+                    for row_number, file_id, reason in rescoring_summary['failed']:
+                        st.warning(f"Row {row_number} (file {file_id}) was not rescored: {reason}")
+                    if 'admin_submissions_df' in st.session_state:
+                        del st.session_state.admin_submissions_df # Show the new scores on the next run
         
     st.markdown("---") # Separator after the submissions list
 
+    # Google API usage of this server process: requests that waited for quota or were retried after errors
+    with st.expander("Google API Usage (this server process)", expanded=False):
+        usage = api_quota.api_counters()
+        if usage:
+            st.dataframe(pd.DataFrame.from_dict(usage, orient='index'))
+        else:
+            st.caption("No Google API requests made yet.")
+
     # --- Step 7: UI Controls for Global Settings ---
     st.subheader("Global UI Settings")
 
     # Load settings on first load or if not present in session state
-    # drive_service should be available from Step 2 (Data Fetching for Admin Dashboard)
+    # storage_backend is obtained in Step 2 (Data Fetching for Admin Dashboard)
     if 'ui_settings' not in st.session_state:
-        if drive_service: # Check if drive_service was successfully obtained earlier in this function
-             with st.spinner("Loading UI settings from Google Drive..."):
-                st.session_state.ui_settings = config_manager.load_uiconfig_from_drive(drive_service)
+        if storage_backend: # Check if storage_backend was successfully obtained earlier in this function
+             with st.spinner(f"Loading UI settings from {storage_backend.display_name}..."):
+                st.session_state.ui_settings = config_manager.load_uiconfig(storage_backend)
         else:
-            st.warning("Google Drive service not available. Using default UI settings. Cannot load/save custom UI settings.")
+            st.warning("Storage backend not available. Using default UI settings. Cannot load/save custom UI settings.")
             st.session_state.ui_settings = config_manager.DEFAULT_UI_SETTINGS.copy()
 
 
     with st.expander("Customize Application Appearance & Behavior", expanded=False):
-        if not drive_service: # Disable if no drive service
-            st.caption("Saving/loading of custom UI settings is disabled as Google Drive is not connected.")
+        if not storage_backend: # Disable if no storage backend
+            st.caption("Saving/loading of custom UI settings is disabled as storage is not connected.")
 
         # Get current values from session state, falling back to defaults from config_manager
         current_font_size = st.session_state.ui_settings.get('font_size', config_manager.DEFAULT_UI_SETTINGS['font_size'])
@@ -362,14 +415,14 @@ def show_teacher_page():
             min_value=10, max_value=24, 
             value=current_font_size, 
             key="ui_font_size_setter",
-            disabled=not drive_service
+            disabled=not storage_backend
         )
         new_decimal_precision = st.number_input(
             "Decimal Precision for Scores", 
             min_value=1, max_value=6, 
             value=current_decimal_precision, 
             key="ui_decimal_precision_setter",
-            disabled=not drive_service
+            disabled=not storage_backend
         )
         
         st.info("Color settings below are saved for reference. Applying them dynamically across the entire app theme requires advanced setup (e.g., custom CSS injection or Streamlit theming features if available). Step 8 will attempt basic font size application.")
@@ -378,22 +431,22 @@ def show_teacher_page():
             "Primary Accent Color", 
             value=current_primary_color, 
             key="ui_primary_color_setter",
-            disabled=not drive_service
+            disabled=not storage_backend
         )
         new_bg_color = st.color_picker(
             "Application Background Color", 
             value=current_bg_color, 
             key="ui_bg_color_setter",
-            disabled=not drive_service
+            disabled=not storage_backend
         )
         new_text_color = st.color_picker(
             "Application Text Color", 
             value=current_text_color, 
             key="ui_text_color_setter",
-            disabled=not drive_service
+            disabled=not storage_backend
         )
 
-        if st.button("Save UI Settings", key="save_ui_settings_button_main", disabled=not drive_service):
+        if st.button("Save UI Settings", key="save_ui_settings_button_main", disabled=not storage_backend):
             updated_settings = {
                 "font_size": new_font_size,
                 "decimal_precision": new_decimal_precision,
@@ -401,15 +454,15 @@ def show_teacher_page():
                 "background_color": new_bg_color,
                 "text_color": new_text_color
             }
-            if drive_service:
-                if config_manager.save_uiconfig_to_drive(drive_service, updated_settings):
+            if storage_backend:
+                if config_manager.save_uiconfig(storage_backend, updated_settings):
                     st.session_state.ui_settings = updated_settings.copy()
-                    st.success("UI Settings saved successfully to Google Drive!")
+                    st.success(f"UI Settings saved successfully to {storage_backend.display_name}!")
                     st.info("Font size change will attempt to apply on next rerun (Step 8). Other color changes are saved but may require manual theme adjustments or advanced CSS for full effect.")
                 else:
-                    st.error("Failed to save UI settings to Google Drive.")
+                    st.error(f"Failed to save UI settings to {storage_backend.display_name}.")
             else:
-                st.error("Google Drive service not connected. Cannot save settings.")
+                st.error("Storage backend not connected. Cannot save settings.")
     
     st.markdown("---") # Separator
 